@@ -0,0 +1,129 @@
+"""
+Splitting uploaded recordings for batch transcription.
+
+Uncompressed WAV and AIFF recordings are cut into chunks that are transcribed in
+parallel (see `STTClient.transcribe_recording`). Each cut is moved to the quietest
+moment near its target time, so words are not split between two chunks, and every
+chunk is re-encoded as a standalone WAV. Compressed formats (MP3) can't be cut
+without decoding them, so they are transcribed as a single file.
+"""
+import io
+import os
+import warnings
+import wave
+from array import array
+
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        import aifc  # Deprecated since Python 3.11 and removed in 3.13.
+except ImportError:
+    aifc = None
+
+AUDIO_EXTENSIONS = (".wav", ".aiff", ".aif", ".mp3")
+AIFF_EXTENSIONS = (".aiff", ".aif")
+PCM_EXTENSIONS = (".wav", ".aiff", ".aif")
+AUDIO_MIMETYPES = {".wav": "audio/wav", ".aiff": "audio/aiff", ".aif": "audio/aiff", ".mp3": "audio/mpeg"}
+
+# A cut may move this far from its target to find a quiet moment, measured in
+# windows of this length.
+SILENCE_SEARCH_SECONDS = 2.0
+SILENCE_WINDOW_SECONDS = 0.02
+
+
+def is_audio_file(filename: str) -> bool:
+    """
+    Whether `filename` is a recording we can transcribe. AIFF needs the `aifc`
+    module, which Python 3.13 removed; without it AIFF uploads are rejected as
+    unsupported files rather than failing once they are uploaded.
+    """
+    name = filename.lower()
+    if aifc is None and name.endswith(AIFF_EXTENSIONS):
+        return False
+    return name.endswith(AUDIO_EXTENSIONS)
+
+
+def audio_mimetype(filename: str) -> str:
+    return AUDIO_MIMETYPES[os.path.splitext(filename)[1].lower()]
+
+
+def _open_pcm(path: str, filename: str):
+    if filename.lower().endswith(".wav"):
+        return wave.open(path, "rb")
+    if aifc is None:
+        raise ValueError("AIFF recordings are not supported on this server.")
+    return aifc.open(path, "rb")
+
+
+def _to_wav_frames(frames: bytes, sample_width: int, big_endian: bool) -> bytes:
+    """Convert AIFF sample bytes (big-endian, signed) to WAV's (little-endian, unsigned 8-bit)."""
+    if sample_width == 1:
+        return frames.translate(bytes((b ^ 0x80) for b in range(256))) if big_endian else frames
+    if not big_endian:
+        return frames
+    swapped = bytearray(len(frames))
+    for k in range(sample_width):
+        swapped[k::sample_width] = frames[sample_width - 1 - k::sample_width]
+    return bytes(swapped)
+
+
+def _loudness(frames: bytes, big_endian: bool) -> float:
+    """Mean absolute sample value of 16-bit audio (all channels together)."""
+    samples = array("h", frames[:len(frames) // 2 * 2])
+    if big_endian:
+        samples.byteswap()
+    return sum(map(abs, samples)) / max(len(samples), 1)
+
+
+def plan_chunks(path: str, filename: str, chunk_seconds: float) -> tuple[float, list[tuple[int, int]]]:
+    """
+    Duration in seconds and (start_frame, frame_count) chunks of about
+    `chunk_seconds` covering the whole recording. For 16-bit audio each cut is
+    placed in the quietest SILENCE_WINDOW_SECONDS within SILENCE_SEARCH_SECONDS of
+    its target.
+    """
+    big_endian = not filename.lower().endswith(".wav")
+    with _open_pcm(path, filename) as audio:
+        rate = audio.getframerate()
+        total = audio.getnframes()
+        sample_width = audio.getsampwidth()
+        bytes_per_frame = sample_width * audio.getnchannels()
+        chunk_frames = max(1, int(chunk_seconds * rate))
+        window = max(1, int(SILENCE_WINDOW_SECONDS * rate))
+        search = int(SILENCE_SEARCH_SECONDS * rate)
+
+        cuts = [0]
+        while total - cuts[-1] > chunk_frames:
+            target = cuts[-1] + chunk_frames
+            cut = target
+            low = max(cuts[-1] + window, target - search)
+            high = min(total - window, target + search)
+            if sample_width == 2 and high > low:
+                audio.setpos(low)
+                frames = audio.readframes(high - low + window)
+                # Quietest window; among equally quiet ones, the closest to the target.
+                quietest = None
+                for offset in range(0, high - low, window):
+                    level = _loudness(frames[offset * bytes_per_frame:(offset + window) * bytes_per_frame], big_endian)
+                    score = (level, abs(low + offset - target))
+                    if quietest is None or score < quietest:
+                        quietest, cut = score, low + offset
+            cuts.append(cut)
+        cuts.append(total)
+    return total / rate, [(start, stop - start) for start, stop in zip(cuts, cuts[1:]) if stop > start]
+
+
+def read_chunk_as_wav(path: str, filename: str, start: int, frame_count: int) -> bytes:
+    """Frames [start, start + frame_count) of a WAV or AIFF file as a standalone WAV file."""
+    big_endian = not filename.lower().endswith(".wav")
+    with _open_pcm(path, filename) as audio:
+        audio.setpos(start)
+        frames = audio.readframes(frame_count)
+        sample_width = audio.getsampwidth()
+        output = io.BytesIO()
+        with wave.open(output, "wb") as chunk:
+            chunk.setnchannels(audio.getnchannels())
+            chunk.setsampwidth(sample_width)
+            chunk.setframerate(audio.getframerate())
+            chunk.writeframes(_to_wav_frames(frames, sample_width, big_endian))
+    return output.getvalue()
@@ -176,6 +176,19 @@ async def get_authenticated_user_from_header(token: str = Depends(oauth2_scheme)
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+async def get_metrics_user(current_user: SupabaseUser = Depends(get_authenticated_user_from_header)):
+    """
+    Dependency for operational endpoints (/metrics/*): the caller must be signed in
+    and listed in METRICS_USER_IDS.
+    """
+    allowed = {user_id.strip() for user_id in settings.METRICS_USER_IDS.split(",") if user_id.strip()}
+    if current_user.id not in allowed:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not allowed to read metrics",
+        )
+    return current_user
+
 async def resend_verification_email(data: ResendVerificationRequest):
     """Resend verification email to user."""
     try:
@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Bounded in-memory cache that evicts the least recently used entry."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def set(self, key: str, value) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class SQLiteCache:
+    """
+    Persistent key/value cache stored in a single SQLite file.
+    Entries are evicted by last access time once `max_entries` is exceeded, or
+    once the stored values add up to more than `max_bytes` (if given).
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000, max_bytes: int | None = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, accessed_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            if self.max_bytes is not None:
+                # Keep the most recently used entries whose sizes fit in max_bytes.
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN ("
+                    "SELECT key FROM (SELECT key, SUM(LENGTH(CAST(value AS BLOB))) "
+                    "OVER (ORDER BY accessed_at DESC, key) AS used FROM cache) WHERE used > ?)",
+                    (self.max_bytes,),
+                )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(LENGTH(CAST(value AS BLOB))), 0) FROM cache").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {"entries": len(self), "bytes": self.size_bytes(), "hits": self.hits, "misses": self.misses}
+
+
+class TieredCache:
+    """Memory LRU in front of an optional persistent tier. Values are strings."""
+
+    def __init__(self, memory: LRUCache, persistent: SQLiteCache | None = None):
+        self.memory = memory
+        self.persistent = persistent
+
+    def get(self, key: str) -> str | None:
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        if self.persistent is None:
+            return None
+        try:
+            value = self.persistent.get(key)
+        except sqlite3.Error as e:
+            print(f"Error reading from persistent cache: {e}")
+            return None
+        if value is not None:
+            # Promote to the memory tier so the next hit skips SQLite.
+            self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self.memory.set(key, value)
+        if self.persistent is None:
+            return
+        try:
+            self.persistent.set(key, value)
+        except sqlite3.Error as e:
+            print(f"Error writing to persistent cache: {e}")
+
+    def stats(self) -> dict:
+        # A lookup misses overall only if it misses the last tier it reaches.
+        last_tier = self.persistent or self.memory
+        return {
+            "hits": self.memory.hits + (self.persistent.hits if self.persistent else 0),
+            "misses": last_tier.misses,
+            "memory": self.memory.stats(),
+            "persistent": self.persistent.stats() if self.persistent else None,
+        }
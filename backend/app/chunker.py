@@ -0,0 +1,216 @@
+import bisect
+import itertools
+import re
+
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to an approximate count.
+    tiktoken = None
+
+# Encoding used by gpt-3.5-turbo / gpt-4 family models.
+ENCODING_NAME = "cl100k_base"
+DEFAULT_SECTION_TOKENS = 650  # Roughly the old 500-word sections.
+# End a section at a paragraph break, rather than the last sentence that fits,
+# once it is at least this full.
+PARAGRAPH_SOFT_LIMIT = 0.75
+# Starting guess for English text; refined from every section that gets counted.
+INITIAL_CHARS_PER_TOKEN = 4.0
+
+# Sentence terminators (punctuation, optionally a closing quote/bracket, then whitespace).
+_SENTENCE_ENDS = (". ", "? ", "! ", ".\n", "?\n", "!\n", '." ', '?" ', '!" ', '."\n', ".) ", ".)\n")
+
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]")
+
+_encoding = None
+_encoding_loaded = False
+# (encoding, byte length of every token id), built once per encoding.
+_token_lengths = None
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding(ENCODING_NAME)
+            except Exception as e:
+                print(f"Could not load tiktoken encoding '{ENCODING_NAME}', using approximate token counts: {e}")
+    return _encoding
+
+def load_encoding() -> None:
+    """
+    Load the BPE encoding (and its token length table) now. The first load may
+    download it, so call this from a worker thread at startup rather than on the
+    first request.
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        _get_token_lengths(encoding)
+
+def count_tokens(text: str, start: int = 0, end: int | None = None) -> int:
+    """
+    Count model tokens in text[start:end]. Without tiktoken this falls back to
+    the usual ~4/3 tokens per English word estimate.
+    """
+    end = len(text) if end is None else end
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode_ordinary(text[start:end]))
+    words = text.count(" ", start, end) + text.count("\n", start, end) + 1
+    return words * 4 // 3
+
+def _get_token_lengths(encoding) -> list[int]:
+    global _token_lengths
+    if _token_lengths is None or _token_lengths[0] is not encoding:
+        lengths = []
+        for token in range(encoding.max_token_value + 1):
+            try:
+                lengths.append(len(encoding.decode_single_token_bytes(token)))
+            except KeyError:  # An unused id between the ordinary and special tokens.
+                lengths.append(0)
+        _token_lengths = (encoding, lengths)
+    return _token_lengths[1]
+
+def _span_counter(text: str):
+    """
+    A `count(start, end)` for spans of `text`. With an encoding, the text is
+    encoded once and a span's tokens are found by bisecting the tokens' byte
+    offsets, so no span is encoded again.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return lambda start, end: count_tokens(text, start, end)
+
+    lengths = _get_token_lengths(encoding)
+    starts = list(itertools.accumulate(map(lengths.__getitem__, encoding.encode_ordinary(text)), initial=0))
+    starts.pop()
+    # Character offsets to byte offsets: add the extra UTF-8 bytes of the
+    # non-ASCII characters before the offset.
+    non_ascii = [(match.start(), len(match.group().encode()) - 1) for match in _NON_ASCII_RE.finditer(text)]
+    positions = [position for position, _ in non_ascii]
+    extra_bytes = list(itertools.accumulate((extra for _, extra in non_ascii), initial=0))
+
+    def to_bytes(offset: int) -> int:
+        return offset + extra_bytes[bisect.bisect_left(positions, offset)]
+
+    def count(start: int, end: int) -> int:
+        # Only the first word of a span is tokenized differently on its own (no
+        # leading space, so it may split into more tokens); encode just that word
+        # and take the rest from the whole-text encode. A space after a non-space
+        # always starts a new pre-token, so the tokens after it are the same.
+        head_end = text.find(" ", start + 1, end)
+        if head_end == -1:
+            return count_tokens(text, start, end)
+        head = len(encoding.encode_ordinary(text[start:head_end]))
+        return head + bisect.bisect_left(starts, to_bytes(end)) - bisect.bisect_left(starts, to_bytes(head_end))
+
+    return count
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos].isspace():
+        pos += 1
+    return pos
+
+def _strip_end(text: str, start: int, end: int) -> int:
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return end
+
+def _last_break(text: str, start: int, limit: int) -> int:
+    """
+    Latest place at or before `limit` to end a section starting at `start`:
+    a sentence end or paragraph break, else a word boundary, else `limit` itself.
+    """
+    paragraph = text.rfind("\n\n", start, limit)
+    best = paragraph if paragraph > start else -1
+    for terminator in _SENTENCE_ENDS:
+        # Only the region after the best candidate so far can hold a later one.
+        found = text.rfind(terminator, max(start, best), limit)
+        if found != -1:
+            # Keep the punctuation (and closing quote) inside the section.
+            best = max(best, found + len(terminator) - 1)
+    if best > start:
+        return best
+    space = max(text.rfind(" ", start, limit), text.rfind("\n", start, limit))
+    return space if space > start else limit
+
+def _paragraph_cut(text: str, start: int, end: int, max_tokens: int, count) -> tuple[int, int] | None:
+    """
+    First paragraph break in text[start:end] after which the section is already
+    PARAGRAPH_SOFT_LIMIT full, with the token count up to it.
+    """
+    min_tokens = max_tokens * PARAGRAPH_SOFT_LIMIT
+    found = None
+    paragraph = text.rfind("\n\n", start, end)
+    while paragraph > start:
+        cut = _strip_end(text, start, paragraph)
+        if cut <= start:
+            break
+        tokens = count(start, cut)
+        if tokens < min_tokens:
+            break
+        found = (cut, tokens)
+        paragraph = text.rfind("\n\n", start, cut)
+    return found
+
+def _next_break(text: str, pos: int, limit: int) -> int:
+    """End of the sentence or paragraph that starts at `pos`, or `limit` if it runs past it."""
+    best = limit
+    paragraph = text.find("\n\n", pos, limit)
+    if paragraph != -1:
+        best = paragraph
+    for terminator in _SENTENCE_ENDS:
+        found = text.find(terminator, pos, best)
+        if found != -1:
+            best = min(best, found + len(terminator) - 1)
+    return best
+
+def chunk_spans(text: str, max_tokens: int = DEFAULT_SECTION_TOKENS) -> list[tuple[int, int]]:
+    """
+    Split text into sections of at most `max_tokens` model tokens, cutting at
+    paragraph or sentence boundaries where possible.
+
+    Works in a single forward pass: each section's end is estimated from a running
+    chars-per-token ratio, snapped back to a boundary, then shrunk or extended
+    sentence by sentence to the longest run of sentences that fits the budget.
+    Token counts come from one encode of the whole text (see `_span_counter`).
+    Returns (start, end) character offsets into `text` rather than copies.
+    """
+    count = _span_counter(text)
+    spans = []
+    chars_per_token = INITIAL_CHARS_PER_TOKEN
+    start = _skip_whitespace(text, 0)
+    while start < len(text):
+        limit = min(len(text), start + int(max_tokens * chars_per_token))
+        end = len(text) if limit == len(text) else _last_break(text, start, limit)
+        end = _strip_end(text, start, end)
+        tokens = count(start, end)
+
+        # Too long: pull the end back to an earlier boundary, proportionally.
+        while tokens > max_tokens and end - start > 1:
+            limit = start + max(1, int((end - start) * max_tokens / tokens * 0.95))
+            end = _strip_end(text, start, _last_break(text, start, limit))
+            tokens = count(start, end)
+
+        # Room left: take following sentences while they still fit.
+        while end < len(text):
+            # A sentence that doesn't end within a whole section's worth of text can't fit.
+            search_limit = min(len(text), end + int(max_tokens * chars_per_token))
+            next_end = _strip_end(text, end, _next_break(text, _skip_whitespace(text, end), search_limit))
+            if next_end <= end:
+                break
+            extra = count(start, next_end) - tokens
+            if tokens + extra > max_tokens:
+                break
+            end = next_end
+            tokens += extra
+
+        paragraph_cut = _paragraph_cut(text, start, end, max_tokens, count)
+        if paragraph_cut is not None:
+            end, tokens = paragraph_cut
+
+        spans.append((start, end))
+        if tokens:
+            chars_per_token = (end - start) / tokens
+        start = _skip_whitespace(text, end)
+    return spans
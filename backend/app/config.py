@@ -16,6 +16,112 @@ class Settings(BaseSettings):
     STRIPE_PRICE_PLUS: str
     STRIPE_WEBHOOK_SECRET: str
 
+    # Comma-separated Supabase user IDs allowed to read the /metrics/* endpoints
+    # (queue depths, backlog and LLM usage). Empty means nobody can.
+    METRICS_USER_IDS: str = ""
+
+    # "openai" calls the OpenAI API; "local" is an offline engine for load tests
+    # with configurable latency (log-normal) and failure rate.
+    LLM_BACKEND: str = "openai"
+    LLM_MODEL: str = "gpt-3.5-turbo"
+    LOCAL_LLM_LATENCY_SECONDS: float = 0.5
+    LOCAL_LLM_LATENCY_SIGMA: float = 0.25
+    LOCAL_LLM_FAILURE_RATE: float = 0.0
+    LOCAL_LLM_SEED: int = 0
+
+    # Summary cache: in-memory LRU in front of a SQLite file that survives restarts.
+    SUMMARY_CACHE_MEMORY_ENTRIES: int = 256
+    SUMMARY_CACHE_PATH: str | None = ".cache/summaries.sqlite3"
+    SUMMARY_CACHE_MAX_ENTRIES: int = 5000
+
+    # Process-wide limits shared by every LLM request the summarizer makes.
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_REQUESTS_PER_MINUTE: int = 500
+    LLM_TOKENS_PER_MINUTE: int = 200000
+
+    # Target size of each section sent to the per-section summary call.
+    SECTION_TOKEN_BUDGET: int = 650
+
+    # Sections summarized per request. Larger batches mean fewer requests (less
+    # per-request overhead, easier on rate limits) but a slower slowest request.
+    SECTION_BATCH_SIZE: int = 1
+
+    # Flashcards generated on demand, kept in memory per lecture + parameters.
+    FLASHCARD_CACHE_ENTRIES: int = 512
+    FLASHCARD_DEFAULT_COUNT: int = 15
+
+    # Failed section calls are retried with jittered exponential backoff; calls slower
+    # than the recent p95 latency get a duplicate (hedged) request.
+    SECTION_MAX_ATTEMPTS: int = 3
+    SECTION_RETRY_BASE_SECONDS: float = 1.0
+    SECTION_HEDGE_REQUESTS: bool = True
+
+    # Summaries run as a stage graph (split, map, overall, assemble). These cap how
+    # many lectures can be in the map / overall stage at once; 0 means no cap.
+    SUMMARY_MAP_STAGE_CONCURRENCY: int = 0
+    SUMMARY_OVERALL_STAGE_CONCURRENCY: int = 0
+
+    # When the LLM summary fails, takes longer than this, or the LLM queue is this
+    # deep, lectures get extractive notes marked provisional; an LLM upgrade is
+    # retried in the background with exponential backoff.
+    SUMMARY_TIMEOUT_SECONDS: float = 300.0
+    EXTRACTIVE_FALLBACK_QUEUE_DEPTH: int = 200
+    PROVISIONAL_UPGRADE_DELAY_SECONDS: float = 60.0
+    PROVISIONAL_UPGRADE_MAX_ATTEMPTS: int = 6
+
+    # Text extraction from uploaded files runs in worker processes: at most this many
+    # at once, each killed after the timeout or when it allocates over the limit.
+    EXTRACTION_WORKERS: int = 2
+    EXTRACTION_TIMEOUT_SECONDS: float = 60.0
+    EXTRACTION_MEMORY_LIMIT_MB: int = 1024
+    # PDFs with at least twice this many pages are split into page ranges of at
+    # least this size, extracted in parallel by up to EXTRACTION_WORKERS processes.
+    EXTRACTION_PDF_PAGES_PER_WORKER: int = 50
+    # Extraction stops reading a file after this many words. Long uploads are
+    # compressed to UPLOAD_TOKEN_BUDGET afterwards, so this is only a ceiling on
+    # parsing work for huge documents, not the amount that gets summarized.
+    EXTRACTION_WORD_LIMIT: int = 200000
+    # Extracted text is cached by a hash of the uploaded bytes, so re-uploads of the
+    # same file skip parsing. The SQLite store is bounded by entries and total size.
+    EXTRACTION_CACHE_MEMORY_ENTRIES: int = 16
+    EXTRACTION_CACHE_PATH: str | None = ".cache/extractions.sqlite3"
+    EXTRACTION_CACHE_MAX_ENTRIES: int = 2000
+    EXTRACTION_CACHE_MAX_MB: int = 512
+
+    # Recordings (WAV/AIFF/MP3) uploaded through /ws/process-upload are transcribed
+    # with batch STT: WAV and AIFF in chunks of STT_BATCH_CHUNK_SECONDS, up to
+    # STT_BATCH_MAX_PARALLEL at once, so an hour of audio takes minutes.
+    AUDIO_UPLOAD_MAX_MB: int = 500
+    STT_BATCH_CHUNK_SECONDS: float = 300.0
+    STT_BATCH_MAX_PARALLEL: int = 6
+    STT_BATCH_TIMEOUT_SECONDS: float = 600.0
+
+    # Uploads are processed as jobs in a durable SQLite queue (see app/jobs.py).
+    # JOB_WORKERS is how many jobs this API process runs at once; set it to 0 and run
+    # `python -m app.worker` processes against the same JOB_DB_PATH to scale
+    # workers separately. Uploaded files wait in JOB_STORAGE_DIR until processed.
+    JOB_DB_PATH: str = ".cache/jobs.sqlite3"
+    JOB_STORAGE_DIR: str = ".cache/job-files"
+    JOB_WORKERS: int = 2
+    # A job whose worker stops renewing its lease for this long is picked up again.
+    JOB_LEASE_SECONDS: float = 60.0
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_POLL_INTERVAL_SECONDS: float = 0.25
+
+    # Strip fillers ("um", "uh"), false starts and repeated words from the copy of
+    # the transcript sent to the LLM. Applies to live sessions and recording
+    # uploads only; the stored transcript is left as spoken.
+    TRANSCRIPT_CLEANUP: bool = True
+
+    # "full" resends the transcript for the overall notes; "reduce" builds them from section summaries.
+    OVERALL_SUMMARY_MODE: str = "full"
+    REDUCE_FAN_IN: int = 12
+    # Uploads longer than this many tokens are compressed to it by keeping the
+    # highest-ranked sentences of every part of the document. Reduce mode never
+    # sends the whole transcript in one prompt, so it can afford a much larger budget.
+    UPLOAD_TOKEN_BUDGET: int = 20000
+    REDUCE_UPLOAD_TOKEN_BUDGET: int = 133000
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,422 @@
+"""
+Text extraction for uploaded documents.
+
+Uploads arrive as binary websocket frames and are spooled to a temporary file as
+they come in (see `UploadSpool`), so the size limit is enforced while receiving
+and extraction reads from a file handle instead of copies of the bytes in memory.
+
+Parsing a large PDF, DOCX or PPTX is CPU-bound and would stall every other
+websocket on the event loop, so `ExtractionPool` runs it in separate worker
+processes with a timeout and a memory limit. Long PDFs are split into page
+ranges that are extracted in parallel and joined back in order.
+"""
+import asyncio
+import hashlib
+import io
+import itertools
+import multiprocessing
+import os
+import re
+import resource
+import shutil
+import tempfile
+import time
+from collections import deque
+
+import docx
+import pptx
+import pypdf
+
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".pptx", ".txt")
+# Bump whenever extraction output changes, so cached texts from older code are not served.
+EXTRACTOR_VERSION = "2"
+
+
+class UploadTooLarge(ValueError):
+    """Raised as soon as an upload goes over MAX_UPLOAD_BYTES."""
+
+
+class UploadSpool:
+    """
+    Temporary file an upload is written to chunk by chunk. Closing it deletes the
+    file, so use it as a context manager.
+    """
+
+    def __init__(self, filename: str, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.size = 0
+        # Hashed as it arrives, for the extraction cache.
+        self.sha256 = hashlib.sha256()
+        suffix = os.path.splitext(filename)[1].lower()
+        self.file = tempfile.NamedTemporaryFile(prefix="upload-", suffix=suffix)
+
+    @property
+    def path(self) -> str:
+        return self.file.name
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"File size exceeds the {self.max_bytes // (1024 * 1024)}MB limit.")
+        self.sha256.update(chunk)
+        self.file.write(chunk)
+
+    def finish(self):
+        """Flush what was received and return the file handle, rewound for reading."""
+        self.file.flush()
+        self.file.seek(0)
+        return self.file
+
+    def save_as(self, path: str) -> None:
+        """Copy what was received to `path`, which outlives the spool."""
+        self.file.flush()
+        shutil.copyfile(self.path, path)
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "UploadSpool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def extraction_cache_key(spool: UploadSpool, max_words: int | None) -> str:
+    """
+    Cache key for the text of an upload: the hash of its bytes, plus everything
+    else that changes what extraction returns (file type, word limit, extractor version).
+    """
+    extension = os.path.splitext(spool.filename)[1].lower()
+    return f"extract:{EXTRACTOR_VERSION}:{extension}:{max_words}:{spool.sha256.hexdigest()}"
+
+
+def check_supported(filename: str) -> None:
+    if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+        raise ValueError("Unsupported file type.")
+
+
+_WORD_RE = re.compile(r"\S+")
+TEXT_CHUNK_CHARS = 64 * 1024
+
+
+def count_pdf_pages(path: str) -> int:
+    with open(path, "rb") as file:
+        return len(pypdf.PdfReader(file).pages)
+
+
+def split_page_ranges(page_count: int, parts: int) -> list[tuple[int, int]]:
+    """`parts` contiguous (start, stop) page ranges of near-equal size covering every page."""
+    size, extra = divmod(page_count, parts)
+    ranges, start = [], 0
+    for part in range(parts):
+        stop = start + size + (1 if part < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def iter_text(file, filename: str, pages: tuple[int, int] | None = None):
+    """
+    Yield (text, done, total) for each page, paragraph or slide of an uploaded
+    PDF, DOCX, PPTX or TXT file (TXT in fixed-size chunks, counted in bytes).
+    Parts are produced lazily, so a caller that stops early skips the rest.
+    For a PDF, `pages` limits it to the (start, stop) page range.
+    """
+    check_supported(filename)
+    name = filename.lower()
+    if name.endswith(".pdf"):
+        reader = pypdf.PdfReader(file)
+        start, stop = pages or (0, len(reader.pages))
+        total = stop - start
+        for number, index in enumerate(range(start, stop), 1):
+            yield reader.pages[index].extract_text() or "", number, total
+    elif name.endswith(".docx"):
+        paragraphs = docx.Document(file).paragraphs
+        for number, para in enumerate(paragraphs, 1):
+            yield para.text + "\n", number, len(paragraphs)
+    elif name.endswith(".pptx"):
+        slides = pptx.Presentation(file).slides
+        total = len(slides)
+        for number, slide in enumerate(slides, 1):
+            yield "".join(shape.text + "\n" for shape in slide.shapes if hasattr(shape, "text")), number, total
+    else:
+        total = file.seek(0, os.SEEK_END)
+        file.seek(0)
+        reader = io.TextIOWrapper(file, encoding="utf-8")
+        done = 0
+        carry = ""
+        try:
+            for chunk in iter(lambda: reader.read(TEXT_CHUNK_CHARS), ""):
+                done += len(chunk.encode("utf-8"))
+                # End each part at whitespace so no word is split across two parts.
+                text = carry + chunk
+                boundary = max(text.rfind(" "), text.rfind("\n")) + 1 or len(text)
+                carry = text[boundary:]
+                yield text[:boundary], min(done, total), total
+            if carry:
+                yield carry, total, total
+        finally:
+            # Leave the caller's file handle open.
+            reader.detach()
+
+
+def truncate_words(text: str, max_words: int) -> str:
+    """`text` up to the end of its `max_words`-th word."""
+    last_word = next(itertools.islice(_WORD_RE.finditer(text), max_words - 1, None), None)
+    return text if last_word is None else text[:last_word.end()]
+
+
+def extract_text(file, filename: str, on_progress=None, max_words: int | None = None, pages: tuple[int, int] | None = None) -> str:
+    """
+    Text of an uploaded PDF, DOCX, PPTX or TXT file, read from a binary file handle.
+    `on_progress(done, total)` is called after each page, paragraph or slide.
+    With `max_words`, extraction stops as soon as that many words have been read.
+    `pages` restricts a PDF to a (start, stop) page range.
+    """
+    parts = []
+    words = 0
+    for text, done, total in iter_text(file, filename, pages):
+        if max_words is not None:
+            count = len(_WORD_RE.findall(text))
+            if words + count >= max_words:
+                # Keep the words that still fit and skip the rest of the file.
+                parts.append(truncate_words(text, max_words - words))
+                if on_progress is not None:
+                    on_progress(total, total)
+                break
+            words += count
+        parts.append(text)
+        if on_progress is not None:
+            on_progress(done, total)
+    return "".join(parts)
+
+
+class ExtractionError(Exception):
+    """Extraction failed, timed out or ran out of memory; the message is shown to the user."""
+
+
+def _limit_memory(extra_bytes: int) -> None:
+    # A forked worker starts with the parent's address space, so the limit is on
+    # what the job adds on top of that.
+    with open("/proc/self/statm") as statm:
+        current = int(statm.read().split()[0]) * resource.getpagesize()
+    limit = current + extra_bytes
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _extraction_worker(conn, path: str, filename: str, memory_limit_bytes: int, max_words: int | None, pages: tuple[int, int] | None) -> None:
+    """Entry point of an extraction process; reports back over `conn`."""
+    try:
+        if memory_limit_bytes:
+            _limit_memory(memory_limit_bytes)
+        last_percent = -1
+
+        def on_progress(done: int, total: int) -> None:
+            nonlocal last_percent
+            percent = done * 100 // max(total, 1)
+            if percent != last_percent:
+                last_percent = percent
+                conn.send(("progress", done, total))
+
+        with open(path, "rb") as file:
+            if pages is None:
+                text = extract_text(file, filename, on_progress, max_words)
+            else:
+                text = extract_text(file, filename, on_progress, max_words, pages=pages)
+        conn.send(("done", text))
+    except MemoryError:
+        conn.send(("error", "This file needs too much memory to process."))
+    except Exception as e:
+        conn.send(("error", str(e)))
+    finally:
+        conn.close()
+
+
+class ExtractionPool:
+    """
+    Runs `extract_text` in worker processes, at most `max_workers` at a time; jobs
+    beyond that wait their turn. Each job gets its own process so a job that
+    times out or runs away with memory can be killed without affecting the others.
+
+    Processes are started through a fork server by default: forking the server
+    itself, which runs asyncio, uvicorn, httpx and SQLite threads, could hand a
+    child a lock some other thread held, and the child would hang until the
+    timeout. The fork server is single-threaded and preloads this module, so a
+    job doesn't pay for importing the document libraries. `start_method="fork"`
+    lets tests patch the extractor in the parent.
+
+    A PDF with at least 2 * `pdf_pages_per_worker` pages is split into up to
+    `max_workers` page ranges, each extracted by its own process (taking a worker
+    slot like any other job). Smaller files stay on a single process, where the
+    cost of forking and re-reading the PDF structure per range isn't worth it.
+    With a word limit, later ranges are stopped as soon as the earlier ones,
+    taken in page order, already reach it.
+    """
+
+    def __init__(self, max_workers: int = 2, timeout_seconds: float = 60.0, memory_limit_mb: int = 1024, pdf_pages_per_worker: int = 50, start_method: str = "forkserver"):
+        self.max_workers = max(1, max_workers)
+        self.timeout_seconds = timeout_seconds
+        self.memory_limit_bytes = memory_limit_mb * 1024 * 1024
+        self.pdf_pages_per_worker = max(1, pdf_pages_per_worker)
+        self._context = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            self._context.set_forkserver_preload([__name__])
+        self._active = 0
+        self._waiters: deque = deque()
+        self._recent_waits: deque = deque(maxlen=200)
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+
+    async def _acquire(self) -> None:
+        while self._active >= self.max_workers:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if not waiter.done():
+                    waiter.cancel()
+        self._active += 1
+
+    def _release(self) -> None:
+        self._active -= 1
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    async def extract(self, path: str, filename: str, on_progress=None, max_words: int | None = None) -> str:
+        """
+        Extract the text of the file at `path`, up to `max_words` words.
+        `await on_progress(done, total)` is called as pages, paragraphs or slides
+        are processed. Raises ExtractionError.
+        """
+        check_supported(filename)
+        if filename.lower().endswith(".pdf") and self.max_workers > 1:
+            try:
+                page_count = await asyncio.to_thread(count_pdf_pages, path)
+            except Exception as e:
+                raise ExtractionError(str(e))
+            parts = min(self.max_workers, page_count // self.pdf_pages_per_worker)
+            if parts > 1:
+                return await self._extract_page_ranges(path, filename, on_progress, max_words, page_count, parts)
+        return await self._run_slot(path, filename, on_progress, max_words, None)
+
+    async def _extract_page_ranges(self, path: str, filename: str, on_progress, max_words: int | None, page_count: int, parts: int) -> str:
+        done_per_range = [0] * parts
+
+        def range_progress(index: int):
+            async def report(done: int, total: int) -> None:
+                done_per_range[index] = done
+                if on_progress is not None:
+                    await on_progress(sum(done_per_range), page_count)
+            return report
+
+        ranges = split_page_ranges(page_count, parts)
+        print(f"Extracting {filename} ({page_count} pages) in {parts} parallel page ranges")
+        tasks = [
+            asyncio.ensure_future(self._run_slot(path, filename, range_progress(index), max_words, pages))
+            for index, pages in enumerate(ranges)
+        ]
+        # Words in each finished range, in page order, up to the first unfinished one.
+        prefix_words: list[int] = []
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+                if max_words is None:
+                    continue
+                while len(prefix_words) < parts and tasks[len(prefix_words)].done():
+                    prefix_words.append(sum(1 for _ in _WORD_RE.finditer(tasks[len(prefix_words)].result())))
+                if sum(prefix_words) >= max_words:
+                    # The earlier ranges already fill the limit, so the later ones
+                    # would be thrown away; stop their processes.
+                    for task in pending:
+                        task.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+                    break
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        if max_words is None:
+            return "".join(task.result() for task in tasks)
+        # Each range stops at max_words on its own; the limit applies to the whole document.
+        return truncate_words("".join(task.result() for task in tasks[:len(prefix_words)]), max_words)
+
+    async def _run_slot(self, path: str, filename: str, on_progress, max_words: int | None, pages: tuple[int, int] | None) -> str:
+        enqueued_at = time.monotonic()
+        await self._acquire()
+        self._recent_waits.append(time.monotonic() - enqueued_at)
+        try:
+            return await self._run(path, filename, on_progress, max_words, pages)
+        finally:
+            self._release()
+
+    async def _run(self, path: str, filename: str, on_progress, max_words: int | None, pages: tuple[int, int] | None) -> str:
+        loop = asyncio.get_running_loop()
+        messages: asyncio.Queue = asyncio.Queue()
+        parent_conn, child_conn = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_extraction_worker,
+            args=(child_conn, path, filename, self.memory_limit_bytes, max_words, pages),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+
+        def on_readable() -> None:
+            try:
+                messages.put_nowait(parent_conn.recv())
+            except (EOFError, OSError):
+                loop.remove_reader(parent_conn.fileno())
+                messages.put_nowait(("error", "The extraction process stopped unexpectedly."))
+
+        loop.add_reader(parent_conn.fileno(), on_readable)
+        deadline = loop.time() + self.timeout_seconds
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                message = await asyncio.wait_for(messages.get(), remaining)
+                if message[0] == "progress":
+                    if on_progress is not None:
+                        await on_progress(message[1], message[2])
+                elif message[0] == "done":
+                    self.completed += 1
+                    return message[1]
+                else:
+                    self.failed += 1
+                    raise ExtractionError(message[1])
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise ExtractionError(f"Reading the file took longer than {self.timeout_seconds:.0f} seconds.")
+        finally:
+            loop.remove_reader(parent_conn.fileno())
+            parent_conn.close()
+            if process.is_alive():
+                process.kill()
+            await asyncio.to_thread(process.join)
+
+    def stats(self) -> dict:
+        waits = sorted(self._recent_waits)
+        return {
+            "max_workers": self.max_workers,
+            "active": self._active,
+            "queued": sum(1 for waiter in self._waiters if not waiter.done()),
+            "saturation": round(self._active / self.max_workers, 3),
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "avg_wait_seconds": sum(waits) / len(waits) if waits else 0.0,
+            "p95_wait_seconds": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+        }
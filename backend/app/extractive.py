@@ -0,0 +1,278 @@
+"""
+CPU-only extractive summarization.
+
+`extractive_summary` is the fallback for when the LLM is down, rate-limited or
+too slow. It builds the same marker-delimited notes as the LLM overall call
+(including the SECTION_SUMMARIES block) from sentences and phrases taken verbatim
+from the transcript: sentences are ranked with TextRank inside each section, key
+phrases are scored across sections. Notes made this way are stored as provisional
+and replaced once the LLM is back.
+
+`compress_to_budget` uses the same sentence ranking to fit long uploads into the
+LLM token budget while still covering the whole document.
+"""
+import json
+import math
+import re
+from collections import Counter
+
+from .chunker import chunk_spans, count_tokens, DEFAULT_SECTION_TOKENS
+
+# A sentence ends at its punctuation or, for unpunctuated lines, at the line end.
+_SENTENCE_RE = re.compile(r"[^.!?\n]+(?:[.!?]+[\"')\]]*|(?=\n)|$)")
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]*[A-Za-z]|[A-Za-z]")
+_EXAMPLE_RE = re.compile(r"\b(?:for example|for instance|such as|e\.g|imagine|suppose)\b", re.IGNORECASE)
+
+# Function words plus the spoken fillers that dominate lecture transcripts.
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are aren't as at be because been before being below
+between both but by can can't cannot could couldn't did didn't do does doesn't doing don't down during each
+even ever every few for from further get gets getting go goes going gonna got had hadn't has hasn't have
+haven't having he her here hers herself him himself his how i if in into is isn't it it's its itself just
+kind know let let's like lot lots make makes many may maybe me might more most much must my myself need new
+no nor not now of off okay ok on once one only or other our ours ourselves out over own part pretty quite
+really right said same say says see she should shouldn't so some something sort still such sure take than
+that that's the their theirs them themselves then there there's these they they're thing things think this
+those though through to today too two um uh under until up us use used using very want wanna was wasn't way
+we we're well were weren't what what's when where which while who whom why will with won't would wouldn't
+yeah yes yet you you're your yours yourself yourselves actually basically gonna kinda alright anyway
+""".split())
+
+DAMPING = 0.85
+ITERATIONS = 30
+MIN_SENTENCE_WORDS = 4
+MAX_MAIN_POINTS = 12
+
+
+def _content_words(text: str) -> list[str]:
+    return [word for word in (w.lower() for w in _WORD_RE.findall(text)) if word not in STOPWORDS and len(word) > 2]
+
+
+def split_sentences(text: str, min_words: int = MIN_SENTENCE_WORDS) -> list[str]:
+    """Sentences (or lines) of at least `min_words` words, whitespace-normalized."""
+    sentences = []
+    for match in _SENTENCE_RE.finditer(text):
+        sentence = " ".join(match.group(0).split())
+        if sentence and sentence.count(" ") + 1 >= min_words:
+            sentences.append(sentence)
+    return sentences
+
+
+def textrank(word_sets: list[set[str]]) -> list[float]:
+    """
+    TextRank scores for sentences given their content-word sets. Similarity is the
+    original word-overlap measure, |Si & Sj| / (log|Si| + log|Sj|), and the edges
+    are found through an inverted index so unrelated pairs are never visited.
+    """
+    n = len(word_sets)
+    if n == 0:
+        return []
+    postings: dict[str, list[int]] = {}
+    for i, words in enumerate(word_sets):
+        for word in words:
+            postings.setdefault(word, []).append(i)
+
+    overlap: list[Counter] = [Counter() for _ in range(n)]
+    for indices in postings.values():
+        for a in range(len(indices)):
+            for b in range(a + 1, len(indices)):
+                overlap[indices[a]][indices[b]] += 1
+                overlap[indices[b]][indices[a]] += 1
+
+    lengths = [math.log(len(words)) if len(words) > 1 else 0.0 for words in word_sets]
+    edges = [
+        {j: count / (lengths[i] + lengths[j]) for j, count in overlap[i].items() if lengths[i] + lengths[j] > 0}
+        for i in range(n)
+    ]
+    out_weight = [sum(weights.values()) for weights in edges]
+    # The graph is symmetric, so edges[i] also lists i's incoming edges; normalize them once.
+    incoming = [[(j, weight / out_weight[j]) for j, weight in edges[i].items()] for i in range(n)]
+
+    scores = [1.0] * n
+    for _ in range(ITERATIONS):
+        scores = [(1 - DAMPING) + DAMPING * sum(scores[j] * weight for j, weight in incoming[i]) for i in range(n)]
+    return scores
+
+
+def _phrases(sentence: str) -> list[str]:
+    """Candidate key phrases: runs of up to three adjacent content words."""
+    phrases, run = [], []
+    for word in (w.lower() for w in _WORD_RE.findall(sentence)):
+        if word in STOPWORDS or len(word) <= 2:
+            run = []
+            continue
+        run.append(word)
+        for size in range(1, min(3, len(run)) + 1):
+            phrases.append(" ".join(run[-size:]))
+    return phrases
+
+
+def key_phrases(sections: list[list[str]], limit: int) -> list[str]:
+    """
+    Phrases that recur in the lecture but are not spread evenly over it, scored
+    by TF-IDF with sections as documents. A longer phrase is preferred over
+    the words inside it when it occurs as often.
+    """
+    term_counts = Counter()
+    section_counts = Counter()
+    for sentences in sections:
+        seen = set()
+        for sentence in sentences:
+            for phrase in _phrases(sentence):
+                term_counts[phrase] += 1
+                seen.add(phrase)
+        section_counts.update(seen)
+
+    total_sections = len(sections)
+    scored = []
+    for phrase, count in term_counts.items():
+        size = phrase.count(" ") + 1
+        if size > 1 and count < 2:
+            continue
+        idf = math.log(1 + total_sections / section_counts[phrase])
+        scored.append((count * idf * (1 + 0.5 * (size - 1)), phrase))
+    scored.sort(reverse=True)
+
+    chosen: list[str] = []
+    for _, phrase in scored:
+        if any(phrase in other or other in phrase for other in chosen):
+            continue
+        chosen.append(phrase)
+        if len(chosen) == limit:
+            break
+    return chosen
+
+
+def _title_case(phrase: str) -> str:
+    return " ".join(word[:1].upper() + word[1:] for word in phrase.split())
+
+
+def _ranked(sentences: list[str]) -> list[tuple[float, int]]:
+    """(score, index) pairs for the sentences, best first."""
+    scores = textrank([set(_content_words(sentence)) for sentence in sentences])
+    return sorted(((score, i) for i, score in enumerate(scores)), key=lambda pair: (-pair[0], pair[1]))
+
+
+def _section_summary(number: int, sentences: list[str], ranked: list[tuple[float, int]]) -> dict:
+    phrases = key_phrases([sentences], 3)
+    takeaways = [sentences[i] for _, i in sorted(ranked[:3], key=lambda pair: pair[1])]
+    return {
+        "section_title": _title_case(phrases[0]) if phrases else f"Section {number}",
+        "key_takeaways": takeaways,
+        "new_vocabulary": [_title_case(phrase) for phrase in phrases],
+        "study_questions": [f"What does this part of the lecture say about {phrases[0]}?"] if phrases else [],
+        "examples": [sentence for sentence in sentences if _EXAMPLE_RE.search(sentence)][:2],
+        "useful_references": [],
+    }
+
+
+def _notes_block(marker: str, content: str) -> str:
+    return f"@@{marker}_START@@\n{content}\n@@{marker}_END@@"
+
+
+def extractive_summary(transcript: str, section_tokens: int = DEFAULT_SECTION_TOKENS) -> str:
+    """
+    Notes for `transcript` in the format `Summarizer.parse_structured_summary`
+    reads, built without any LLM call.
+    """
+    sections = [split_sentences(transcript[start:end]) for start, end in chunk_spans(transcript, section_tokens)]
+    sections = [sentences for sentences in sections if sentences] or [[" ".join(transcript.split())]]
+    rankings = [_ranked(sentences) for sentences in sections]
+
+    concepts = key_phrases(sections, 8)
+    concept_words = set(" ".join(concepts).split())
+
+    # Each section's best sentence, in lecture order; trimmed to the best-scoring
+    # ones (still in order) when there are more sections than main points.
+    leads = [(ranking[0][0], number, sections[number][ranking[0][1]]) for number, ranking in enumerate(rankings)]
+    if len(leads) > MAX_MAIN_POINTS:
+        leads = sorted(sorted(leads, reverse=True)[:MAX_MAIN_POINTS], key=lambda lead: lead[1])
+    main_points = [sentence for _, _, sentence in leads]
+
+    def coverage(sentence: str) -> int:
+        return len(concept_words & set(_content_words(sentence)))
+
+    topic_sentence = max(main_points, key=coverage)
+    conclusion = " ".join(sorted(main_points, key=coverage, reverse=True)[:3])
+
+    all_sentences = [sentence for sentences in sections for sentence in sentences]
+    flashcards = []
+    for concept in concepts:
+        answer = next((sentence for sentence in main_points + all_sentences if concept in sentence.lower()), None)
+        if answer:
+            flashcards.append({"question": f"What does the lecture say about {concept}?", "answer": answer})
+
+    questions = [f"What is meant by {concept}?" for concept in concepts[:3]]
+    questions += [f"How does {a} relate to {b}?" for a, b in zip(concepts[:2], concepts[2:4])]
+    questions += [f"Why is {concept} important in this lecture?" for concept in concepts[4:6]]
+
+    title = " and ".join(_title_case(concept) for concept in concepts[:2]) or "Lecture Notes"
+    section_summaries = [
+        _section_summary(number, sentences, ranking)
+        for number, (sentences, ranking) in enumerate(zip(sections, rankings), 1)
+    ]
+    return "\n\n".join([
+        _notes_block("LECTURE_TITLE", title),
+        _notes_block("TOPIC_SUMMARY", topic_sentence),
+        _notes_block("KEY_CONCEPTS", "\n".join(f"- {_title_case(concept)}" for concept in concepts[:4]) or "None"),
+        _notes_block("MAIN_POINTS", "\n".join(f"- {point}" for point in main_points) or "None"),
+        _notes_block("CONCLUSION_TAKEAWAYS", conclusion),
+        _notes_block("STUDY_QUESTIONS", "\n".join(f"- {question}" for question in questions) or "None"),
+        _notes_block("FLASHCARDS", json.dumps(flashcards)),
+        _notes_block("OPTIONAL_REFERENCES", "[]"),
+        _notes_block("SECTION_SUMMARIES", json.dumps(section_summaries, indent=2)),
+    ]) + "\n"
+
+
+def _head(text: str, max_tokens: int) -> str:
+    """The start of `text` up to `max_tokens`, cut at a boundary where possible."""
+    if max_tokens < 1:
+        return ""
+    spans = chunk_spans(text, max_tokens)
+    return text[spans[0][0]:spans[0][1]] if spans else ""
+
+
+def compress_to_budget(text: str, max_tokens: int, section_tokens: int = DEFAULT_SECTION_TOKENS) -> str:
+    """
+    Shorten `text` to at most about `max_tokens` by keeping the highest-ranked
+    sentences of every section, in their original order. Each section keeps a
+    share of the budget proportional to its length (unused budget carries over to
+    the next), so the end of a long document is covered as well as the start.
+    Text already within the budget is returned unchanged; non-empty text never
+    compresses to nothing.
+    """
+    total_tokens = count_tokens(text)
+    if total_tokens <= max_tokens:
+        return text
+
+    ratio = max_tokens / total_tokens
+    carry = 0.0
+    kept_sections = []
+    for start, end in chunk_spans(text, section_tokens):
+        # Short lines count too (headings, bullet points, slide text), so a
+        # document made of them is not compressed to nothing.
+        sentences = split_sentences(text[start:end], min_words=1)
+        budget = count_tokens(text, start, end) * ratio + carry
+        used = 1  # The paragraph break joining this section to the previous one.
+        kept = []
+        ranked = _ranked(sentences)
+        for _, i in ranked:
+            cost = count_tokens(sentences[i])
+            # Skip a sentence that doesn't fit; a shorter, lower-ranked one may.
+            if used + cost <= budget:
+                kept.append(i)
+                used += cost
+        if kept:
+            section_text = " ".join(sentences[i] for i in sorted(kept))
+        elif ranked:
+            # Even the best sentence is over this section's share: keep its start.
+            section_text = _head(sentences[ranked[0][1]], int(budget) - used)
+            used += count_tokens(section_text) if section_text else 0
+        else:
+            section_text = ""
+        if section_text:
+            kept_sections.append(section_text)
+            carry = budget - used
+        else:
+            carry = budget
+    return "\n\n".join(kept_sections) or _head(text, max_tokens)
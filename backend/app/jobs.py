@@ -0,0 +1,272 @@
+"""
+Durable queue for background work, stored in SQLite.
+
+Uploads are submitted as jobs instead of being processed inside the websocket
+handler, so closing the tab does not lose the work. Workers (`JobWorkers`, run in
+the API process or in separate `python -m app.worker` processes sharing the same
+database file) claim jobs and record their progress as events; any connection
+can follow a job by ID with `follow_job` and replay the events it missed.
+
+A claimed job holds a lease that its worker keeps renewing. If the worker dies,
+the lease runs out and another worker claims the job again, so jobs survive
+restarts. Handlers record checkpoints to skip finished steps when resumed.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+TERMINAL_STATUSES = ("done", "failed")
+
+
+class JobStore:
+    """
+    Jobs and their progress events in a single SQLite file. Safe to share between
+    threads and between processes (WAL mode, claims are a single UPDATE).
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 60.0, max_attempts: int = 3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, user_id TEXT NOT NULL, status TEXT NOT NULL,"
+            " payload TEXT NOT NULL, checkpoint TEXT NOT NULL DEFAULT '{}', error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0, worker_id TEXT, lease_until REAL,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);"
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT NOT NULL, message TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, seq);"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _row_to_job(row) -> dict:
+        job_id, kind, user_id, status, payload, checkpoint, error, attempts, created_at = row
+        return {
+            "id": job_id,
+            "kind": kind,
+            "user_id": user_id,
+            "status": status,
+            "payload": json.loads(payload),
+            "checkpoint": json.loads(checkpoint),
+            "error": error,
+            "attempts": attempts,
+            "created_at": created_at,
+        }
+
+    _JOB_COLUMNS = "id, kind, user_id, status, payload, checkpoint, error, attempts, created_at"
+
+    def submit(self, kind: str, user_id: str, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, user_id, status, payload, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, user_id, json.dumps(payload), now, now),
+            )
+            self._conn.commit()
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {self._JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def claim(self, worker_id: str) -> dict | None:
+        """
+        Take the oldest queued job, or a running one whose worker stopped renewing
+        its lease. Jobs that have already been tried `max_attempts` times fail instead.
+        """
+        now = time.time()
+        with self._lock:
+            abandoned = self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ?"
+                " WHERE status = 'running' AND lease_until < ? AND attempts >= ? RETURNING id",
+                ("The job was interrupted too many times.", now, now, self.max_attempts),
+            ).fetchall()
+            for (job_id,) in abandoned:
+                self._add_event(job_id, {"error": "An error occurred: processing was interrupted too many times."})
+            row = self._conn.execute(
+                "UPDATE jobs SET status = 'running', worker_id = ?, lease_until = ?, attempts = attempts + 1, updated_at = ?"
+                " WHERE id = (SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)"
+                " ORDER BY created_at LIMIT 1)"
+                f" RETURNING {self._JOB_COLUMNS}",
+                (worker_id, now + self.lease_seconds, now, now),
+            ).fetchone()
+            self._conn.commit()
+        return self._row_to_job(row) if row else None
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Renew the lease; False if the job is no longer this worker's."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (now + self.lease_seconds, now, job_id, worker_id),
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def checkpoint(self, job_id: str, values: dict) -> None:
+        """Merge `values` into the job's checkpoint, which is handed back if the job is resumed."""
+        with self._lock:
+            (current,) = self._conn.execute("SELECT checkpoint FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            self._conn.execute(
+                "UPDATE jobs SET checkpoint = ?, updated_at = ? WHERE id = ?",
+                (json.dumps({**json.loads(current), **values}), time.time(), job_id),
+            )
+            self._conn.commit()
+
+    def _add_event(self, job_id: str, message: dict) -> int:
+        return self._conn.execute(
+            "INSERT INTO job_events (job_id, message) VALUES (?, ?)", (job_id, json.dumps(message))
+        ).lastrowid
+
+    def add_event(self, job_id: str, message: dict) -> int:
+        with self._lock:
+            seq = self._add_event(job_id, message)
+            self._conn.commit()
+        return seq
+
+    def finish(self, job_id: str, status: str, message: dict, error: str | None = None) -> None:
+        """Mark the job done or failed, recording `message` as its last event."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id),
+            )
+            self._add_event(job_id, message)
+            self._conn.commit()
+
+    def events(self, job_id: str, after: int = 0) -> list[tuple[int, dict]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, message FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+            ).fetchall()
+        return [(seq, json.loads(message)) for seq, message in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            (oldest,) = self._conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()
+        return {
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_queued_seconds": round(time.time() - oldest, 3) if oldest else 0.0,
+        }
+
+
+async def follow_job(store: JobStore, job_id: str, after: int = 0, poll_interval: float = 0.25):
+    """
+    Yield (seq, message) for each event of the job after `after`, waiting for new
+    ones until the job is done or failed. Pass the last seq seen to resume.
+    """
+    while True:
+        # Read the status first: a finished job's last event is already stored.
+        job = await asyncio.to_thread(store.get, job_id)
+        if job is None:
+            return
+        for seq, message in await asyncio.to_thread(store.events, job_id, after):
+            after = seq
+            yield seq, message
+        if job["status"] in TERMINAL_STATUSES:
+            return
+        await asyncio.sleep(poll_interval)
+
+
+class JobWorkers:
+    """
+    `concurrency` worker loops that claim jobs from `store` and run the handler
+    for their kind: `await handlers[kind](job, emit)`, where `await emit(message)`
+    records a progress event. The handler's return value is the job's final
+    event; if it raises, the job fails with the error as its final event.
+    """
+
+    def __init__(self, store: JobStore, handlers: dict, concurrency: int = 2, poll_interval: float = 0.5):
+        self.store = store
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_prefix = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def active_workers(self) -> int:
+        """Worker loops currently running in this process."""
+        return sum(1 for task in self._tasks if not task.done())
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._run(f"{self.worker_prefix}-{n}")) for n in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, worker_id: str) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim, worker_id)
+            except sqlite3.Error as e:
+                print(f"Error claiming a job: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self.run_job(job, worker_id)
+
+    async def _keep_lease(self, job_id: str, worker_id: str) -> None:
+        """Renew the job's lease until cancelled; returns if the lease was lost."""
+        while True:
+            await asyncio.sleep(self.store.lease_seconds / 3)
+            if not await asyncio.to_thread(self.store.heartbeat, job_id, worker_id):
+                return
+
+    async def run_job(self, job: dict, worker_id: str) -> None:
+        store = self.store
+        job_id = job["id"]
+        print(f"Worker {worker_id} running {job['kind']} job {job_id} (attempt {job['attempts']}).")
+
+        async def emit(message: dict) -> None:
+            await asyncio.to_thread(store.add_event, job_id, message)
+
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            await asyncio.to_thread(store.finish, job_id, "failed", {"error": f"Unknown job type '{job['kind']}'."}, "unknown kind")
+            return
+        task = asyncio.ensure_future(handler(job, emit))
+        lease_keeper = asyncio.ensure_future(self._keep_lease(job_id, worker_id))
+        try:
+            # If this worker is cancelled (shutdown), both are cancelled below and
+            # the job is claimed again once its lease runs out.
+            await asyncio.wait((task, lease_keeper), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            lease_keeper.cancel()
+            if not task.done():
+                task.cancel()
+        if not task.done() or task.cancelled():
+            print(f"Lost the lease on job {job_id}, stopped it.")
+            return
+        if task.exception() is not None:
+            error = task.exception()
+            print(f"Job {job_id} failed: {error}")
+            await asyncio.to_thread(store.finish, job_id, "failed", {"error": f"An error occurred: {error}"}, str(error))
+            return
+        await asyncio.to_thread(store.finish, job_id, "done", task.result())
@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+import json
+import math
+import random
+import re
+from openai import AsyncOpenAI
+from .chunker import count_tokens
+
+DEFAULT_OPENAI_MODEL = "gpt-3.5-turbo"
+
+
+class Completion:
+    """Text of a finished chat completion plus the token usage reported for it."""
+
+    def __init__(self, text: str, prompt_tokens: int = 0, completion_tokens: int = 0, cached_tokens: int = 0):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.cached_tokens = cached_tokens
+        # Time the call itself took (set by the summarizer, excludes scheduler queueing).
+        self.latency_seconds = 0.0
+
+
+class TokenUsage:
+    """Token totals across every LLM call made for one lecture, overall and per kind of call."""
+
+    FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens")
+
+    def __init__(self):
+        self.totals = dict.fromkeys(self.FIELDS, 0)
+        self.calls = 0
+        self.by_call: dict[str, dict] = {}
+
+    def add(self, completion: Completion, kind: str) -> None:
+        bucket = self.by_call.setdefault(kind, {**dict.fromkeys(self.FIELDS, 0), "calls": 0, "latency_seconds": 0.0})
+        for field in self.FIELDS:
+            self.totals[field] += getattr(completion, field)
+            bucket[field] += getattr(completion, field)
+        bucket["calls"] += 1
+        bucket["latency_seconds"] += completion.latency_seconds
+        self.calls += 1
+
+    @property
+    def total_tokens(self) -> int:
+        return self.totals["prompt_tokens"] + self.totals["completion_tokens"]
+
+    @staticmethod
+    def _cached_ratio(counts: dict) -> float:
+        """Share of prompt tokens served from the provider's prompt cache."""
+        return round(counts["cached_tokens"] / counts["prompt_tokens"], 4) if counts["prompt_tokens"] else 0.0
+
+    def to_dict(self) -> dict:
+        by_call = {
+            kind: {
+                **bucket,
+                "cached_ratio": self._cached_ratio(bucket),
+                "avg_latency_seconds": round(bucket["latency_seconds"] / bucket["calls"], 3),
+            }
+            for kind, bucket in self.by_call.items()
+        }
+        return {
+            **self.totals,
+            "total_tokens": self.total_tokens,
+            "cached_ratio": self._cached_ratio(self.totals),
+            "calls": self.calls,
+            "by_call": by_call,
+        }
+
+
+class LLMBackend(ABC):
+    """
+    Interface the summarizer talks to. `model` identifies the engine in cache keys,
+    so summaries from different backends are never mixed up.
+    """
+
+    model = "unknown"
+
+    @abstractmethod
+    async def complete(self, messages: list[dict], temperature: float = 0.3, json_mode: bool = False) -> Completion:
+        """Run a chat completion and return its text and token usage."""
+
+    @abstractmethod
+    async def stream(self, messages: list[dict], on_delta, temperature: float = 0.3) -> Completion:
+        """Stream a completion, awaiting `on_delta(text)` for every delta, and return the whole of it."""
+
+
+class OpenAIBackend(LLMBackend):
+    def __init__(self, api_key: str, model: str = DEFAULT_OPENAI_MODEL):
+        self.client = AsyncOpenAI(api_key=api_key)
+        self.model = model
+
+    @staticmethod
+    def _usage(usage) -> dict:
+        if usage is None:
+            return {}
+        details = getattr(usage, "prompt_tokens_details", None)
+        return {
+            "prompt_tokens": usage.prompt_tokens or 0,
+            "completion_tokens": usage.completion_tokens or 0,
+            "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details else 0,
+        }
+
+    async def complete(self, messages: list[dict], temperature: float = 0.3, json_mode: bool = False) -> Completion:
+        kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            **kwargs,
+        )
+        return Completion(response.choices[0].message.content, **self._usage(getattr(response, "usage", None)))
+
+    async def stream(self, messages: list[dict], on_delta, temperature: float = 0.3) -> Completion:
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        parts = []
+        usage = None
+        async for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                await on_delta(delta)
+        return Completion("".join(parts), **self._usage(usage))
+
+
+class LocalBackendError(Exception):
+    """Simulated failure raised by `LocalLLMBackend`."""
+
+
+# Marker sections whose content the notes prompt asks to be JSON arrays.
+_LOCAL_JSON_MARKERS = {"FLASHCARDS", "OPTIONAL_REFERENCES"}
+_PROMPT_MARKER_RE = re.compile(r"@@([A-Z_]+)_START@@")
+_PROMPT_FIELD_RE = re.compile(r"^- ([a-z_]+):", re.MULTILINE)
+_WORD_RE = re.compile(r"[A-Za-z][a-z]{4,}")
+# Headings of the batched section prompt (prompts.SECTION_BATCH_HEADING).
+_BATCH_HEADING_RE = re.compile(r"^### Section (\d+)$", re.MULTILINE)
+
+
+class LocalLLMBackend(LLMBackend):
+    """
+    Offline engine for load tests and benchmarks. It answers in whatever shape the
+    prompt asks for (the fields of a JSON object, or the @@X_START@@ sections of the
+    notes format), so the rest of the pipeline runs unchanged.
+
+    Content is a deterministic function of the prompt. Latency is log-normal around
+    `latency_seconds` (a larger `latency_sigma` gives a longer tail), and each call
+    fails with probability `failure_rate`; both are drawn from a generator seeded
+    with `seed`, so a run is reproducible.
+    """
+
+    model = "local-deterministic"
+
+    def __init__(self, latency_seconds: float = 0.5, latency_sigma: float = 0.25, failure_rate: float = 0.0, seed: int = 0):
+        self.latency_seconds = latency_seconds
+        self.latency_sigma = latency_sigma
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+    def _latency(self) -> float:
+        if self.latency_seconds <= 0:
+            return 0.0
+        return self._random.lognormvariate(math.log(self.latency_seconds), self.latency_sigma)
+
+    def _maybe_fail(self) -> None:
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise LocalBackendError("Simulated local backend failure")
+
+    def _respond(self, messages: list[dict], json_mode: bool) -> str:
+        # Instructions may be in the system message; the material is in the last one.
+        prompt = "\n".join(message["content"] for message in messages)
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        words = _WORD_RE.findall(messages[-1]["content"][-4000:]) or ["Lecture", "Topic", "Concept"]
+
+        def phrase(count: int) -> str:
+            return " ".join(rng.choice(words) for _ in range(count))
+
+        def sentence() -> str:
+            return phrase(8).capitalize() + "."
+
+        def references() -> list[dict]:
+            return [{"title": phrase(3).title(), "url": f"https://example.edu/{rng.choice(words).lower()}"} for _ in range(2)]
+
+        def json_object() -> dict:
+            result = {}
+            for field in _PROMPT_FIELD_RE.findall(prompt):
+                if field.endswith("title"):
+                    result[field] = phrase(3).title()
+                elif field.endswith("references"):
+                    result[field] = references()
+                elif field.endswith("flashcards"):
+                    result[field] = [{"question": phrase(5).capitalize() + "?", "answer": sentence()} for _ in range(10)]
+                elif field.endswith("questions"):
+                    result[field] = [phrase(6).capitalize() + "?" for _ in range(2)]
+                elif field.endswith("vocabulary"):
+                    result[field] = [rng.choice(words).capitalize() for _ in range(3)]
+                else:
+                    result[field] = [sentence() for _ in range(2)]
+            return result
+
+        if json_mode:
+            batch_sections = _BATCH_HEADING_RE.findall(messages[-1]["content"])
+            if batch_sections:
+                return json.dumps({"sections": [{"section_number": int(number), **json_object()} for number in batch_sections]})
+            return json.dumps(json_object())
+
+        sections = []
+        for name in dict.fromkeys(_PROMPT_MARKER_RE.findall(prompt)):
+            if name == "FLASHCARDS":
+                body = json.dumps([{"question": phrase(5).capitalize() + "?", "answer": sentence()} for _ in range(10)])
+            elif name in _LOCAL_JSON_MARKERS:
+                body = json.dumps(references())
+            elif name.endswith("TITLE"):
+                body = phrase(3).title()
+            elif name.endswith(("SUMMARY", "TAKEAWAYS")):
+                body = " ".join(sentence() for _ in range(3))
+            elif name.endswith("QUESTIONS"):
+                body = "\n".join(f"- {phrase(6).capitalize()}?" for _ in range(5))
+            else:
+                body = "\n".join(f"- {sentence()}" for _ in range(4))
+            sections.append(f"@@{name}_START@@\n{body}\n@@{name}_END@@")
+        return "\n\n".join(sections) if sections else sentence()
+
+    def _completion(self, messages: list[dict], text: str) -> Completion:
+        prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+        return Completion(text, prompt_tokens=prompt_tokens, completion_tokens=count_tokens(text))
+
+    async def complete(self, messages: list[dict], temperature: float = 0.3, json_mode: bool = False) -> Completion:
+        await asyncio.sleep(self._latency())
+        self._maybe_fail()
+        return self._completion(messages, self._respond(messages, json_mode))
+
+    async def stream(self, messages: list[dict], on_delta, temperature: float = 0.3) -> Completion:
+        latency = self._latency()
+        # Roughly a third of the time goes to the first token, the rest is spread over the stream.
+        await asyncio.sleep(latency / 3)
+        self._maybe_fail()
+        text = self._respond(messages, json_mode=False)
+        chunks = [text[i:i + 40] for i in range(0, len(text), 40)]
+        for chunk in chunks:
+            await asyncio.sleep(latency * 2 / 3 / len(chunks))
+            await on_delta(chunk)
+        return self._completion(messages, text)
+
+
+def create_backend(name: str, api_key: str | None = None, model: str = DEFAULT_OPENAI_MODEL, **local_options) -> LLMBackend:
+    """Build the backend selected by `Settings.LLM_BACKEND` ("openai" or "local")."""
+    if name == "openai":
+        return OpenAIBackend(api_key, model=model)
+    if name == "local":
+        return LocalLLMBackend(**local_options)
+    raise ValueError(f"Unknown LLM backend: {name}")
@@ -0,0 +1,137 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+
+# Lower values are admitted first. Live recordings beat uploads, and within each
+# source paid plans beat the free plan. Background work (e.g. upgrading
+# provisional notes) only runs when nobody is waiting.
+PRIORITY_LIVE_PAID = 0
+PRIORITY_LIVE_FREE = 1
+PRIORITY_UPLOAD_PAID = 2
+PRIORITY_UPLOAD_FREE = 3
+PRIORITY_BACKGROUND = 4
+
+def request_priority(source: str, plan: str | None) -> int:
+    """Map a request source ("live", "upload" or "background") and subscription plan to a queue priority."""
+    if source == "background":
+        return PRIORITY_BACKGROUND
+    paid = plan is not None and plan != "free"
+    if source == "live":
+        return PRIORITY_LIVE_PAID if paid else PRIORITY_LIVE_FREE
+    return PRIORITY_UPLOAD_PAID if paid else PRIORITY_UPLOAD_FREE
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `per_minute / 60` tokens per second."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they already are)."""
+        self._refill()
+        # A single request larger than the whole bucket would otherwise never fit.
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class LLMScheduler:
+    """
+    Process-wide gate in front of every LLM request.
+
+    Requests wait in a priority queue and are admitted only while a global
+    concurrency slot is free and the requests-per-minute and tokens-per-minute
+    buckets can cover them.
+    """
+
+    def __init__(self, max_concurrency: int = 8, requests_per_minute: int = 500, tokens_per_minute: int = 200000):
+        self.max_concurrency = max_concurrency
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self._queue: list = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._recent_waits: deque = deque(maxlen=500)
+        self.total_admitted = 0
+
+    async def run(self, make_call, priority: int = PRIORITY_UPLOAD_FREE, estimated_tokens: int = 1000):
+        """Wait for admission, then await `make_call()` and return its result."""
+        loop = asyncio.get_running_loop()
+        admitted = loop.create_future()
+        enqueued_at = time.monotonic()
+        heapq.heappush(self._queue, (priority, next(self._sequence), estimated_tokens, admitted))
+        self._dispatch()
+
+        try:
+            await admitted
+        except asyncio.CancelledError:
+            if admitted.done() and not admitted.cancelled():
+                # Admitted just before cancellation; give the slot back.
+                self._release()
+            raise
+        self._recent_waits.append(time.monotonic() - enqueued_at)
+
+        try:
+            return await make_call()
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._queue and self._in_flight < self.max_concurrency:
+            _, _, estimated_tokens, admitted = self._queue[0]
+            if admitted.done():
+                # The waiter was cancelled while queued.
+                heapq.heappop(self._queue)
+                continue
+
+            wait = max(self.request_bucket.wait_time(1), self.token_bucket.wait_time(estimated_tokens))
+            if wait > 0:
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(wait, self._on_timer)
+                return
+
+            heapq.heappop(self._queue)
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(estimated_tokens)
+            self._in_flight += 1
+            self.total_admitted += 1
+            admitted.set_result(None)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, _, admitted in self._queue if not admitted.done())
+
+    def stats(self) -> dict:
+        waits = sorted(self._recent_waits)
+        return {
+            "queue_depth": self.queue_depth(),
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "total_admitted": self.total_admitted,
+            "avg_wait_seconds": sum(waits) / len(waits) if waits else 0.0,
+            "p95_wait_seconds": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+        }
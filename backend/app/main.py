@@ -5,11 +5,21 @@ from starlette.websockets import WebSocketState
 from starlette.websockets import WebSocketDisconnect
 from .config import settings
 from .stt import STTClient
-from .summarizer import Summarizer
+from .audio import is_audio_file
+from .summarizer import Summarizer, LiveSectionSummarizer, is_degraded_section, is_summary_error, flashcards_cache_key
+from .extractive import extractive_summary, compress_to_budget
+from .preprocess import clean_transcript, cleanup_report
+from .chunker import load_encoding
+from .extraction import UploadSpool, UploadTooLarge, MAX_UPLOAD_BYTES, ExtractionPool, check_supported, extraction_cache_key
+from .cache import LRUCache, SQLiteCache, TieredCache
+from .jobs import JobStore, JobWorkers, follow_job
+from .llm_scheduler import LLMScheduler, request_priority
+from .llm_backends import create_backend, TokenUsage
+from .prompts import PROMPT_VERSION
 from .db import supabase, get_user_lectures
 from .auth import (
     UserCreate, UserLogin, register_user, login_user, logout_user, 
-    get_current_user, get_authenticated_user_from_header, SupabaseUser, 
+    get_current_user, get_authenticated_user_from_header, get_metrics_user, SupabaseUser, 
     VerifyEmailRequest, AuthResponse, ResendVerificationRequest, 
     resend_verification_email, forgot_password, ForgotPasswordRequest, verify_email
 )
@@ -20,22 +30,37 @@ from .user_usages import (
     update_usage_recordings, 
     get_remaining_uploads_count, 
     get_remaining_recordings_count,
+    get_remaining_tokens_count,
+    update_usage_tokens,
     get_usage_summary,
     reset_user_usage
 )
 import asyncio
+import os
+from contextlib import asynccontextmanager
+import uuid
 import stripe # Added for Stripe integration
 from pydantic import BaseModel # Added for request body model
-import docx
-import pypdf
 from typing import Optional
-import base64
-import io
-import pptx
 import urllib.parse
 import requests
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The tokenizer may be downloaded on first use; load it here, off the event
+    # loop, so no request has to wait for it.
+    await asyncio.to_thread(load_encoding)
+    # Upload job workers; they also resume jobs left unfinished by a previous
+    # process once their leases expire.
+    if settings.JOB_WORKERS > 0:
+        job_workers.start()
+    # Upgrades provisional lectures, starting with any left by a previous process.
+    start_provisional_upgrades()
+    yield
+    await job_workers.stop()
+    await stop_provisional_upgrades()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -44,7 +69,240 @@ app.add_middleware(
 )
 
 # stt_client = STTClient(settings.DEEPGRAM_API_KEY) // Removed global instance
-summarizer = Summarizer(settings.OPENAI_API_KEY)
+summary_cache = TieredCache(
+    LRUCache(settings.SUMMARY_CACHE_MEMORY_ENTRIES),
+    SQLiteCache(settings.SUMMARY_CACHE_PATH, settings.SUMMARY_CACHE_MAX_ENTRIES) if settings.SUMMARY_CACHE_PATH else None,
+)
+llm_scheduler = LLMScheduler(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+)
+llm_backend = create_backend(
+    settings.LLM_BACKEND,
+    api_key=settings.OPENAI_API_KEY,
+    model=settings.LLM_MODEL,
+    latency_seconds=settings.LOCAL_LLM_LATENCY_SECONDS,
+    latency_sigma=settings.LOCAL_LLM_LATENCY_SIGMA,
+    failure_rate=settings.LOCAL_LLM_FAILURE_RATE,
+    seed=settings.LOCAL_LLM_SEED,
+)
+summarizer = Summarizer(
+    backend=llm_backend,
+    cache=summary_cache,
+    scheduler=llm_scheduler,
+    overall_mode=settings.OVERALL_SUMMARY_MODE,
+    reduce_fan_in=settings.REDUCE_FAN_IN,
+    section_tokens=settings.SECTION_TOKEN_BUDGET,
+    section_max_attempts=settings.SECTION_MAX_ATTEMPTS,
+    retry_base_delay=settings.SECTION_RETRY_BASE_SECONDS,
+    hedge_requests=settings.SECTION_HEDGE_REQUESTS,
+    section_batch_size=settings.SECTION_BATCH_SIZE,
+    stage_concurrency={
+        "map": settings.SUMMARY_MAP_STAGE_CONCURRENCY,
+        "overall": settings.SUMMARY_OVERALL_STAGE_CONCURRENCY,
+    },
+)
+flashcard_cache = LRUCache(settings.FLASHCARD_CACHE_ENTRIES)
+extraction_cache = TieredCache(
+    LRUCache(settings.EXTRACTION_CACHE_MEMORY_ENTRIES),
+    SQLiteCache(
+        settings.EXTRACTION_CACHE_PATH,
+        settings.EXTRACTION_CACHE_MAX_ENTRIES,
+        max_bytes=settings.EXTRACTION_CACHE_MAX_MB * 1024 * 1024,
+    ) if settings.EXTRACTION_CACHE_PATH else None,
+)
+extraction_pool = ExtractionPool(
+    max_workers=settings.EXTRACTION_WORKERS,
+    timeout_seconds=settings.EXTRACTION_TIMEOUT_SECONDS,
+    memory_limit_mb=settings.EXTRACTION_MEMORY_LIMIT_MB,
+    pdf_pages_per_worker=settings.EXTRACTION_PDF_PAGES_PER_WORKER,
+)
+job_store = JobStore(settings.JOB_DB_PATH, settings.JOB_LEASE_SECONDS, settings.JOB_MAX_ATTEMPTS)
+os.makedirs(settings.JOB_STORAGE_DIR, exist_ok=True)
+upload_token_budget = settings.REDUCE_UPLOAD_TOKEN_BUDGET if settings.OVERALL_SUMMARY_MODE == "reduce" else settings.UPLOAD_TOKEN_BUDGET
+
+async def get_llm_priority(user_id: str, source: str) -> int:
+    """Queue priority for a user's LLM requests; unknown plans are treated as free."""
+    try:
+        usage = await get_usage(user_id)
+        plan = usage.get("subscription_status")
+    except Exception as e:
+        print(f"Could not determine plan for {user_id}, defaulting to free priority. Error: {e}")
+        plan = None
+    return request_priority(source, plan)
+
+async def has_token_budget(user_id: str) -> bool:
+    """False once the user's plan token budget for this period is used up."""
+    try:
+        remaining = (await get_remaining_tokens_count(user_id))["remaining_tokens"]
+    except Exception as e:
+        print(f"Could not check token budget for {user_id}, allowing the request. Error: {e}")
+        return True
+    return remaining != 0
+
+async def record_token_usage(user_id: str, usage: TokenUsage) -> None:
+    if usage.calls == 0:
+        return
+    try:
+        await update_usage_tokens(user_id, usage.to_dict())
+    except Exception as e:
+        print(f"Failed to record token usage for {user_id}: {e}")
+
+TOKEN_BUDGET_EXHAUSTED = "You have used all of your AI processing budget for this billing period."
+
+def prepare_llm_transcript(transcript: str, token_budget: int | None = None, is_speech: bool = False) -> tuple[str, dict | None]:
+    """
+    The copy of a transcript the LLM sees, plus a report of the tokens saved: for
+    speech (`is_speech`), fillers and repeats are removed, and if `token_budget` is
+    given, text over it is compressed to its most informative sentences. Written
+    text is never cleaned, since the disfluency rules would cut real content. The
+    stored transcript is never changed; the prepared copy is saved with the lecture
+    as `llm_transcript`.
+    """
+    llm_transcript = transcript
+    report = None
+    if is_speech and settings.TRANSCRIPT_CLEANUP:
+        llm_transcript = clean_transcript(transcript)
+        report = log_cleanup_report(transcript, llm_transcript)
+    if token_budget is not None:
+        compressed = compress_to_budget(llm_transcript, token_budget, settings.SECTION_TOKEN_BUDGET)
+        if compressed is not llm_transcript:
+            report = {**(report or {}), "compression": log_cleanup_report(llm_transcript, compressed)}
+            llm_transcript = compressed
+    return llm_transcript, report
+
+def log_cleanup_report(original: str, cleaned: str) -> dict:
+    report = cleanup_report(original, cleaned)
+    print(f"Transcript cleanup: {report['original_tokens']} -> {report['cleaned_tokens']} tokens ({report['reduction']:.1%} fewer)")
+    return report
+
+async def summarize_with_fallback(transcript: str, make_summary, on_section=None) -> tuple[str, bool]:
+    """
+    Await `make_summary()` (the LLM summary) and return (summary, is_provisional).
+    If the LLM queue is overloaded, the summary fails or it takes longer than
+    SUMMARY_TIMEOUT_SECONDS, extractive notes are returned instead, and the parsed
+    sections are pushed through `on_section` so the client shows them.
+    """
+    if llm_scheduler.queue_depth() >= settings.EXTRACTIVE_FALLBACK_QUEUE_DEPTH:
+        print(f"LLM queue is {llm_scheduler.queue_depth()} deep, using extractive notes.")
+    else:
+        try:
+            summary = await asyncio.wait_for(make_summary(), settings.SUMMARY_TIMEOUT_SECONDS)
+            if not is_summary_error(summary):
+                return summary, False
+            print(f"LLM summary failed, using extractive notes: {summary}")
+        except asyncio.TimeoutError:
+            print(f"LLM summary took over {settings.SUMMARY_TIMEOUT_SECONDS}s, using extractive notes.")
+
+    summary = await asyncio.to_thread(extractive_summary, transcript, settings.SECTION_TOKEN_BUDGET)
+    if on_section is not None:
+        for field, value in summarizer.parse_structured_summary(summary).items():
+            if field != "parse_diagnostics":
+                await on_section(field, value)
+    return summary, True
+
+# Provisional lectures waiting for LLM notes: (lecture_id, user_id, attempt).
+provisional_upgrades: asyncio.Queue | None = None
+provisional_upgrade_worker: asyncio.Task | None = None
+# Lectures with an upgrade waiting or running, so the startup scan doesn't queue
+# them a second time (restarting their backoff).
+scheduled_provisional_upgrades: set[str] = set()
+
+def start_provisional_upgrades() -> None:
+    """Start the upgrade worker if it isn't running; it first scans for lectures left provisional."""
+    global provisional_upgrades, provisional_upgrade_worker
+    if provisional_upgrade_worker is None or provisional_upgrade_worker.done():
+        provisional_upgrades = asyncio.Queue()
+        provisional_upgrade_worker = asyncio.create_task(run_provisional_upgrades(provisional_upgrades))
+
+async def stop_provisional_upgrades() -> None:
+    global provisional_upgrades, provisional_upgrade_worker
+    if provisional_upgrade_worker is not None:
+        provisional_upgrade_worker.cancel()
+        await asyncio.gather(provisional_upgrade_worker, return_exceptions=True)
+    provisional_upgrades = None
+    provisional_upgrade_worker = None
+    scheduled_provisional_upgrades.clear()
+
+def queue_provisional_upgrade(lecture_id: str, user_id: str, attempt: int = 0) -> None:
+    """Schedule LLM notes for a provisional lecture, backing off exponentially per attempt."""
+    if attempt >= settings.PROVISIONAL_UPGRADE_MAX_ATTEMPTS:
+        print(f"Giving up on upgrading provisional lecture {lecture_id} after {attempt} attempts.")
+        scheduled_provisional_upgrades.discard(lecture_id)
+        return
+    scheduled_provisional_upgrades.add(lecture_id)
+    start_provisional_upgrades()
+    delay = settings.PROVISIONAL_UPGRADE_DELAY_SECONDS * 2 ** attempt
+    asyncio.get_running_loop().call_later(delay, provisional_upgrades.put_nowait, (lecture_id, user_id, attempt))
+
+async def upgrade_provisional_lecture(lecture_id: str, user_id: str) -> bool:
+    """
+    Replace a provisional lecture's extractive notes with LLM notes. Returns False
+    if it should be retried later (the LLM is still failing or overloaded).
+    """
+    response = supabase.table("lectures").select("transcript, llm_transcript, is_provisional").eq("id", lecture_id).eq("user_id", user_id).execute()
+    if not response.data or not response.data[0].get("is_provisional"):
+        return True
+    if not await has_token_budget(user_id):
+        print(f"User {user_id} has no token budget left, keeping lecture {lecture_id} provisional.")
+        return True
+    if llm_scheduler.queue_depth() >= settings.EXTRACTIVE_FALLBACK_QUEUE_DEPTH:
+        return False
+
+    usage = TokenUsage()
+    llm_transcript = response.data[0].get("llm_transcript")
+    if llm_transcript is None:
+        # Saved before the prepared copy was stored with the lecture. Whether it was
+        # speech is not known, so it is only compressed, not cleaned.
+        llm_transcript, _ = await asyncio.to_thread(prepare_llm_transcript, response.data[0]["transcript"], upload_token_budget)
+    summary = await summarizer.summarize(llm_transcript, priority=request_priority("background", None), usage=usage)
+    await record_token_usage(user_id, usage)
+    if is_summary_error(summary):
+        return False
+
+    structured_summary_data = summarizer.parse_structured_summary(summary)
+    supabase.table("lectures").update({
+        "summary": summary,
+        "lecture_title": structured_summary_data.get("lecture_title"),
+        "topic_summary_sentence": structured_summary_data.get("topic_summary_sentence"),
+        "key_concepts": structured_summary_data.get("key_concepts", []),
+        "main_points_covered": structured_summary_data.get("main_points_covered", []),
+        "conclusion_takeaways": structured_summary_data.get("conclusion_takeaways"),
+        "references": structured_summary_data.get("references", []),
+        "section_summaries": structured_summary_data.get("section_summaries", []),
+        "study_questions": structured_summary_data.get("study_questions", []),
+        "flashcards": structured_summary_data.get("flashcards", []),
+        "llm_transcript": llm_transcript,
+        "section_spans": summarizer.section_spans(llm_transcript),
+        "token_usage": usage.to_dict(),
+        "is_provisional": False,
+    }).eq("id", lecture_id).eq("user_id", user_id).execute()
+    print(f"Upgraded provisional lecture {lecture_id} to LLM notes.")
+    return True
+
+async def run_provisional_upgrades(queue: asyncio.Queue) -> None:
+    """Background worker; first picks up lectures left provisional by an earlier process."""
+    try:
+        response = supabase.table("lectures").select("id, user_id").eq("is_provisional", True).execute()
+        for row in response.data or []:
+            if row["id"] not in scheduled_provisional_upgrades:
+                scheduled_provisional_upgrades.add(row["id"])
+                queue.put_nowait((row["id"], row["user_id"], 0))
+    except Exception as e:
+        print(f"Could not load pending provisional lectures: {e}")
+
+    while True:
+        lecture_id, user_id, attempt = await queue.get()
+        try:
+            upgraded = await upgrade_provisional_lecture(lecture_id, user_id)
+        except Exception as e:
+            print(f"Error upgrading provisional lecture {lecture_id}: {e}")
+            upgraded = False
+        if upgraded:
+            scheduled_provisional_upgrades.discard(lecture_id)
+        else:
+            queue_provisional_upgrade(lecture_id, user_id, attempt + 1)
 
 # Auth endpoints
 @app.post("/auth/register")
@@ -146,6 +404,13 @@ async def get_remaining_recordings_route(current_user: SupabaseUser = Depends(ge
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/usage/remaining-tokens")
+async def get_remaining_tokens_route(current_user: SupabaseUser = Depends(get_authenticated_user_from_header)):
+    try:
+        return await get_remaining_tokens_count(current_user.id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/usage/summary")
 async def get_usage_summary_route(current_user: SupabaseUser = Depends(get_authenticated_user_from_header)):
     try:
@@ -153,6 +418,40 @@ async def get_usage_summary_route(current_user: SupabaseUser = Depends(get_authe
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics/llm-scheduler")
+async def get_llm_scheduler_metrics(current_user: SupabaseUser = Depends(get_metrics_user)):
+    return llm_scheduler.stats()
+
+@app.get("/metrics/llm-usage")
+async def get_llm_usage_metrics(current_user: SupabaseUser = Depends(get_metrics_user)):
+    """Token counts, prompt-cache hit ratio and average latency per kind of LLM call since startup."""
+    return {"prompt_version": PROMPT_VERSION, "model": llm_backend.model, **summarizer.usage_totals.to_dict()}
+
+@app.get("/metrics/extraction")
+async def get_extraction_metrics(current_user: SupabaseUser = Depends(get_metrics_user)):
+    """Worker pool saturation, queueing and outcomes, and cache hit rates, for document text extraction."""
+    return {**extraction_pool.stats(), "cache": extraction_cache.stats()}
+
+@app.get("/metrics/jobs")
+async def get_job_metrics(current_user: SupabaseUser = Depends(get_metrics_user)):
+    """Backlog of the upload job queue (shared by every API and worker process)."""
+    return {**await asyncio.to_thread(job_store.stats), "workers_in_this_process": job_workers.active_workers}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user: SupabaseUser = Depends(get_authenticated_user_from_header)):
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None or job["user_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {key: job[key] for key in ("id", "kind", "status", "error", "attempts", "created_at")}
+
+@app.get("/metrics/summary-pipeline")
+async def get_summary_pipeline_metrics(current_user: SupabaseUser = Depends(get_metrics_user)):
+    """Runs, failures and time spent per summary pipeline stage since startup."""
+    return {
+        name: {**stats, "avg_seconds": round(stats["total_seconds"] / stats["runs"], 3) if stats["runs"] else 0.0}
+        for name, stats in summarizer.pipeline.stats.items()
+    }
+
 @app.get("/lectures")
 async def get_lectures(current_user: SupabaseUser = Depends(get_authenticated_user_from_header)):
     try:
@@ -177,6 +476,53 @@ async def get_lecture(lecture_id: str, current_user: SupabaseUser = Depends(get_
             raise e
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/lectures/{lecture_id}/repair-sections")
+async def repair_lecture_sections(lecture_id: str, current_user: SupabaseUser = Depends(get_authenticated_user_from_header)):
+    """Re-run only the section summaries that came back degraded, instead of reprocessing the lecture."""
+    try:
+        response = supabase.table("lectures").select("llm_transcript, section_spans, section_summaries").eq("id", lecture_id).eq("user_id", current_user.id).execute()
+
+        if not response.data:
+            raise HTTPException(status_code=404, detail="Lecture not found")
+
+        lecture = response.data[0]
+        section_summaries = lecture.get("section_summaries") or []
+        if not any(is_degraded_section(section) for section in section_summaries):
+            return {"repaired_sections": [], "still_degraded": [], "section_summaries": section_summaries}
+
+        llm_transcript = lecture.get("llm_transcript")
+        section_spans = lecture.get("section_spans")
+        if llm_transcript is None or section_spans is None:
+            # Live and uploaded lectures are split differently, so the sections of
+            # older lectures can't be reconstructed from the transcript alone.
+            raise HTTPException(status_code=409, detail="This lecture was saved before its sections were recorded, so they can't be re-run.")
+
+        if not await has_token_budget(current_user.id):
+            raise HTTPException(status_code=403, detail=TOKEN_BUDGET_EXHAUSTED)
+
+        priority = await get_llm_priority(current_user.id, "upload")
+        usage = TokenUsage()
+        sections = [llm_transcript[start:end] for start, end in section_spans]
+        try:
+            repaired, rerun = await summarizer.repair_section_summaries(sections, section_summaries, priority, usage)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        finally:
+            await record_token_usage(current_user.id, usage)
+
+        supabase.table("lectures").update({"section_summaries": repaired}).eq("id", lecture_id).eq("user_id", current_user.id).execute()
+
+        still_degraded = [number for number in rerun if is_degraded_section(repaired[number - 1])]
+        return {
+            "repaired_sections": [number for number in rerun if number not in still_degraded],
+            "still_degraded": still_degraded,
+            "section_summaries": repaired,
+        }
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
 @app.delete("/lectures/{lecture_id}")
 async def delete_lecture(lecture_id: str, current_user: SupabaseUser = Depends(get_authenticated_user_from_header)):
     try:
@@ -644,6 +990,204 @@ async def stripe_webhook(request: Request):
     return {"status": "success"}
 
 
+def make_summary_section_sender(ws: WebSocket):
+    """Callback for `Summarizer.summarize(on_section=...)` that pushes each finished notes section to the client."""
+    async def send_summary_section(field: str, value):
+        if ws.client_state != WebSocketState.CONNECTED:
+            return
+        try:
+            await ws.send_text(json.dumps({"summary_section": field, "content": value}))
+        except Exception as e:
+            print(f"Error sending summary section '{field}': {e}")
+    return send_summary_section
+
+async def receive_file_upload(ws: WebSocket, spool: UploadSpool, declared_size: int) -> None:
+    """
+    Write the binary frames that follow a "file" message into `spool` until
+    `declared_size` bytes (or a {"type": "file_end"} message) have arrived.
+    The size limit is enforced as frames arrive, before the rest is received.
+    """
+    if declared_size > spool.max_bytes:
+        raise UploadTooLarge(f"File size exceeds the {spool.max_bytes // (1024 * 1024)}MB limit.")
+    while spool.size < declared_size:
+        message = await ws.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        if message.get("bytes") is not None:
+            spool.write(message["bytes"])
+        elif message.get("text") is not None and json.loads(message["text"]).get("type") == "file_end":
+            break
+    if spool.size != declared_size:
+        raise ValueError("The upload ended before the whole file was received.")
+
+async def extract_upload(payload: dict, emit) -> str:
+    """Text of an uploaded file, from the extraction cache or a worker process."""
+    await emit({"processing_status": "Extracting text from your file...", "progress": 10})
+    transcript = await asyncio.to_thread(extraction_cache.get, payload["cache_key"])
+    if transcript is not None:
+        print(f"Extraction cache hit for {payload['filename']}")
+        return transcript
+
+    async def send_extraction_progress(done: int, total: int):
+        if total > 1:
+            await emit({
+                "processing_status": f"Extracting text from your file... ({done} of {total})",
+                "progress": 10 + 25 * done // total
+            })
+
+    # Parsing runs in a worker process so it can't stall other sessions.
+    transcript = await extraction_pool.extract(payload["path"], payload["filename"], send_extraction_progress, settings.EXTRACTION_WORD_LIMIT)
+    await asyncio.to_thread(extraction_cache.set, payload["cache_key"], transcript)
+    return transcript
+
+async def transcribe_upload(payload: dict, emit) -> str:
+    """Transcript of an uploaded recording, from the cache or batch STT."""
+    await emit({"processing_status": "Transcribing your recording...", "progress": 10})
+    transcript = await asyncio.to_thread(extraction_cache.get, payload["cache_key"])
+    if transcript is not None:
+        print(f"Transcript cache hit for {payload['filename']}")
+        return transcript
+
+    async def send_transcription_progress(done: int, total: int):
+        if total > 1:
+            await emit({
+                "processing_status": f"Transcribing your recording... ({done} of {total} parts)",
+                "progress": 10 + 25 * done // total
+            })
+
+    transcript = await STTClient(settings.DEEPGRAM_API_KEY).transcribe_recording(
+        payload["path"],
+        payload["filename"],
+        chunk_seconds=settings.STT_BATCH_CHUNK_SECONDS,
+        max_parallel=settings.STT_BATCH_MAX_PARALLEL,
+        timeout_seconds=settings.STT_BATCH_TIMEOUT_SECONDS,
+        on_progress=send_transcription_progress,
+    )
+    await asyncio.to_thread(extraction_cache.set, payload["cache_key"], transcript)
+    return transcript
+
+def discard_upload_file(payload: dict) -> None:
+    if payload.get("path"):
+        try:
+            os.remove(payload["path"])
+        except FileNotFoundError:
+            pass
+
+async def process_upload_job(job: dict, emit) -> dict:
+    """
+    Job handler for `/ws/process-upload`: extract, summarize and save an uploaded
+    text or file. Progress goes out through `emit`; the returned message is the
+    job's last event. Checkpoints keep a resumed job from saving the lecture twice.
+    """
+    user_id = job["user_id"]
+    payload = job["payload"]
+    checkpoint = job["checkpoint"]
+    lecture_id = checkpoint.get("lecture_id")
+    try:
+        if lecture_id is None:
+            if payload["type"] == "file":
+                transcript = await extract_upload(payload, emit)
+            elif payload["type"] == "audio":
+                transcript = await transcribe_upload(payload, emit)
+            else:
+                transcript = payload["text"]
+            if not transcript.strip():
+                raise ValueError("The provided content is empty.")
+
+            await emit({
+                "processing_status": "Creating your AI-powered summary...",
+                "progress": 40
+            })
+            priority = await get_llm_priority(user_id, "upload")
+            usage = TokenUsage()
+            # Long uploads are compressed to the token budget rather than cut off, so
+            # the notes still cover the whole document. Only recordings are cleaned.
+            llm_transcript, cleanup = await asyncio.to_thread(
+                prepare_llm_transcript, transcript, upload_token_budget, payload["type"] == "audio"
+            )
+
+            async def send_summary_section(field: str, value):
+                await emit({"summary_section": field, "content": value})
+
+            summary, is_provisional = await summarize_with_fallback(
+                llm_transcript,
+                lambda: summarizer.summarize(llm_transcript, priority=priority, on_section=send_summary_section, usage=usage),
+                on_section=send_summary_section,
+            )
+            await record_token_usage(user_id, usage)
+
+            await emit({
+                "processing_status": "Pulling out the important insights...",
+                "progress": 60
+            })
+            structured_summary_data = summarizer.parse_structured_summary(summary)
+            if structured_summary_data["parse_diagnostics"]:
+                print(f"Summary parse problems: {structured_summary_data['parse_diagnostics']}")
+
+            await emit({
+                "processing_status": "Saving your notes securely...",
+                "progress": 80
+            })
+
+            lecture_data_to_insert = {
+                "user_id": user_id,
+                "transcript": transcript,
+                "summary": summary,
+                "lecture_title": structured_summary_data.get("lecture_title", "Uploaded Content"),
+                "topic_summary_sentence": structured_summary_data.get("topic_summary_sentence"),
+                "key_concepts": structured_summary_data.get("key_concepts"),
+                "main_points_covered": structured_summary_data.get("main_points_covered"),
+                "conclusion_takeaways": structured_summary_data.get("conclusion_takeaways"),
+                "references": structured_summary_data.get("references"),
+                "section_summaries": structured_summary_data.get("section_summaries", []),
+                "study_questions": structured_summary_data.get("study_questions", []),
+                "flashcards": structured_summary_data.get("flashcards", []),
+                # The sections were cut from this prepared copy; repair re-runs them from it.
+                "llm_transcript": llm_transcript,
+                "section_spans": summarizer.section_spans(llm_transcript),
+                "token_usage": {**usage.to_dict(), "transcript_cleanup": cleanup},
+                "is_provisional": is_provisional
+            }
+
+            db_response = supabase.table("lectures").insert(lecture_data_to_insert).execute()
+
+            if not db_response.data:
+                raise Exception("Failed to save the generated notes.")
+
+            lecture_id = db_response.data[0]['id']
+            await asyncio.to_thread(job_store.checkpoint, job["id"], {"lecture_id": lecture_id})
+            if is_provisional:
+                queue_provisional_upgrade(lecture_id, user_id)
+
+        if not checkpoint.get("upload_counted"):
+            print("Now trying to update the usage uploads for " + user_id)
+            await update_usage_uploads(user_id)
+            await asyncio.to_thread(job_store.checkpoint, job["id"], {"upload_counted": True})
+    except Exception:
+        discard_upload_file(payload)
+        raise
+    discard_upload_file(payload)
+
+    return {
+        "processing_status": "All done! Your notes are ready.",
+        "progress": 100,
+        "success": True,
+        "lecture_id": lecture_id
+    }
+
+job_workers = JobWorkers(job_store, {"upload": process_upload_job}, settings.JOB_WORKERS, settings.JOB_POLL_INTERVAL_SECONDS)
+
+async def stream_job_events(ws: WebSocket, job_id: str, after: int = 0) -> None:
+    """
+    Send a job's events to the client until it finishes, each tagged with its
+    `seq` so a client that reconnects can resume from `/ws/jobs/{job_id}`.
+    """
+    async for seq, message in follow_job(job_store, job_id, after, settings.JOB_POLL_INTERVAL_SECONDS):
+        if ws.client_state != WebSocketState.CONNECTED:
+            print(f"Client stopped following job {job_id}; it keeps running.")
+            return
+        await ws.send_text(json.dumps({**message, "job_id": job_id, "seq": seq}))
+
 @app.websocket("/ws/process-upload")
 async def websocket_process_upload(ws: WebSocket):
     await ws.accept()
@@ -664,124 +1208,103 @@ async def websocket_process_upload(ws: WebSocket):
         user_id = user_response.user.id
         print(f"User {user_id} connected for upload processing.")
 
+        if not await has_token_budget(user_id):
+            await ws.send_text(json.dumps({"error": TOKEN_BUDGET_EXHAUSTED}))
+            return
+
         # 2. Receive content (text or file) from the client
         content_message = await ws.receive_json()
         content_type = content_message.get("type")
-        
-        transcript = ""
+
         if content_type == "text":
-            transcript = content_message.get("data", "")
+            payload = {"type": "text", "text": content_message.get("data", "")}
         elif content_type == "file":
+            # The file follows as binary frames; see `receive_file_upload`.
+            # Recordings are transcribed instead of extracted, and may be larger.
             filename = content_message.get("filename", "")
-            file_bytes_str = content_message.get("data", "")
-            file_bytes = base64.b64decode(file_bytes_str)
-
-            # Enforce 10MB file size limit
-            if len(file_bytes) > 10 * 1024 * 1024:
-                await ws.send_text(json.dumps({"error": "File size exceeds the 10MB limit."}))
-                return
-
-            file_like_object = io.BytesIO(file_bytes)
-
-            await ws.send_text(json.dumps({
-                "processing_status": "Extracting text from your file...",
-                "progress": 10
-            }))
-            
-            if filename.endswith(".pdf"):
-                reader = pypdf.PdfReader(file_like_object)
-                for page in reader.pages:
-                    transcript += page.extract_text() or ""
-            elif filename.endswith(".docx"):
-                doc = docx.Document(file_like_object)
-                for para in doc.paragraphs:
-                    transcript += para.text + "\n"
-            elif filename.endswith(".pptx"):
-                prs = pptx.Presentation(file_like_object)
-                for slide in prs.slides:
-                    for shape in slide.shapes:
-                        if hasattr(shape, "text"):
-                            transcript += shape.text + "\n"
-            elif filename.endswith(".txt"):
-                transcript = file_like_object.read().decode("utf-8")
-            else:
-                raise ValueError("Unsupported file type.")
+            is_audio = is_audio_file(filename)
+            if not is_audio:
+                check_supported(filename)
+            max_bytes = settings.AUDIO_UPLOAD_MAX_MB * 1024 * 1024 if is_audio else MAX_UPLOAD_BYTES
+            with UploadSpool(filename, max_bytes) as spool:
+                try:
+                    await receive_file_upload(ws, spool, int(content_message.get("size", 0)))
+                except UploadTooLarge as e:
+                    await ws.send_text(json.dumps({"error": str(e)}))
+                    return
+                # Kept on disk until a worker has processed it, so the job survives restarts.
+                stored_path = os.path.join(settings.JOB_STORAGE_DIR, uuid.uuid4().hex + os.path.splitext(filename)[1].lower())
+                await asyncio.to_thread(spool.save_as, stored_path)
+                payload = {
+                    "type": "audio" if is_audio else "file",
+                    "filename": filename,
+                    "path": stored_path,
+                    "cache_key": f"transcribe:{spool.sha256.hexdigest()}" if is_audio else extraction_cache_key(spool, settings.EXTRACTION_WORD_LIMIT),
+                }
         else:
             raise ValueError("Invalid content type specified.")
 
-        if not transcript.strip():
-            raise ValueError("The provided content is empty.")
-
-        # Enforce 15,000 word limit
-        words = transcript.split()
-        if len(words) > 15000:
-            transcript = " ".join(words[:15000])
-
-        # 3. Process the content and send progress updates
-        await ws.send_text(json.dumps({
-            "processing_status": "Creating your AI-powered summary...",
-            "progress": 40
-        }))
-        summary = await summarizer.summarize(transcript)
-
+        # 3. Queue the work and relay its progress. Closing the socket doesn't stop
+        # the job; the client can follow it again from `/ws/jobs/{job_id}`.
+        job_id = await asyncio.to_thread(job_store.submit, "upload", user_id, payload)
         await ws.send_text(json.dumps({
-            "processing_status": "Pulling out the important insights...",
-            "progress": 60
+            "processing_status": "Waiting for a free worker...",
+            "progress": 8,
+            "job_id": job_id
         }))
-        structured_summary_data = summarizer.parse_structured_summary(summary)
+        await stream_job_events(ws, job_id)
 
-        await ws.send_text(json.dumps({
-            "processing_status": "Saving your notes securely...",
-            "progress": 80
-        }))
-        
-        lecture_data_to_insert = {
-            "user_id": user_id,
-            "transcript": transcript,
-            "summary": summary,
-            "lecture_title": structured_summary_data.get("lecture_title", "Uploaded Content"),
-            "topic_summary_sentence": structured_summary_data.get("topic_summary_sentence"),
-            "key_concepts": structured_summary_data.get("key_concepts"),
-            "main_points_covered": structured_summary_data.get("main_points_covered"),
-            "conclusion_takeaways": structured_summary_data.get("conclusion_takeaways"),
-            "references": structured_summary_data.get("references"),
-            "section_summaries": structured_summary_data.get("section_summaries", []),
-            "study_questions": structured_summary_data.get("study_questions", []),
-            "flashcards": structured_summary_data.get("flashcards", [])
-        }
+    except Exception as e:
+        print(f"Error in websocket_process_upload: {str(e)}")
+        error_message = str(e)
+        if ws.client_state == WebSocketState.CONNECTED:
+            await ws.send_text(json.dumps({"error": f"An error occurred: {error_message}"}))
+    finally:
+        if ws.client_state != WebSocketState.DISCONNECTED:
+            await ws.close()
+        print("Upload processing WebSocket closed.")
 
-        db_response = supabase.table("lectures").insert(lecture_data_to_insert).execute()
-        
-        if not db_response.data:
-            raise Exception("Failed to save the generated notes.")
+@app.websocket("/ws/jobs/{job_id}")
+async def websocket_follow_job(ws: WebSocket, job_id: str):
+    """
+    Resubscribe to an upload job, e.g. after a dropped connection or a page reload.
+    The client sends {"token": ..., "after": <last seq it received>} and gets the
+    events it missed, then new ones until the job finishes.
+    """
+    await ws.accept()
 
-        lecture_id = db_response.data[0]['id']
+    try:
+        auth_message = await ws.receive_json()
+        token = auth_message.get("token")
+        if not token:
+            await ws.close(code=4001, reason="Missing authentication token")
+            return
 
-        await ws.send_text(json.dumps({
-            "processing_status": "All done! Your notes are ready.",
-            "progress": 100,
-            "success": True,
-            "lecture_id": lecture_id
-        }))
+        user_response = supabase.auth.get_user(token)
+        if not user_response or not user_response.user:
+            await ws.close(code=4001, reason="Invalid authentication token")
+            return
 
-        print("Now trying to update the usage uploads for " + user_id)
-        await update_usage_uploads(user_id)
+        job = await asyncio.to_thread(job_store.get, job_id)
+        if job is None or job["user_id"] != user_response.user.id:
+            await ws.send_text(json.dumps({"error": "This upload could not be found."}))
+            return
+        await stream_job_events(ws, job_id, int(auth_message.get("after", 0)))
 
     except Exception as e:
-        print(f"Error in websocket_process_upload: {str(e)}")
-        error_message = str(e)
+        print(f"Error in websocket_follow_job: {str(e)}")
         if ws.client_state == WebSocketState.CONNECTED:
-            await ws.send_text(json.dumps({"error": f"An error occurred: {error_message}"}))
+            await ws.send_text(json.dumps({"error": f"An error occurred: {str(e)}"}))
     finally:
         if ws.client_state != WebSocketState.DISCONNECTED:
             await ws.close()
-        print("Upload processing WebSocket closed.")
 
 @app.websocket("/ws/transcribe")
 async def websocket_transcribe(ws: WebSocket):
     await ws.accept()
     
     stt_client = STTClient(settings.DEEPGRAM_API_KEY) # Create new instance per connection
+    live_sections = None
 
     print("API_KEY IS: " + settings.DEEPGRAM_API_KEY)
 
@@ -798,6 +1321,14 @@ async def websocket_transcribe(ws: WebSocket):
         user_id = user_response.user.id
 
         print(f"User {user_id} connected for transcription.")
+
+        if not await has_token_budget(user_id):
+            await ws.send_text(json.dumps({"error": TOKEN_BUDGET_EXHAUSTED}))
+            return
+
+        # Section summaries are generated while the lecture is still being recorded
+        priority = await get_llm_priority(user_id, "live")
+        live_sections = LiveSectionSummarizer(summarizer, priority)
         
         # audio_buffer_for_full_transcript was not used, removed
         audio_buffer = []
@@ -872,6 +1403,11 @@ async def websocket_transcribe(ws: WebSocket):
             
             if is_speech_final:
                 final_transcript_segments.append(transcript_text)
+                # Live sections are summarized from cleaned segments; the final
+                # LLM transcript below is built from the same cleaned segments.
+                llm_segment = clean_transcript(transcript_text) if settings.TRANSCRIPT_CLEANUP else transcript_text
+                if llm_segment:
+                    live_sections.add_segment(llm_segment)
         
         print("Finished iterating stt_client.stream_transcribe.")
 
@@ -903,6 +1439,9 @@ async def websocket_transcribe(ws: WebSocket):
         print("Full Transcript for OpenAI: " + transcript)
 
         summary = "Summary could not be generated for this session."
+        is_provisional = False
+        cleanup = None
+        llm_transcript = transcript
 
         try:
             # Send processing status
@@ -918,7 +1457,18 @@ async def websocket_transcribe(ws: WebSocket):
             }))
 
             if not failed_transcript:
-                summary = await summarizer.summarize(transcript)
+                if settings.TRANSCRIPT_CLEANUP:
+                    llm_transcript = " ".join(filter(None, (clean_transcript(segment) for segment in final_transcript_segments)))
+                    cleanup = log_cleanup_report(transcript, llm_transcript)
+                else:
+                    llm_transcript = transcript
+                send_summary_section = make_summary_section_sender(ws)
+                summary, is_provisional = await summarize_with_fallback(
+                    llm_transcript,
+                    lambda: live_sections.finish(llm_transcript, on_section=send_summary_section),
+                    on_section=send_summary_section,
+                )
+                await record_token_usage(user_id, live_sections.usage)
                 print("\nChatGPT Full Summary: " + summary)
 
                 await ws.send_text(json.dumps({
@@ -927,6 +1477,8 @@ async def websocket_transcribe(ws: WebSocket):
                 }))
                 structured_summary_data = summarizer.parse_structured_summary(summary)
                 print("\nParsed Structured Summary Data:\n", structured_summary_data)
+                if structured_summary_data["parse_diagnostics"]:
+                    print(f"Summary parse problems: {structured_summary_data['parse_diagnostics']}")
 
             # Store in DB
             await ws.send_text(json.dumps({
@@ -953,7 +1505,12 @@ async def websocket_transcribe(ws: WebSocket):
                     "references": structured_summary_data.get("references", []),
                     "section_summaries": structured_summary_data.get("section_summaries", []),
                     "study_questions": structured_summary_data.get("study_questions", []),
-                    "flashcards": structured_summary_data.get("flashcards", [])
+                    "flashcards": structured_summary_data.get("flashcards", []),
+                    # Live sections were windowed while recording; extractive notes split the whole transcript.
+                    "llm_transcript": llm_transcript,
+                    "section_spans": summarizer.section_spans(llm_transcript) if is_provisional else live_sections.section_spans,
+                    "token_usage": {**live_sections.usage.to_dict(), "transcript_cleanup": cleanup},
+                    "is_provisional": is_provisional
                 }
 
                 db_response = supabase.table("lectures").insert(lecture_data_to_insert).execute()
@@ -961,6 +1518,8 @@ async def websocket_transcribe(ws: WebSocket):
                 
                 # Get the lecture ID from the response
                 lecture_id = db_response.data[0]['id'] if db_response.data else None
+                if lecture_id and is_provisional:
+                    queue_provisional_upgrade(lecture_id, user_id)
 
             else:
                 print(f"Skipping DB insert for transcript: '{transcript}' or due to summary error.")
@@ -1013,6 +1572,8 @@ async def websocket_transcribe(ws: WebSocket):
             except Exception as send_err:
                 print(f"Error sending unhandled error to client: {send_err}")
     finally:
+        if live_sections is not None:
+            live_sections.cancel()
         print("FastAPI WebSocket handler: Attempting to clean up WebSocket.")
         if ws.client_state != WebSocketState.DISCONNECTED:
             try:
@@ -1045,26 +1606,43 @@ async def get_user_stats(current_user: SupabaseUser = Depends(get_authenticated_
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/lectures/{lecture_id}/flashcards")
-async def create_flashcards(lecture_id: str, current_user: SupabaseUser = Depends(get_authenticated_user_from_header)):
+async def create_flashcards(lecture_id: str, count: int = settings.FLASHCARD_DEFAULT_COUNT, current_user: SupabaseUser = Depends(get_authenticated_user_from_header)):
     try:
-        # 1. Fetch the lecture to ensure it exists and belongs to the user
-        response = supabase.table("lectures").select("transcript").eq("id", lecture_id).eq("user_id", current_user.id).execute()
-        
+        if not 1 <= count <= 50:
+            raise HTTPException(status_code=400, detail="count must be between 1 and 50.")
+
+        # 1. Fetch the lecture's stored notes, ensuring it belongs to the user
+        response = supabase.table("lectures").select("section_summaries, key_concepts").eq("id", lecture_id).eq("user_id", current_user.id).execute()
+
         if not response.data:
             raise HTTPException(status_code=404, detail="Lecture not found")
-        
-        transcript = response.data[0].get("transcript")
-        if not transcript or not transcript.strip():
+
+        section_summaries = response.data[0].get("section_summaries") or []
+        key_concepts = response.data[0].get("key_concepts") or []
+        if not section_summaries and not key_concepts:
             raise HTTPException(status_code=400, detail="Lecture has no content to generate flashcards from.")
 
-        # 2. Generate flashcards using the summarizer
-        flashcards = await summarizer.generate_flashcards(transcript)
+        # 2. Serve repeated requests for the same lecture and parameters from the cache
+        cache_key = flashcards_cache_key(lecture_id, count, section_summaries, key_concepts, llm_backend.model)
+        flashcards = flashcard_cache.get(cache_key)
+        if flashcards is not None:
+            return flashcards
+
+        if not await has_token_budget(current_user.id):
+            raise HTTPException(status_code=403, detail=TOKEN_BUDGET_EXHAUSTED)
+
+        # 3. Generate flashcards from the section summaries
+        priority = await get_llm_priority(current_user.id, "upload")
+        usage = TokenUsage()
+        flashcards = await summarizer.generate_flashcards(section_summaries, key_concepts, count=count, priority=priority, usage=usage)
+        await record_token_usage(current_user.id, usage)
 
         if not flashcards:
             raise HTTPException(status_code=500, detail="Failed to generate flashcards.")
 
+        flashcard_cache.set(cache_key, flashcards)
         return flashcards
     except HTTPException as e:
         raise e
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
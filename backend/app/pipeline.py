@@ -0,0 +1,115 @@
+import asyncio
+import time
+from collections import deque
+
+
+class Stage:
+    """
+    One step of a `Pipeline`. `run(context, results)` is awaited once every stage
+    named in `depends_on` has finished; `results` maps stage names to their return
+    values. `max_concurrency` caps how many runs of this stage (across all
+    pipeline runs in the process) may be in progress at once.
+    """
+
+    def __init__(self, name: str, run, depends_on: tuple[str, ...] = (), max_concurrency: int | None = None):
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+        self.max_concurrency = max_concurrency or None
+
+
+class Pipeline:
+    """
+    A small DAG of async stages. Each stage starts as soon as its dependencies are
+    done, so independent stages overlap and a run takes as long as its critical
+    path rather than the sum of its stages.
+    """
+
+    def __init__(self, stages: list[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Pipeline stage names must be unique")
+        self._check_graph()
+        self._active = dict.fromkeys(self.stages, 0)
+        self._waiters = {name: deque() for name in self.stages}
+        self.stats = {name: {"runs": 0, "failures": 0, "total_seconds": 0.0, "max_seconds": 0.0} for name in self.stages}
+
+    def _check_graph(self) -> None:
+        visited, visiting = set(), set()
+
+        def visit(name: str) -> None:
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a dependency cycle through '{name}'")
+            visiting.add(name)
+            for dependency in self.stages[name].depends_on:
+                if dependency not in self.stages:
+                    raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'")
+                visit(dependency)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    async def _acquire(self, stage: Stage) -> None:
+        while stage.max_concurrency is not None and self._active[stage.name] >= stage.max_concurrency:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters[stage.name].append(waiter)
+            try:
+                await waiter
+            finally:
+                if not waiter.done():
+                    waiter.cancel()
+        self._active[stage.name] += 1
+
+    def _release(self, stage: Stage) -> None:
+        self._active[stage.name] -= 1
+        waiters = self._waiters[stage.name]
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    async def run(self, context: dict) -> tuple[dict, dict]:
+        """
+        Run every stage once. Returns (results, timings), both keyed by stage name;
+        timings are seconds spent inside each stage, excluding waits for its limit.
+        If a stage fails, the stages still running are cancelled and the error is raised.
+        """
+        results: dict = {}
+        timings: dict = {}
+        tasks: dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: Stage):
+            for dependency in stage.depends_on:
+                await tasks[dependency]
+            await self._acquire(stage)
+            started = time.monotonic()
+            try:
+                results[stage.name] = await stage.run(context, results)
+            except BaseException:
+                self.stats[stage.name]["failures"] += 1
+                raise
+            finally:
+                self._release(stage)
+                elapsed = time.monotonic() - started
+                timings[stage.name] = elapsed
+                stats = self.stats[stage.name]
+                stats["runs"] += 1
+                stats["total_seconds"] += elapsed
+                stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+            return results[stage.name]
+
+        for name, stage in self.stages.items():
+            tasks[name] = asyncio.ensure_future(run_stage(stage))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return results, timings
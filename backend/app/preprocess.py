@@ -0,0 +1,87 @@
+"""
+Normalization applied to transcripts before they are sent to the LLM.
+
+Speech-to-text output is full of fillers ("um", "uh"), false starts ("thi- this")
+and stuttered repeats ("we we we"); every one of those tokens is paid for in the
+section prompts and again in the overall prompt. Only speech is cleaned (live
+sessions and recording uploads); written uploads are left as they are. The stored
+transcript is never changed, only the copy the LLM sees.
+"""
+import re
+
+from .chunker import count_tokens
+
+# Hesitation sounds. Lowercase only, and not "mm" or "ah": uploads and STT output
+# also contain units ("5 mm") and acronyms ("ERM", "UM") spelled the same way.
+_FILLERS = r"(?:u+m+|u+h+m*|h+m+|mhm)"
+# "er" is also a real token ("the er diagram"), so it only counts as a filler
+# when set off by commas or followed by an ellipsis.
+_ER = r"e+r+m*"
+# A filler or discourse marker set off by commas on both sides, removed along
+# with the commas; "you know the answer" is kept.
+_PARENTHETICAL_RE = re.compile(rf",\s*(?:{_FILLERS}|{_ER}|you know|I mean|like)\s*,\s*")
+# Any other filler, with the comma or ellipsis that usually follows it.
+_FILLER_RE = re.compile(rf"(?<![\w'-]){_FILLERS}(?![\w'-])(?:,|\.\.\.|…)?\s*")
+_ER_RE = re.compile(rf"(?<![\w'-]){_ER}(?:\.\.\.|…)\s*")
+# A capitalized filler only where it opens a sentence and is followed by a comma
+# or ellipsis ("Um, so..."), which an acronym never is.
+_SENTENCE_FILLER_RE = re.compile(r"(?:^|(?<=[.!?] ))(?:Um+|Uh+m*|Erm*|Hm+|Mhm)(?:,|\.\.\.|…)\s*", re.MULTILINE)
+# A word cut off mid-way and restarted: "thi- this", "we- we're". The cut-off stem
+# must start the next word, so "infor- mation" and "first- and" are kept.
+_FALSE_START_RE = re.compile(r"\b([A-Za-z]+)-\s+(?=\1)", re.IGNORECASE)
+# The same one to three words said again straight after, possibly several times.
+# Letters and apostrophes only, so numbers ("1 1 2 3", "555 555 1234") are kept;
+# case-sensitive and space-separated only, so "Bye bye" and "New York, New York"
+# are kept.
+_WORD = r"[^\W\d_]+(?:'[^\W\d_]+)*"
+_REPEAT_RE = re.compile(rf"(?<![\w'])({_WORD}(?:\s+{_WORD}){{0,2}})(?:\s+\1(?![\w']))+")
+# Words that are correctly doubled in ordinary English ("had had", "that that",
+# "what it is is", "bye bye").
+_GRAMMATICAL_DOUBLES = frozenset({"had", "that", "is", "was", "do", "does", "did", "bye"})
+_SPACES_RE = re.compile(r"[ \t ]+")
+_SPACE_BEFORE_PUNCT_RE = re.compile(r" +([,.;:!?])")
+_DOUBLE_COMMA_RE = re.compile(r",(?:\s*,)+")
+_COMMA_BEFORE_STOP_RE = re.compile(r",\s*([.!?])")
+_LEADING_COMMA_RE = re.compile(r"(^|[.!?\n]\s*),\s*", re.MULTILINE)
+_LINE_EDGES_RE = re.compile(r" *\n *")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def _collapse_repeat(match: re.Match) -> str:
+    phrase = match.group(1)
+    if phrase.lower() in _GRAMMATICAL_DOUBLES and len(match.group(0).split()) == 2:
+        return match.group(0)
+    # A capitalized repeat is a name ("Walla Walla", "Bora Bora"), except "I I".
+    if phrase[0].isupper() and phrase != "I":
+        return match.group(0)
+    return phrase
+
+
+def clean_transcript(text: str) -> str:
+    """Remove fillers, false starts and repeated words, and normalize whitespace."""
+    text = _SENTENCE_FILLER_RE.sub("", text)
+    text = _PARENTHETICAL_RE.sub(" ", text)
+    text = _FILLER_RE.sub("", text)
+    text = _ER_RE.sub("", text)
+    text = _FALSE_START_RE.sub("", text)
+    text = _REPEAT_RE.sub(_collapse_repeat, text)
+    text = _SPACES_RE.sub(" ", text)
+    text = _SPACE_BEFORE_PUNCT_RE.sub(r"\1", text)
+    text = _DOUBLE_COMMA_RE.sub(",", text)
+    text = _COMMA_BEFORE_STOP_RE.sub(r"\1", text)
+    text = _LEADING_COMMA_RE.sub(r"\1", text)
+    text = _LINE_EDGES_RE.sub("\n", text)
+    text = _BLANK_LINES_RE.sub("\n\n", text)
+    return text.strip()
+
+
+def cleanup_report(original: str, cleaned: str) -> dict:
+    """Token counts before and after `clean_transcript`, for logs and `lectures.token_usage`."""
+    original_tokens = count_tokens(original) if original else 0
+    cleaned_tokens = count_tokens(cleaned) if cleaned else 0
+    return {
+        "original_tokens": original_tokens,
+        "cleaned_tokens": cleaned_tokens,
+        "tokens_saved": original_tokens - cleaned_tokens,
+        "reduction": round(1 - cleaned_tokens / original_tokens, 4) if original_tokens else 0.0,
+    }
@@ -0,0 +1,177 @@
+"""
+Prompt templates for every LLM call the summarizer makes.
+
+Each call is a static system message followed by a user message holding only the
+per-request values. Keeping the large instruction blocks byte-identical at the
+start of every request lets the provider's prompt cache reuse them. OpenAI only
+caches prefixes of PROMPT_CACHE_MIN_TOKENS or more, so the section system prompts,
+which every section call of every lecture shares, carry a worked example that
+keeps them over that size (checked in tests/test_summarizer_unit.py). The
+overall-notes, merge and flashcard prompts are shorter than that, run once or a
+few times per lecture, and are not expected to hit the cache.
+"""
+
+# Bump whenever any template below changes so cached summaries produced by an
+# older prompt are no longer served.
+PROMPT_VERSION = "3"
+
+# Shortest prefix the provider's prompt cache will reuse.
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+
+FULL_OVERALL_INTRO = (
+    "You are an expert academic note-taker, tasked with creating comprehensive study notes from a lecture transcript. "
+    "Your primary goal is to capture the depth and nuance of the lecture for thorough understanding and exam preparation.\n\n"
+    "Your task is to extract the key information and produce structured notes.\n\n"
+)
+
+OVERALL_NOTES_FORMAT = (
+    "Please organize the notes using the following EXACT section markers and instructions:\n\n"
+    "@@LECTURE_TITLE_START@@\n"
+    "[Based on the *entire lecture transcript* provided, infer a clear and concise title that accurately captures the main theme or subject. Do not base the title on individual sections alone.]\n"
+    "@@LECTURE_TITLE_END@@\n\n"
+    "@@TOPIC_SUMMARY_START@@\n"
+    "[Provide a brief, single-sentence summary that encapsulates the main theme of the lecture.]\n"
+    "@@TOPIC_SUMMARY_END@@\n\n"
+    "@@KEY_CONCEPTS_START@@\n"
+    "[List key concepts as concise bullet points. Each key concept can only be a maximum of three words. Use standard markdown bullets '-'. Limit this section to a maximum of four key concepts. If none are distinct, state 'None'. These should be brief definitions or terms.]\n"
+    "@@KEY_CONCEPTS_END@@\n\n"
+    "@@MAIN_POINTS_START@@\n"
+    "[This is a CRITICAL section. Summarize the main ideas presented in the lecture in the order they appear. Each bullet point using '-' MUST be detailed and comprehensive, potentially spanning multiple sentences to fully explain the idea, its implications, or context. Do NOT provide short, Vague phrases. Aim for explanations that would help someone thoroughly understand the topic without re-listening to the lecture. If no main points are discernible, state 'None'.]\n"
+    "@@MAIN_POINTS_END@@\n\n"
+    "@@CONCLUSION_TAKEAWAYS_START@@\n"
+    "[Write a short, yet comprehensive paragraph summarizing the main conclusions or key takeaways from the entire lecture. This should synthesize the most important information for a final review. This section should be a paragraph, not bullet points.]\n"
+    "@@CONCLUSION_TAKEAWAYS_END@@\n\n"
+    "@@STUDY_QUESTIONS_START@@\n"
+    "[List 5-10 high-level study questions that cover the main topics of the entire lecture. You must provide at least 5 questions. Each question should be a string. If none, state 'None'.]\n"
+    "@@STUDY_QUESTIONS_END@@\n\n"
+    "@@FLASHCARDS_START@@\n"
+    "[Generate between 10 and 20 flashcards as a JSON array of objects. Each object must have a 'question' and 'answer' field. "
+    "Example: [{\"question\": \"Q1\", \"answer\": \"A1\"}, {\"question\": \"Q2\", \"answer\": \"A2\"}]. "
+    "If no relevant flashcards can be generated, return an empty array [].]\n"
+    "@@FLASHCARDS_END@@\n\n"
+    "@@OPTIONAL_REFERENCES_START@@\n"
+    "[You are an academic assistant helping students by providing useful, trustworthy reference links based on the lecture transcript below.\n\n🔗 Your task:\n- Provide **at least 5 real, working URLs** relevant to the lecture content.\n- These can include:  \n  • Sources directly mentioned in the transcript (if any)  \n  • Recommended readings: academic articles, videos, or educational web resources  \n\n🎯 Reference Guidelines:\n- Return up to **10 references** as a **JSON array of objects**\n- Each object must contain:  \n  • \"title\" – a short, clear name of the resource (string)  \n  • \"url\" - a real, working URL (string)\n- Example format:\n[\n  { \"title\": \"Modern Portfolio Theory (MPT)\", \"url\": \"https://www.investopedia.com/terms/m/modernportfoliotheory.asp\" },\n  { \"title\": \"Efficient Frontier Explained\", \"url\": \"https://www.khanacademy.org/economics-finance-domain/core-finance/investment-vehicles-tutorial/modern-portfolio-theory/v/efficient-frontier\" }\n]\n- DO NOT use markdown link syntax (e.g., `[title](url)`)\n- DO NOT include any commentary or formatting outside the JSON array\n- If no references are found, return an empty array: `[]`\n\n🎓 Preferred Sources (if applicable):\n- Academic domains like `.edu`, `.org`, `https://doi.org/`, or trusted sources like:  \n  Google Scholar, PubMed, Khan Academy, MIT OpenCourseWare, Stanford Encyclopedia of Philosophy, etc.\n\n📌 If no sources were mentioned in the transcript:\n- Still provide 5 highly relevant resources  \n- At least 2-3 should be high-quality academic or educational URLs based on the topic\n]\n"
+    "@@OPTIONAL_REFERENCES_END@@\n\n"
+)
+
+REDUCE_OVERALL_INTRO = (
+    "You are an expert academic note-taker, tasked with creating comprehensive study notes for a lecture. "
+    "You are given structured notes for every consecutive part of the lecture, in order, instead of the raw transcript. "
+    "Treat them together as the entire lecture and synthesize them into one coherent set of notes for thorough understanding and exam preparation.\n\n"
+)
+
+OVERALL_FULL_SYSTEM = FULL_OVERALL_INTRO + OVERALL_NOTES_FORMAT
+OVERALL_FULL_USER = "Here is the lecture transcript:\n\n{transcript}"
+
+OVERALL_REDUCE_SYSTEM = REDUCE_OVERALL_INTRO + OVERALL_NOTES_FORMAT
+OVERALL_REDUCE_USER = "Here are the notes for each part of the lecture, in order:\n\n{notes}"
+
+# Per-field constraints shared by the single-section and batched section prompts.
+SECTION_FIELDS = (
+    "- section_title: A very short, descriptive title for this section (e.g., 'Introduction to Photosynthesis'). MUST be a string.\n"
+    "- key_takeaways: A list of 2-3 of the most critical concepts or conclusions as STRINGS. You must return at least 2 key takeaways. Each string MUST be a complete sentence. If none, return an empty list.\n"
+    "- new_vocabulary: A list of 1-4 new important keywords or technical terms as STRINGS. Ensure they are capitalized. If none, return an empty list.\n"
+    "- study_questions: A list of 1-2 pointed questions as STRINGS that a student should be able to answer after this section. This promotes active recall.\n"
+    "- examples: A list of 1-2 specific examples, analogies, real-world references, or illustrative scenarios mentioned in this section. These may include brief illustrative phrases. You must return at least 2 examples. If none, return an empty list.\n\n"
+    "- useful_references: You are an academic assistant helping students by providing useful, trustworthy reference links based on the lecture transcript below.\n\n🔗 Your task:\n- You MUST provide 2 real, working URLs** relevant to the lecture content.\n- These can include:  \n  • Sources directly mentioned in the transcript (if any)  \n  • Recommended readings: academic articles, videos, or educational web resources  \n\n🎯 Reference Guidelines:\n- Return up to **2 references** as a **JSON array of objects**\n- Each object must contain:  \n  • \"title\" - a short, clear name of the resource (string)  \n  • \"url\" - a real, working URL (string)\n- Example format:\n[\n  { \"title\": \"Modern Portfolio Theory (MPT)\", \"url\": \"https://www.investopedia.com/terms/m/modernportfoliotheory.asp\" },\n  { \"title\": \"Efficient Frontier Explained\", \"url\": \"https://www.khanacademy.org/economics-finance-domain/core-finance/investment-vehicles-tutorial/modern-portfolio-theory/v/efficient-frontier\" }\n]\n- DO NOT use markdown link syntax (e.g., `[title](url)`)\n- DO NOT include any commentary or formatting outside the JSON array\n- If no references are found, return an empty array: `[]`\n\n🎓 Preferred Sources (if applicable):\n- Academic domains like `.edu`, `.org`, `https://doi.org/`, or trusted sources like:  \n  Google Scholar, PubMed, Khan Academy, MIT OpenCourseWare, Stanford Encyclopedia of Philosophy, etc.\n\n📌 If no sources were mentioned in the transcript:\n- Still provide 2 highly relevant resources  \n- At least 1-2 should be high-quality academic or educational URLs based on the topic\n"
+)
+
+# A worked example shared by the section prompts. Besides showing the depth and
+# style wanted, it keeps their static prefix over PROMPT_CACHE_MIN_TOKENS.
+SECTION_EXAMPLE = (
+    "Here is an example of a lecture section and a good summary of it. Use it as a guide to the depth, tone and format expected; "
+    "never copy its content, and summarize only the text you are given.\n\n"
+    "Example section text:\n"
+    "\"So last time we said enzymes are proteins that speed up reactions, and today I want to get into how they actually do that. "
+    "Every reaction has to get over an energy hill before it can go anywhere, and we call the height of that hill the activation energy. "
+    "What an enzyme does is bind the reactant, which we call the substrate, in a pocket called the active site, and hold it in a shape "
+    "that makes the hill lower. It does not change where the reaction ends up, only how fast it gets there. A nice way to picture it is "
+    "a lock and a key, although the better model is induced fit, where the pocket actually shifts a little to grip the substrate once it binds. "
+    "Now, temperature matters a lot. Warm things up and molecules collide more, so the rate goes up, but go past about forty degrees for most "
+    "human enzymes and the protein starts to unfold. We call that denaturation, and once the active site loses its shape the enzyme stops working. "
+    "The same thing happens with pH, which is why pepsin in your stomach works best around pH two while the enzymes in your small intestine "
+    "prefer something closer to neutral. For next week, read the chapter on inhibitors, because we will look at how some drugs work by "
+    "blocking exactly these active sites.\"\n\n"
+    "A good summary of that section:\n"
+    "{\n"
+    "  \"section_title\": \"How Enzymes Lower Activation Energy\",\n"
+    "  \"key_takeaways\": [\n"
+    "    \"Enzymes speed up reactions by binding the substrate in their active site and lowering the activation energy, without changing the reaction's end result.\",\n"
+    "    \"The induced fit model, in which the active site changes shape slightly to grip the substrate, describes binding better than the rigid lock-and-key model.\",\n"
+    "    \"High temperatures and the wrong pH denature enzymes by unfolding them, which destroys the shape of the active site and stops the enzyme from working.\"\n"
+    "  ],\n"
+    "  \"new_vocabulary\": [\"Activation Energy\", \"Substrate\", \"Active Site\", \"Denaturation\"],\n"
+    "  \"study_questions\": [\n"
+    "    \"Why does lowering the activation energy speed up a reaction without changing its products?\",\n"
+    "    \"Why do pepsin and the enzymes of the small intestine work best at different pH values?\"\n"
+    "  ],\n"
+    "  \"examples\": [\n"
+    "    \"The lock-and-key analogy for how a substrate fits into an enzyme's active site.\",\n"
+    "    \"Pepsin works best around pH 2 in the stomach, while intestinal enzymes prefer a near-neutral pH.\"\n"
+    "  ],\n"
+    "  \"useful_references\": [\n"
+    "    {\"title\": \"Enzymes and the Active Site\", \"url\": \"https://www.khanacademy.org/science/biology/energy-and-enzymes/introduction-to-enzymes/a/enzymes-and-the-active-site\"},\n"
+    "    {\"title\": \"Enzyme (Wikipedia)\", \"url\": \"https://en.wikipedia.org/wiki/Enzyme\"}\n"
+    "  ]\n"
+    "}\n\n"
+    "Notice that every key takeaway is a complete sentence that explains an idea rather than naming it, that the vocabulary is limited to "
+    "the terms the section actually introduces, and that the study questions ask for reasoning, not recall of a single word. When a "
+    "section is mostly logistics or small talk, keep the lists short rather than inventing content the lecturer did not cover.\n\n"
+)
+
+SECTION_SYSTEM = (
+    "You are a student-focused AI assistant analyzing one section of a lecture transcript. "
+    "Your goal is to create a concise, structured summary that helps a student digest this specific part of the lecture. "
+    "The summary should be distinct from a simple transcript reduction and focus on actionable learning points.\n\n"
+    "Format the response as a JSON object with the following fields and STRICT constraints:\n"
+    + SECTION_FIELDS
+    + SECTION_EXAMPLE
+    + "Respond ONLY with the JSON object. Do not include any other text or formatting.\n\n"
+)
+SECTION_USER = "This is {position} of the lecture.\n\nHere is the section text:\n\n{section}"
+
+SECTION_BATCH_SYSTEM = (
+    "You are a student-focused AI assistant analyzing several sections of a lecture transcript. "
+    "Summarize EACH section independently, as if it were the only one, so that a student can digest that specific part of the lecture. "
+    "The summaries should be distinct from a simple transcript reduction and focus on actionable learning points.\n\n"
+    "Format the response as a JSON object with a single key \"sections\": a list with one object per section, in the order given. "
+    "Each object MUST have \"section_number\" (the number in the section's heading) and the following fields and STRICT constraints:\n"
+    + SECTION_FIELDS
+    + SECTION_EXAMPLE
+    + "In your response, each section's object also has its \"section_number\", unlike the single-section example above.\n"
+    + "Respond ONLY with the JSON object. Do not include any other text or formatting.\n\n"
+)
+SECTION_BATCH_USER = "These are sections {first} to {last} of {total} of the lecture.\n\n{sections}"
+SECTION_BATCH_HEADING = "### Section {number}"
+
+MERGE_SYSTEM = (
+    "You are a student-focused AI assistant. You will be given structured notes for several consecutive sections "
+    "of a lecture. Merge them into ONE condensed set of notes covering all of them.\n\n"
+    "Format the response as a JSON object with the following fields:\n"
+    "- section_title: A short, descriptive title covering all of these sections. MUST be a string.\n"
+    "- key_takeaways: A list of 3-6 of the most critical concepts or conclusions as complete sentences, in lecture order.\n"
+    "- new_vocabulary: A list of up to 6 important capitalized keywords or technical terms.\n"
+    "- study_questions: A list of 2-4 study questions.\n"
+    "- examples: A list of up to 4 specific examples or analogies.\n"
+    "Respond ONLY with the JSON object."
+)
+MERGE_USER = "Merge the notes for these {count} consecutive sections (part {group_number} of {total_groups}).\n\nHere are the section notes:\n\n{notes}"
+
+FLASHCARDS_SYSTEM = (
+    "You are a student-focused AI assistant that writes study flashcards. You will be given the key concepts of a lecture "
+    "and structured notes for each of its sections, in order.\n\n"
+    "Format the response as a JSON object with the following fields:\n"
+    "- flashcards: A list of flashcard objects, each with a \"question\" and an \"answer\" STRING. Questions must be answerable from the notes alone, "
+    "test one idea each, and be spread across the whole lecture rather than the first sections. Answers should be one or two sentences.\n"
+    "Respond ONLY with the JSON object."
+)
+FLASHCARDS_USER = "Write exactly {count} flashcards.\n\nKey concepts: {key_concepts}\n\nHere are the section notes:\n\n{notes}"
+
+
+def build_messages(system: str, user_template: str, **values) -> list[dict]:
+    """Static system message plus the user template filled with this request's values."""
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user_template.format(**values)},
+    ]
@@ -1,100 +1,127 @@
 import asyncio
-import inspect # For debugging
-from deepgram import DeepgramClient, LiveOptions, LiveTranscriptionEvents
+import httpx
+from deepgram import DeepgramClient, LiveOptions, LiveTranscriptionEvents, PrerecordedOptions
+from .audio import PCM_EXTENSIONS, audio_mimetype, plan_chunks, read_chunk_as_wav
+
+# After the last audio chunk, how long to wait for Deepgram to flush the final
+# transcript before closing the connection.
+FINALIZE_TIMEOUT_SECONDS = 5.0
+
 
 class STTClient:
+    """
+    Live transcription uses the SDK's asyncio websocket client, so every event
+    handler runs on the event loop and hands transcripts to `stream_transcribe`
+    through an `asyncio.Queue` directly; the consumer is woken as soon as an
+    event arrives, not when the next audio chunk is sent.
+    """
+
     def __init__(self, api_key: str):
         self.deepgram = DeepgramClient(api_key)
         self._current_q: asyncio.Queue = None
+        self._finalized: asyncio.Event = None
+        self._closing = False
         # Track last partial and last finalized text per utterance to improve finalization
         self._last_partial_text: str = ""
         self._last_final_text: str = ""
 
-    # --- Event Handlers ---
-    def _on_open(self, dg_connection_instance, open_event):
-        print(f"STTClient CB: Deepgram Connection opened: {open_event}")
+    # --- Event Handlers (awaited by the SDK on the event loop) ---
+    async def _on_open(self, dg_connection_instance, open=None, **kwargs):
+        print(f"STTClient CB: Deepgram Connection opened: {open}")
 
-    def _on_message(self, dg_connection_instance, result):
-        if self._current_q is None:
+    async def _on_message(self, dg_connection_instance, result=None, **kwargs):
+        if self._current_q is None or result is None:
             return
 
         transcript = ""
         if result.channel and result.channel.alternatives and len(result.channel.alternatives) > 0:
             transcript = result.channel.alternatives[0].transcript
-        
+
         # With interim_results=True, we get many messages. We primarily want to pass
         # non-empty transcripts along with their finality status to the main handler.
         if transcript and len(transcript.strip()) > 0:
-            try:
-                # speech_final is a top-level attribute on the result object for Deepgram Python SDK v3+
-                # For older versions, it might be in result.channel.alternatives[0].metadata.speech_final
-                is_final_utterance = getattr(result, 'speech_final', False)
-                # Track last seen texts for utterance-final fallback
-                self._last_partial_text = transcript
-                if is_final_utterance:
-                    self._last_final_text = transcript
-                self._current_q.put_nowait({
-                    "text": transcript,
-                    "is_speech_final": is_final_utterance
-                })
-
-            except asyncio.QueueFull:
-                print(f"STTClient CB (_on_message): Deepgram message queue full. Transcript '{transcript[:30]}...' lost.")
-        # elif is_really_final and not transcript: # 'is_really_final' was not well-defined here, relying on 'speech_final' now
-            # print("STTClient CB (_on_message): is_final event with empty transcript.")
-
-
-    def _on_metadata(self, dg_connection_instance, metadata):
+            is_final_utterance = getattr(result, 'speech_final', False)
+            # Track last seen texts for utterance-final fallback
+            self._last_partial_text = transcript
+            if is_final_utterance:
+                self._last_final_text = transcript
+            self._current_q.put_nowait({
+                "text": transcript,
+                "is_speech_final": is_final_utterance
+            })
+        if getattr(result, 'from_finalize', False) and self._finalized is not None:
+            self._finalized.set()
+
+    async def _on_metadata(self, dg_connection_instance, metadata=None, **kwargs):
         print(f"STTClient CB: Deepgram Metadata received: {metadata}")
 
-    def _on_speech_started(self, dg_connection_instance, speech_started):
+    async def _on_speech_started(self, dg_connection_instance, speech_started=None, **kwargs):
         print(f"STTClient CB: Deepgram Speech started: {speech_started}")
 
-    def _on_utterance_end(self, dg_connection_instance, utterance_end):
+    async def _on_utterance_end(self, dg_connection_instance, utterance_end=None, **kwargs):
         print(f"STTClient CB: Deepgram Utterance ended: {utterance_end}") # This CB also indicates an utterance end.
         # Fallback: if Deepgram didn't mark the last message as final, emit the last partial as final
         if self._current_q is None:
             return
-        try:
-            if self._last_partial_text and self._last_partial_text != self._last_final_text:
-                self._current_q.put_nowait({
-                    "text": self._last_partial_text,
-                    "is_speech_final": True
-                })
-                # Mark as finalized to avoid duplicate emits for this utterance
-                self._last_final_text = self._last_partial_text
-                self._last_partial_text = ""
-        except asyncio.QueueFull:
-            print("STTClient CB (_on_utterance_end): queue full, could not enqueue fallback final.")
-
-    def _on_error(self, dg_connection_instance, error):
+        if self._last_partial_text and self._last_partial_text != self._last_final_text:
+            self._current_q.put_nowait({
+                "text": self._last_partial_text,
+                "is_speech_final": True
+            })
+            # Mark as finalized to avoid duplicate emits for this utterance
+            self._last_final_text = self._last_partial_text
+            self._last_partial_text = ""
+
+    async def _on_error(self, dg_connection_instance, error=None, **kwargs):
         error_message = str(error)
         if hasattr(error, 'message') and error.message:
             error_message = str(error.message)
         elif isinstance(error, dict) and 'message' in error:
             error_message = str(error['message'])
-        
+
         print(f"STTClient CB: Deepgram Error occurred: {error_message}")
         if self._current_q is None: return
-        try:
-            self._current_q.put_nowait(f"ERROR: Deepgram - {error_message}")
-        except asyncio.QueueFull:
-            print("STTClient CB (_on_error): Deepgram error queue full. Error notification lost.")
+        self._current_q.put_nowait(f"ERROR: Deepgram - {error_message}")
 
-    def _on_close(self, dg_connection_instance, close_event):
-        print(f"STTClient CB: Deepgram Connection closed: {close_event}")
+    async def _on_close(self, dg_connection_instance, close=None, **kwargs):
+        print(f"STTClient CB: Deepgram Connection closed: {close}")
         if self._current_q is None: return
+        self._current_q.put_nowait(None)
+
+    async def _send_audio(self, dg_connection, audio_generator) -> None:
+        """
+        Forward audio to Deepgram, then flush the last transcript and close the
+        connection (which ends `stream_transcribe`). Runs alongside the consumer.
+        """
         try:
+            async for chunk_dict in audio_generator:
+                if not await dg_connection.send(chunk_dict["buffer"]):
+                    raise ConnectionError("Deepgram connection closed while sending audio")
+            print("STTClient: Audio generator finished. Flushing final transcript.")
+            await dg_connection.finalize()
+            try:
+                await asyncio.wait_for(self._finalized.wait(), FINALIZE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                print(f"STTClient: No finalize response after {FINALIZE_TIMEOUT_SECONDS}s; closing anyway.")
+            self._closing = True
+            await dg_connection.finish()
+        except Exception as send_error:
+            print(f"STTClient: Error sending data: {type(send_error).__name__} - {send_error}.")
+            self._current_q.put_nowait(f"ERROR: {send_error}")
+        finally:
+            # Ends the consumer even if no Close event arrives.
             self._current_q.put_nowait(None)
-        except asyncio.QueueFull:
-            print("STTClient CB (_on_close): Deepgram close signal queue full. End signal lost.")
 
     async def stream_transcribe(self, audio_generator):
-        self._current_q = asyncio.Queue(maxsize=200) # Slightly larger queue for interim results
-        dg_connection = None 
-        
+        # Unbounded: events are never dropped, and the consumer drains the queue as
+        # soon as anything is put in it.
+        self._current_q = asyncio.Queue()
+        self._finalized = asyncio.Event()
+        dg_connection = None
+        sender = None
+
         try:
-            dg_connection = self.deepgram.listen.live.v("1")
+            dg_connection = self.deepgram.listen.asyncwebsocket.v("1")
 
             dg_connection.on(LiveTranscriptionEvents.Open, self._on_open)
             dg_connection.on(LiveTranscriptionEvents.Transcript, self._on_message)
@@ -108,99 +135,103 @@ class STTClient:
                 model="nova-2",
                 punctuate=True, language="en-US",
                 encoding="linear16", channels=1, sample_rate=16000,
-                interim_results=True, 
+                interim_results=True,
                 utterance_end_ms="1000", vad_events=True,
                 smart_format=True,
-                # speech_final=True # Explicitly request speech_final events
             )
-            
+
             print(f"STTClient: Attempting to start Deepgram connection with options: {options}")
-            start_result = dg_connection.start(options) 
-            
-            if not start_result:
+            if not await dg_connection.start(options):
                 print("STTClient: Deepgram dg_connection.start() returned False.")
-                if self._current_q: self._current_q.put_nowait(None)
                 raise ConnectionError("Failed to start Deepgram connection (start returned False)")
-            
-            print("STTClient: Deepgram connection start() called successfully.")
+            print("STTClient: Deepgram connection started.")
 
-            async for chunk_dict in audio_generator:
-                if dg_connection:
-                    try:
-                        dg_connection.send(chunk_dict["buffer"])
-                    except Exception as send_error:
-                        print(f"STTClient: Error sending data: {type(send_error).__name__} - {send_error}.")
-                        if self._current_q: self._current_q.put_nowait(None)
-                        break 
-                else:
-                    print("STTClient: No dg_connection to send to. Breaking send loop.")
-                    if self._current_q: self._current_q.put_nowait(None)
-                    break 
-                
-                while not self._current_q.empty():
-                    item = self._current_q.get_nowait() 
-                    if item is None:
-                        print("STTClient: (Send Loop) Got None from queue. Early termination of stream.")
-                        if dg_connection: dg_connection.finish()
-                        return 
-                    if isinstance(item, str) and item.startswith("ERROR:"):
-                        print(f"STTClient: (Send Loop) Propagating error: {item}")
-                        raise Exception(item)
-                    # Yield all non-empty transcript dicts
-                    if isinstance(item, dict) and item.get("text", "").strip():
-                        yield item
-
-            print("STTClient: Audio generator finished.")
-
-            if dg_connection:
-                print("STTClient: Signaling Deepgram to finish (calling .finish()).")
-                finish_success = dg_connection.finish() 
-                if finish_success:
-                    print("STTClient: dg_connection.finish() called. Waiting for final queue items.")
-                else:
-                    print("STTClient: dg_connection.finish() returned False.")
-            
-            print("STTClient: Draining queue after finish().")
-            processed_after_finish = 0
+            sender = asyncio.create_task(self._send_audio(dg_connection, audio_generator))
             while True:
-                try:
-                    item = await asyncio.wait_for(self._current_q.get(), timeout=20.0) # Adjusted timeout
-                    processed_after_finish +=1
-                except asyncio.TimeoutError:
-                    print(f"STTClient: Timeout draining queue after finish (processed {processed_after_finish} items).")
-                    break 
-                except asyncio.QueueEmpty:
-                    print(f"STTClient: Queue empty draining after finish (processed {processed_after_finish} items).")
+                item = await self._current_q.get()
+                if item is None:
+                    print("STTClient: End of stream.")
                     break
-
-                if item is None: 
-                    print(f"STTClient: Got None from queue after finish (processed {processed_after_finish} items). End of stream.")
-                    break 
                 if isinstance(item, str) and item.startswith("ERROR:"):
-                    print(f"STTClient: (Drain Loop) Propagating error: {item}")
-                    raise Exception(item) 
-                if isinstance(item, dict) and item.get("text","").strip(): # Yield any remaining transcript dicts
+                    print(f"STTClient: Propagating error: {item}")
+                    raise Exception(item)
+                # Yield all non-empty transcript dicts
+                if isinstance(item, dict) and item.get("text", "").strip():
                     yield item
-            
-            print(f"STTClient: Finished draining queue (processed {processed_after_finish} items in drain loop).")
+            if self._closing:
+                # The Close event came from our own finish(); let it complete.
+                await sender
 
         except ConnectionError as ce:
             print(f"STTClient: ConnectionError: {ce}")
-            if self._current_q and not self._current_q.full(): self._current_q.put_nowait(None)
-            raise 
+            raise
         except Exception as e:
             print(f"STTClient: General error: {type(e).__name__} - {str(e)}")
-            if self._current_q and not self._current_q.full(): self._current_q.put_nowait(None) 
             raise
         finally:
             print("STTClient: Outer finally block.")
-            if self._current_q:
-                if self._current_q.empty(): # Ensure None is put if queue is empty
-                    try: self._current_q.put_nowait(None)
-                    except asyncio.QueueFull: pass # Should not happen if empty
-                    except Exception: pass # Catch any other rare errors
-            self._current_q = None 
+            if sender is not None and not sender.done():
+                # The stream ended early (error, server close or client gone): stop sending and close.
+                sender.cancel()
+                await asyncio.gather(sender, return_exceptions=True)
+                try:
+                    await dg_connection.finish()
+                except Exception as e:
+                    print(f"STTClient: Error closing Deepgram connection: {e}")
+            self._current_q = None
+            self._finalized = None
+            self._closing = False
             # Reset utterance trackers
             self._last_partial_text = ""
             self._last_final_text = ""
-            print("STTClient: stream_transcribe fully finished.")
\ No newline at end of file
+            print("STTClient: stream_transcribe fully finished.")
+
+    # --- Batch (pre-recorded) transcription ---
+    async def transcribe_file(self, audio: bytes, mimetype: str, timeout_seconds: float = 600.0) -> str:
+        """Transcript of a whole audio file in one batch request, much faster than real time."""
+        options = PrerecordedOptions(
+            model="nova-2",
+            punctuate=True, language="en-US",
+            smart_format=True,
+        )
+        response = await self.deepgram.listen.asyncrest.v("1").transcribe_file(
+            {"buffer": audio, "mimetype": mimetype},
+            options,
+            timeout=httpx.Timeout(timeout_seconds, connect=10.0),
+        )
+        channels = response.results.channels if response.results else []
+        if not channels or not channels[0].alternatives:
+            return ""
+        return channels[0].alternatives[0].transcript or ""
+
+    async def transcribe_recording(self, path: str, filename: str, chunk_seconds: float = 300.0,
+                                   max_parallel: int = 6, timeout_seconds: float = 600.0, on_progress=None) -> str:
+        """
+        Transcript of an uploaded recording. WAV and AIFF files are cut into chunks
+        of about `chunk_seconds` that are transcribed `max_parallel` at a time and
+        joined in order; other formats are sent whole. `await on_progress(done, total)`
+        is called as chunks finish.
+        """
+        if not filename.lower().endswith(PCM_EXTENSIONS):
+            with open(path, "rb") as file:
+                audio = await asyncio.to_thread(file.read)
+            return await self.transcribe_file(audio, audio_mimetype(filename), timeout_seconds)
+
+        duration, chunks = await asyncio.to_thread(plan_chunks, path, filename, chunk_seconds)
+        print(f"STTClient: Transcribing {filename} ({duration:.0f}s) in {len(chunks)} chunks, {max_parallel} at a time.")
+        # Bounds both the requests in flight and the chunks held in memory.
+        limit = asyncio.Semaphore(max(1, max_parallel))
+        finished = 0
+
+        async def transcribe_chunk(start: int, frame_count: int) -> str:
+            nonlocal finished
+            async with limit:
+                audio = await asyncio.to_thread(read_chunk_as_wav, path, filename, start, frame_count)
+                text = await self.transcribe_file(audio, "audio/wav", timeout_seconds)
+            finished += 1
+            if on_progress is not None:
+                await on_progress(finished, len(chunks))
+            return text.strip()
+
+        texts = await asyncio.gather(*(transcribe_chunk(start, count) for start, count in chunks))
+        return " ".join(text for text in texts if text)
@@ -1,209 +1,742 @@
 import os
-from openai import AsyncOpenAI
 import re
 import json
 import asyncio
+import hashlib
+import random
+import time
+import inspect
+from collections import deque
+from .cache import TieredCache
+from .llm_scheduler import LLMScheduler, PRIORITY_UPLOAD_FREE
+from .chunker import chunk_spans, count_tokens, DEFAULT_SECTION_TOKENS
+from .pipeline import Pipeline, Stage
+from .llm_backends import LLMBackend, OpenAIBackend, Completion, TokenUsage, DEFAULT_OPENAI_MODEL
+from .prompts import (
+    PROMPT_VERSION, build_messages,
+    SECTION_SYSTEM, SECTION_USER, MERGE_SYSTEM, MERGE_USER,
+    SECTION_BATCH_SYSTEM, SECTION_BATCH_USER, SECTION_BATCH_HEADING,
+    FLASHCARDS_SYSTEM, FLASHCARDS_USER,
+    OVERALL_FULL_SYSTEM, OVERALL_FULL_USER, OVERALL_REDUCE_SYSTEM, OVERALL_REDUCE_USER,
+)
+
+def format_section_notes(section_summaries: list[dict]) -> str:
+    """Render section summaries as compact text for the reduce prompts (far fewer tokens than indented JSON)."""
+    blocks = []
+    for i, section_summary in enumerate(section_summaries, 1):
+        lines = [f"Part {i}: {section_summary.get('section_title', '')}"]
+        for key, label in (("key_takeaways", "Key takeaways"), ("new_vocabulary", "Vocabulary"), ("examples", "Examples"), ("study_questions", "Questions")):
+            items = [str(item) for item in section_summary.get(key) or []]
+            if items:
+                lines.append(f"{label}: " + " | ".join(items))
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+def merge_section_summaries_locally(section_summaries: list[dict]) -> dict:
+    """Mechanical merge used when the LLM merge call fails; keeps the reduce step moving."""
+    titles = [s.get("section_title", "") for s in section_summaries if s.get("section_title")]
+    merged = {"section_title": " / ".join(titles[:3])}
+    for key, limit in (("key_takeaways", 6), ("new_vocabulary", 6), ("study_questions", 4), ("examples", 4)):
+        items = []
+        for section_summary in section_summaries:
+            items.extend(section_summary.get(key) or [])
+        merged[key] = items[:limit]
+    return merged
+
+# Marker name -> parsed field name.
+TEXT_SECTIONS = {
+    "LECTURE_TITLE": "lecture_title",
+    "TOPIC_SUMMARY": "topic_summary_sentence",
+    "KEY_CONCEPTS": "key_concepts",
+    "MAIN_POINTS": "main_points_covered",
+    "CONCLUSION_TAKEAWAYS": "conclusion_takeaways",
+    "STUDY_QUESTIONS": "study_questions",
+}
+JSON_SECTIONS = {
+    "OPTIONAL_REFERENCES": "references",
+    "SECTION_SUMMARIES": "section_summaries",
+    "FLASHCARDS": "flashcards",
+}
+# Text sections that are bullet lists rather than prose.
+ARRAY_FIELDS = {"key_concepts", "main_points_covered", "study_questions"}
+
+_BULLET_RE = re.compile(r"^\s*[-*\u2022]\s*")
+# Every START or END marker; pairing them up is done by SummaryScan.
+_MARKER_RE = re.compile(r"@@([A-Z_]+)_(START|END)@@")
+
+def parse_section(section_name: str, raw_content: str, diagnostics: list | None = None) -> tuple[str, object] | None:
+    """
+    Convert the raw text between a section's START/END markers into its field name
+    and parsed value. Returns None for marker names this parser doesn't know.
+    Problems (e.g. invalid JSON) are appended to `diagnostics` when given.
+    """
+    content = raw_content.strip()
+    if section_name in JSON_SECTIONS:
+        key = JSON_SECTIONS[section_name]
+        if not content or content.lower() in ["none", "not available", "[]"]:
+            return key, []
+        try:
+            value = json.loads(content)
+            print(f"Successfully parsed JSON for {key}")
+            return key, value
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON for section {key}: {e}")
+            if diagnostics is not None:
+                diagnostics.append({"section": section_name, "problem": "invalid_json", "detail": str(e)})
+            return key, []
+
+    if section_name not in TEXT_SECTIONS:
+        return None
+    key = TEXT_SECTIONS[section_name]
+    if content.lower() in ["none", "not available", ""]:
+        return key, [] if key in ARRAY_FIELDS else ""
+    if key not in ARRAY_FIELDS:
+        return key, content
+    lines = [
+        _BULLET_RE.sub("", line).strip()
+        for line in content.splitlines()
+        if line.strip()
+    ]
+    if len(lines) == 1 and lines[0].lower() in ["none", "not available"]:
+        return key, []
+    return key, lines
+
+_START_MARKER_RE = re.compile(r"@@([A-Z_]+)_START@@")
+
+class SummaryScan:
+    """
+    Locates every @@X_START@@ ... @@X_END@@ section of a summary in a single pass
+    over its markers. Section values are decoded when first requested.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.spans: dict[str, tuple[int, int]] = {}
+        self.diagnostics: list[dict] = []
+        self._values: dict[str, object] = {}
+
+        open_sections: dict[str, int] = {}
+        for marker in _MARKER_RE.finditer(text):
+            name, kind = marker.groups()
+            if kind == "START":
+                if name in open_sections or name in self.spans:
+                    self.diagnostics.append({"section": name, "problem": "duplicate_start_marker", "position": marker.start()})
+                else:
+                    open_sections[name] = marker.end()
+            else:
+                start = open_sections.pop(name, None)
+                if start is None:
+                    self.diagnostics.append({"section": name, "problem": "end_without_start_marker", "position": marker.start()})
+                else:
+                    self.spans[name] = (start, marker.start())
+        for name, start in open_sections.items():
+            self.diagnostics.append({"section": name, "problem": "missing_end_marker", "position": start})
+
+    def raw(self, section_name: str) -> str | None:
+        span = self.spans.get(section_name)
+        return None if span is None else self.text[span[0]:span[1]]
+
+    def value(self, section_name: str):
+        """Parsed value of a known section, or None if its markers weren't found."""
+        if section_name not in self._values:
+            raw_content = self.raw(section_name)
+            if raw_content is None:
+                return None
+            self._values[section_name] = parse_section(section_name, raw_content, self.diagnostics)[1]
+        return self._values[section_name]
+
+class MarkerStreamParser:
+    """
+    Finds completed @@X_START@@ ... @@X_END@@ sections in text that arrives in
+    arbitrary chunks (markers may be split across chunks).
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+
+    def feed(self, chunk: str) -> list[tuple[str, str]]:
+        """Append a chunk and return (section_name, raw_content) for every section it completed."""
+        self.text += chunk
+        completed = []
+        while True:
+            start = _START_MARKER_RE.search(self.text, self._pos)
+            if not start:
+                break
+            end_marker = f"@@{start.group(1)}_END@@"
+            end = self.text.find(end_marker, start.end())
+            if end == -1:
+                break
+            completed.append((start.group(1), self.text[start.end():end]))
+            self._pos = end + len(end_marker)
+        return completed
+
+def normalize_transcript(transcript: str) -> str:
+    """Collapse whitespace so trivially different copies of a transcript share a cache key."""
+    return " ".join(transcript.split())
+
+def summary_cache_key(transcript: str, variant: str = "full", model: str = DEFAULT_OPENAI_MODEL) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{model}:{PROMPT_VERSION}:{variant}:".encode("utf-8"))
+    digest.update(normalize_transcript(transcript).encode("utf-8"))
+    return digest.hexdigest()
+
+def flashcards_cache_key(lecture_id: str, count: int, section_summaries: list[dict], key_concepts: list[str], model: str = DEFAULT_OPENAI_MODEL) -> str:
+    """
+    Key for a lecture's generated flashcards. The notes are hashed in too, so
+    repairing a lecture's sections doesn't keep serving cards built from the old ones.
+    """
+    digest = hashlib.sha256(json.dumps([section_summaries, key_concepts], sort_keys=True).encode("utf-8")).hexdigest()
+    return f"flashcards:{lecture_id}:{count}:{model}:{PROMPT_VERSION}:{digest}"
+
+def is_degraded_section(section_summary: dict) -> bool:
+    """True for a section summary that came from a failed call rather than the model."""
+    if section_summary.get("degraded"):
+        return True
+    # Lectures saved before the flag existed only have the empty placeholder.
+    return not any(section_summary.get(key) for key in ("key_takeaways", "new_vocabulary", "study_questions", "examples"))
+
+def is_summary_error(summary: str) -> bool:
+    """True when `Summarizer.summarize` gave up instead of producing notes."""
+    return summary.startswith("Error generating summary")
+
+def is_valid_section_summary(value) -> bool:
+    """Shape check for a section summary returned by the model."""
+    if not isinstance(value, dict) or not isinstance(value.get("section_title"), str):
+        return False
+    return all(isinstance(value.get(key, []), list) for key in ("key_takeaways", "new_vocabulary", "study_questions", "examples", "useful_references"))
+
+# Don't hedge until there are enough latency samples for a meaningful p95.
+HEDGE_MIN_SAMPLES = 20
 
 class Summarizer:
-    def __init__(self, api_key: str):
-        self.client = AsyncOpenAI(api_key=api_key)
-
-    def _split_transcript_into_sections(self, transcript: str, max_words_per_section: int = 500) -> list[str]:
-        """Split transcript into sections based purely on word count."""
-        print("\nDEBUG: Starting section splitting...")
-        
-        # Split into words and clean up
-        words = transcript.split()
-        total_words = len(words)
-        print(f"DEBUG: Total words in transcript: {total_words}")
-        
-        # Split into sections of max_words_per_section
-        sections = []
-        for i in range(0, total_words, max_words_per_section):
-            section = ' '.join(words[i:i + max_words_per_section])
-            sections.append(section)
-            print(f"DEBUG: Added section {len(sections)} with {len(words[i:i + max_words_per_section])} words")
-        
-        print(f"DEBUG: Final section count: {len(sections)}")
-        if sections:
-            avg_words = sum(len(section.split()) for section in sections) / len(sections)
-            print(f"DEBUG: Average words per section: {avg_words:.1f}")
-            
-        return sections
-
-    async def _generate_section_summary(self, section: str, section_number: int, total_sections: int) -> dict:
-        """Generate a summary for a single section of the transcript."""
-        prompt = (
-            f"You are a student-focused AI assistant analyzing section {section_number} of {total_sections} of a lecture transcript. "
-            "Your goal is to create a concise, structured summary that helps a student digest this specific part of the lecture. "
-            "The summary should be distinct from a simple transcript reduction and focus on actionable learning points.\n\n"
-            "Format the response as a JSON object with the following fields and STRICT constraints:\n"
-            "- section_title: A very short, descriptive title for this section (e.g., 'Introduction to Photosynthesis'). MUST be a string.\n"
-            "- key_takeaways: A list of 2-3 of the most critical concepts or conclusions as STRINGS. You must return at least 2 key takeaways. Each string MUST be a complete sentence. If none, return an empty list.\n"
-            "- new_vocabulary: A list of 1-4 new important keywords or technical terms as STRINGS. Ensure they are capitalized. If none, return an empty list.\n"
-            "- study_questions: A list of 1-2 pointed questions as STRINGS that a student should be able to answer after this section. This promotes active recall.\n"
-            "- examples: A list of 1-2 specific examples, analogies, real-world references, or illustrative scenarios mentioned in this section. These may include brief illustrative phrases. You must return at least 2 examples. If none, return an empty list.\n\n"
-            "- useful_references: You are an academic assistant helping students by providing useful, trustworthy reference links based on the lecture transcript below.\n\n🔗 Your task:\n- You MUST provide 2 real, working URLs** relevant to the lecture content.\n- These can include:  \n  • Sources directly mentioned in the transcript (if any)  \n  • Recommended readings: academic articles, videos, or educational web resources  \n\n🎯 Reference Guidelines:\n- Return up to **2 references** as a **JSON array of objects**\n- Each object must contain:  \n  • \"title\" - a short, clear name of the resource (string)  \n  • \"url\" - a real, working URL (string)\n- Example format:\n[\n  { \"title\": \"Modern Portfolio Theory (MPT)\", \"url\": \"https://www.investopedia.com/terms/m/modernportfoliotheory.asp\" },\n  { \"title\": \"Efficient Frontier Explained\", \"url\": \"https://www.khanacademy.org/economics-finance-domain/core-finance/investment-vehicles-tutorial/modern-portfolio-theory/v/efficient-frontier\" }\n]\n- DO NOT use markdown link syntax (e.g., `[title](url)`)\n- DO NOT include any commentary or formatting outside the JSON array\n- If no references are found, return an empty array: `[]`\n\n🎓 Preferred Sources (if applicable):\n- Academic domains like `.edu`, `.org`, `https://doi.org/`, or trusted sources like:  \n  Google Scholar, PubMed, Khan Academy, MIT OpenCourseWare, Stanford Encyclopedia of Philosophy, etc.\n\n📌 If no sources were mentioned in the transcript:\n- Still provide 2 highly relevant resources  \n- At least 1-2 should be high-quality academic or educational URLs based on the topic\n"
-            "Respond ONLY with the JSON object. Do not include any other text or formatting.\n\n"
-            "Here is the section text:\n\n"
-            f"{section}"
-        )
+    def __init__(
+        self,
+        api_key: str | None = None,
+        cache: TieredCache | None = None,
+        scheduler: LLMScheduler | None = None,
+        overall_mode: str = "full",
+        reduce_fan_in: int = 12,
+        section_tokens: int = DEFAULT_SECTION_TOKENS,
+        section_max_attempts: int = 3,
+        retry_base_delay: float = 1.0,
+        hedge_requests: bool = True,
+        backend: LLMBackend | None = None,
+        section_batch_size: int = 1,
+        stage_concurrency: dict[str, int] | None = None,
+    ):
+        self.backend = backend if backend is not None else OpenAIBackend(api_key)
+        self.cache = cache
+        self.scheduler = scheduler
+        # "full" sends the whole transcript to the overall call; "reduce" builds
+        # the overall notes from the section summaries instead.
+        if overall_mode not in ("full", "reduce"):
+            raise ValueError(f"Unknown overall summary mode: {overall_mode}")
+        self.overall_mode = overall_mode
+        self.reduce_fan_in = max(2, reduce_fan_in)
+        self.section_tokens = section_tokens
+        self.section_max_attempts = max(1, section_max_attempts)
+        self.retry_base_delay = retry_base_delay
+        self.hedge_requests = hedge_requests
+        # Sections packed into one completion; 1 sends every section on its own.
+        self.section_batch_size = max(1, section_batch_size)
+        # Recent section call latencies (excluding time queued in the scheduler).
+        self._section_latencies: deque = deque(maxlen=200)
+        self.hedged_requests = 0
+        # Every call since startup; its cached_ratio shows whether prompt caching is hitting.
+        self.usage_totals = TokenUsage()
+        # Optional per-stage caps, e.g. {"overall": 4}, shared by every summary in flight.
+        self.pipeline = self._build_pipeline(stage_concurrency)
+
+    async def _run_scheduled(self, make_call, priority: int, messages: list[dict]) -> Completion:
+        """Await `make_call()`, going through the shared scheduler when one is configured."""
+        async def timed_call():
+            began = time.monotonic()
+            completion = await make_call()
+            completion.latency_seconds = time.monotonic() - began
+            return completion
+
+        if self.scheduler is None:
+            return await timed_call()
+        # Rough prompt size (4 chars per token) plus headroom for the completion.
+        prompt_chars = sum(len(message["content"]) for message in messages)
+        estimated_tokens = prompt_chars // 4 + 1000
+        return await self.scheduler.run(timed_call, priority=priority, estimated_tokens=estimated_tokens)
+
+    def _record_usage(self, completion: Completion, kind: str, usage: TokenUsage | None) -> None:
+        """Count a completion towards the lecture's usage and the process-wide totals."""
+        self.usage_totals.add(completion, kind)
+        if usage is not None:
+            usage.add(completion, kind)
+
+    async def _create_completion(self, priority: int, messages: list[dict], temperature: float, json_mode: bool = False) -> Completion:
+        """Send a chat completion and return it once finished."""
+        return await self._run_scheduled(lambda: self.backend.complete(messages, temperature, json_mode), priority, messages)
+
+    def _hedge_delay(self) -> float | None:
+        """Seconds after which a section call gets a duplicate request, or None to never hedge."""
+        if not self.hedge_requests or len(self._section_latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self._section_latencies)
+        return latencies[int(len(latencies) * 0.95)]
+
+    async def _hedged_completion(self, priority: int, messages: list[dict], temperature: float, json_mode: bool = False) -> Completion:
+        """
+        Like `_create_completion`, but if the call runs past the recent p95 latency a
+        duplicate request is sent and whichever answers first wins.
+        """
+        started = asyncio.Event()
 
+        async def call():
+            started.set()
+            began = time.monotonic()
+            response = await self.backend.complete(messages, temperature, json_mode)
+            self._section_latencies.append(time.monotonic() - began)
+            return response
+
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is None:
+            return await self._run_scheduled(call, priority, messages)
+
+        primary = asyncio.ensure_future(self._run_scheduled(call, priority, messages))
+        pending = {primary}
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.4, # Slightly increased for more creative questions/links
-                response_format={ "type": "json_object" }
-            )
-            print(f"Response: {response.choices[0].message.content}")
-            return json.loads(response.choices[0].message.content)
+            # The latency budget starts once the scheduler admits the call, not while it queues.
+            waiting = asyncio.ensure_future(started.wait())
+            await asyncio.wait({primary, waiting}, return_when=asyncio.FIRST_COMPLETED)
+            waiting.cancel()
+            done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+            if not done:
+                self.hedged_requests += 1
+                print(f"Section call exceeded p95 latency ({hedge_delay:.1f}s), sending a hedged request")
+                pending.add(asyncio.ensure_future(
+                    self._run_scheduled(lambda: self.backend.complete(messages, temperature, json_mode), priority, messages)
+                ))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _stream_completion(self, priority: int, on_delta, messages: list[dict], temperature: float) -> Completion:
+        """
+        Stream a chat completion, awaiting `on_delta(text)` for every content delta,
+        and return it once finished. The scheduler slot is held until the stream ends.
+        """
+        return await self._run_scheduled(lambda: self.backend.stream(messages, on_delta, temperature), priority, messages)
+
+    def section_spans(self, transcript: str) -> list[tuple[int, int]]:
+        """(start, end) offsets of the sections `summarize` splits `transcript` into."""
+        return chunk_spans(transcript, self.section_tokens)
+
+    def _split_transcript_into_sections(self, transcript: str) -> list[str]:
+        """Split transcript into sections of at most `section_tokens` tokens at sentence boundaries."""
+        spans = self.section_spans(transcript)
+        print(f"DEBUG: Split transcript into {len(spans)} sections of up to {self.section_tokens} tokens")
+        return [transcript[start:end] for start, end in spans]
+
+    async def _generate_section_summary(self, section: str, section_number: int, total_sections: int | None, priority: int = PRIORITY_UPLOAD_FREE, usage: TokenUsage | None = None) -> dict:
+        """
+        Generate a summary for a single section of the transcript.
+        `total_sections` is None while a live lecture is still being recorded.
+        Token usage of every response is added to `usage` when given.
+        """
+        position = f"section {section_number} of {total_sections}" if total_sections else f"section {section_number}"
+        messages = build_messages(SECTION_SYSTEM, SECTION_USER, position=position, section=section)
+
+        for attempt in range(1, self.section_max_attempts + 1):
+            try:
+                response = await self._hedged_completion(
+                    priority,
+                    messages=messages,
+                    temperature=0.4, # Slightly increased for more creative questions/links
+                    json_mode=True,
+                )
+                self._record_usage(response, "section", usage)
+                print(f"Response: {response.text}")
+                return json.loads(response.text)
+            except Exception as e:
+                print(f"Error generating summary for section {section_number} (attempt {attempt}/{self.section_max_attempts}): {str(e)}")
+                if attempt < self.section_max_attempts:
+                    # Exponential backoff with jitter so parallel sections don't retry in lockstep.
+                    delay = self.retry_base_delay * 2 ** (attempt - 1)
+                    await asyncio.sleep(delay / 2 + random.uniform(0, delay / 2))
+
+        return {
+            "section_title": f"Section {section_number}",
+            "key_takeaways": [],
+            "new_vocabulary": [],
+            "study_questions": [],
+            "examples": [],
+            "useful_references": [],
+            "degraded": True,
+        }
+
+    async def _generate_section_batch(self, batch: list[tuple[int, str]], total_sections: int, priority: int = PRIORITY_UPLOAD_FREE, usage: TokenUsage | None = None) -> list[dict]:
+        """
+        Summarize several (section_number, section) pairs with a single completion.
+        Sections missing from the response or failing validation fall back to
+        individual `_generate_section_summary` calls.
+        """
+        first, last = batch[0][0], batch[-1][0]
+        sections_text = "\n\n".join(f"{SECTION_BATCH_HEADING.format(number=number)}\n{section}" for number, section in batch)
+        messages = build_messages(SECTION_BATCH_SYSTEM, SECTION_BATCH_USER, first=first, last=last, total=total_sections, sections=sections_text)
+
+        summaries = {}
+        try:
+            response = await self._create_completion(priority, messages=messages, temperature=0.4, json_mode=True)
+            self._record_usage(response, "section_batch", usage)
+            expected = {number for number, _ in batch}
+            for item in json.loads(response.text).get("sections", []):
+                if not isinstance(item, dict):
+                    continue
+                try:
+                    number = int(item.pop("section_number"))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if number in expected and number not in summaries and is_valid_section_summary(item):
+                    summaries[number] = item
         except Exception as e:
-            print(f"Error generating section summary: {str(e)}")
-            return {
-                "section_title": f"Section {section_number}",
-                "key_takeaways": [],
-                "new_vocabulary": [],
-                "study_questions": [],
-                "examples": [],
-                "useful_references": []
-            }
-
-    async def summarize(self, transcript: str) -> str:
-        if not transcript.strip():
-            return "No transcript provided to summarize."
-            
-        # Generate section summaries first, concurrently
-        sections = self._split_transcript_into_sections(transcript)
-        
-        print(f"\nGenerating summaries for {len(sections)} sections concurrently...")
-        tasks = []
-        for i, section in enumerate(sections, 1):
-            tasks.append(self._generate_section_summary(section, i, len(sections)))
-        
-        section_summaries = await asyncio.gather(*tasks)
-        print("All section summaries generated.")
-
-        # Generate the main summary without section summaries in the prompt
-        overall_prompt = (
-            "You are an expert academic note-taker, tasked with creating comprehensive study notes from a lecture transcript. "
-            "Your primary goal is to capture the depth and nuance of the lecture for thorough understanding and exam preparation.\n\n"
-            "Your task is to extract the key information and produce structured notes.\n\n"
-            "Please organize the notes using the following EXACT section markers and instructions:\n\n"
-            "@@LECTURE_TITLE_START@@\n"
-            "[Based on the *entire lecture transcript* provided, infer a clear and concise title that accurately captures the main theme or subject. Do not base the title on individual sections alone.]\n"
-            "@@LECTURE_TITLE_END@@\n\n"
-            "@@TOPIC_SUMMARY_START@@\n"
-            "[Provide a brief, single-sentence summary that encapsulates the main theme of the lecture.]\n"
-            "@@TOPIC_SUMMARY_END@@\n\n"
-            "@@KEY_CONCEPTS_START@@\n"
-            "[List key concepts as concise bullet points. Each key concept can only be a maximum of three words. Use standard markdown bullets '-'. Limit this section to a maximum of four key concepts. If none are distinct, state 'None'. These should be brief definitions or terms.]\n"
-            "@@KEY_CONCEPTS_END@@\n\n"
-            "@@MAIN_POINTS_START@@\n"
-            "[This is a CRITICAL section. Summarize the main ideas presented in the lecture in the order they appear. Each bullet point using '-' MUST be detailed and comprehensive, potentially spanning multiple sentences to fully explain the idea, its implications, or context. Do NOT provide short, Vague phrases. Aim for explanations that would help someone thoroughly understand the topic without re-listening to the lecture. If no main points are discernible, state 'None'.]\n"
-            "@@MAIN_POINTS_END@@\n\n"
-            "@@CONCLUSION_TAKEAWAYS_START@@\n"
-            "[Write a short, yet comprehensive paragraph summarizing the main conclusions or key takeaways from the entire lecture. This should synthesize the most important information for a final review. This section should be a paragraph, not bullet points.]\n"
-            "@@CONCLUSION_TAKEAWAYS_END@@\n\n"
-            "@@STUDY_QUESTIONS_START@@\n"
-            "[List 5-10 high-level study questions that cover the main topics of the entire lecture. You must provide at least 5 questions. Each question should be a string. If none, state 'None'.]\n"
-            "@@STUDY_QUESTIONS_END@@\n\n"
-            "@@FLASHCARDS_START@@\n"
-            "[Generate between 10 and 20 flashcards as a JSON array of objects. Each object must have a 'question' and 'answer' field. "
-            "Example: [{\"question\": \"Q1\", \"answer\": \"A1\"}, {\"question\": \"Q2\", \"answer\": \"A2\"}]. "
-            "If no relevant flashcards can be generated, return an empty array [].]\n"
-            "@@FLASHCARDS_END@@\n\n"
-            "@@OPTIONAL_REFERENCES_START@@\n"
-            "[You are an academic assistant helping students by providing useful, trustworthy reference links based on the lecture transcript below.\n\n🔗 Your task:\n- Provide **at least 5 real, working URLs** relevant to the lecture content.\n- These can include:  \n  • Sources directly mentioned in the transcript (if any)  \n  • Recommended readings: academic articles, videos, or educational web resources  \n\n🎯 Reference Guidelines:\n- Return up to **10 references** as a **JSON array of objects**\n- Each object must contain:  \n  • \"title\" – a short, clear name of the resource (string)  \n  • \"url\" - a real, working URL (string)\n- Example format:\n[\n  { \"title\": \"Modern Portfolio Theory (MPT)\", \"url\": \"https://www.investopedia.com/terms/m/modernportfoliotheory.asp\" },\n  { \"title\": \"Efficient Frontier Explained\", \"url\": \"https://www.khanacademy.org/economics-finance-domain/core-finance/investment-vehicles-tutorial/modern-portfolio-theory/v/efficient-frontier\" }\n]\n- DO NOT use markdown link syntax (e.g., `[title](url)`)\n- DO NOT include any commentary or formatting outside the JSON array\n- If no references are found, return an empty array: `[]`\n\n🎓 Preferred Sources (if applicable):\n- Academic domains like `.edu`, `.org`, `https://doi.org/`, or trusted sources like:  \n  Google Scholar, PubMed, Khan Academy, MIT OpenCourseWare, Stanford Encyclopedia of Philosophy, etc.\n\n📌 If no sources were mentioned in the transcript:\n- Still provide 5 highly relevant resources  \n- At least 2-3 should be high-quality academic or educational URLs based on the topic\n]\n"
-            "@@OPTIONAL_REFERENCES_END@@\n\n"
-            "Here is the lecture transcript:\n\n"
-            f"{transcript}"
-        )
+            print(f"Error generating batched summary for sections {first}-{last}: {str(e)}")
+
+        missing = [(number, section) for number, section in batch if number not in summaries]
+        if missing:
+            print(f"Batched summary incomplete, summarizing sections {[number for number, _ in missing]} individually.")
+            fallbacks = await asyncio.gather(*(
+                self._generate_section_summary(section, number, total_sections, priority, usage) for number, section in missing
+            ))
+            summaries.update(zip((number for number, _ in missing), fallbacks))
+        return [summaries[number] for number, _ in batch]
 
+    async def _generate_section_summaries(self, sections: list[str], priority: int, usage: TokenUsage | None = None) -> list[dict]:
+        """Summarize all sections concurrently, `section_batch_size` sections per request."""
+        if self.section_batch_size == 1:
+            return list(await asyncio.gather(*(
+                self._generate_section_summary(section, i, len(sections), priority, usage) for i, section in enumerate(sections, 1)
+            )))
+        numbered = list(enumerate(sections, 1))
+        batches = [numbered[i:i + self.section_batch_size] for i in range(0, len(numbered), self.section_batch_size)]
+        results = await asyncio.gather(*(self._generate_section_batch(batch, len(sections), priority, usage) for batch in batches))
+        return [section_summary for batch_summaries in results for section_summary in batch_summaries]
+
+    async def _merge_section_summaries(self, group: list[dict], group_number: int, total_groups: int, priority: int, usage: TokenUsage | None = None) -> dict:
+        """Condense a group of consecutive section summaries into one section-shaped summary."""
+        messages = build_messages(
+            MERGE_SYSTEM, MERGE_USER,
+            count=len(group), group_number=group_number, total_groups=total_groups, notes=format_section_notes(group),
+        )
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": overall_prompt}],
+            response = await self._create_completion(
+                priority,
+                messages=messages,
                 temperature=0.3,
+                json_mode=True,
             )
-            summary_text = response.choices[0].message.content
+            self._record_usage(response, "merge", usage)
+            return json.loads(response.text)
+        except Exception as e:
+            print(f"Error merging section summaries for group {group_number}: {str(e)}")
+            return merge_section_summaries_locally(group)
+
+    async def _reduce_section_summaries(self, section_summaries: list[dict], priority: int, usage: TokenUsage | None = None) -> list[dict]:
+        """
+        Merge section summaries level by level until at most `reduce_fan_in` remain,
+        so the final reduce prompt stays small however long the lecture is.
+        """
+        level = list(section_summaries)
+        depth = 0
+        while len(level) > self.reduce_fan_in:
+            groups = [level[i:i + self.reduce_fan_in] for i in range(0, len(level), self.reduce_fan_in)]
+            depth += 1
+            print(f"DEBUG: Reduce level {depth}: merging {len(level)} summaries into {len(groups)}")
+            level = await asyncio.gather(*(
+                self._merge_section_summaries(group, i, len(groups), priority, usage)
+                for i, group in enumerate(groups, 1)
+            ))
+        return level
+
+    def _build_overall_messages(self, transcript: str, reduced_summaries: list[dict] | None) -> list[dict]:
+        if reduced_summaries is None:
+            return build_messages(OVERALL_FULL_SYSTEM, OVERALL_FULL_USER, transcript=transcript)
+        return build_messages(OVERALL_REDUCE_SYSTEM, OVERALL_REDUCE_USER, notes=format_section_notes(reduced_summaries))
+
+    def _build_pipeline(self, stage_concurrency: dict[str, int] | None) -> Pipeline:
+        """
+        The summary pipeline as a stage graph. In full mode the overall call reads
+        the transcript, not the section summaries, so it runs alongside the map
+        stage and a summary takes max(sections, overall) rather than their sum.
+        In reduce mode the overall call has to wait for the reduced notes.
+        """
+        limits = stage_concurrency or {}
+        if self.overall_mode == "reduce":
+            overall_stage = [
+                Stage("reduce", self._stage_reduce, depends_on=("map",), max_concurrency=limits.get("reduce")),
+                Stage("overall", self._stage_overall, depends_on=("reduce",), max_concurrency=limits.get("overall")),
+            ]
+        else:
+            overall_stage = [Stage("overall", self._stage_overall, max_concurrency=limits.get("overall"))]
+        return Pipeline([
+            Stage("split", self._stage_split, max_concurrency=limits.get("split")),
+            Stage("map", self._stage_map, depends_on=("split",), max_concurrency=limits.get("map")),
+            *overall_stage,
+            Stage("assemble", self._stage_assemble, depends_on=("map", "overall"), max_concurrency=limits.get("assemble")),
+        ])
+
+    async def _stage_split(self, context: dict, results: dict) -> list[str] | None:
+        if context["section_summaries"] is not None:
+            return None
+        return self._split_transcript_into_sections(context["transcript"])
+
+    async def _stage_map(self, context: dict, results: dict) -> list[dict]:
+        section_summaries = context["section_summaries"]
+        if section_summaries is None:
+            sections = results["split"]
+            print(f"\nGenerating summaries for {len(sections)} sections concurrently...")
+            section_summaries = await self._generate_section_summaries(sections, context["priority"], context["usage"])
+            print("All section summaries generated.")
+        elif inspect.isawaitable(section_summaries):
+            # Live recordings hand over the still-running section tasks.
+            section_summaries = list(await section_summaries)
+        if context["on_section"] is not None:
+            await context["on_section"]("section_summaries", section_summaries)
+        return section_summaries
+
+    async def _stage_reduce(self, context: dict, results: dict) -> list[dict]:
+        return await self._reduce_section_summaries(results["map"], context["priority"], context["usage"])
+
+    async def _stage_overall(self, context: dict, results: dict) -> str:
+        # In full mode the overall call re-reads the transcript; in reduce mode it
+        # only sees the (hierarchically merged) section summaries.
+        overall_messages = self._build_overall_messages(context["transcript"], results.get("reduce"))
+        on_section = context["on_section"]
+        if on_section is None:
+            response = await self._create_completion(
+                context["priority"],
+                messages=overall_messages,
+                temperature=0.3,
+            )
+        else:
+            parser = MarkerStreamParser()
+
+            async def on_delta(delta: str):
+                for section_name, raw_content in parser.feed(delta):
+                    parsed = parse_section(section_name, raw_content)
+                    if parsed is not None:
+                        await on_section(*parsed)
 
-            # Add section summaries to the summary text
-            section_summaries_json = json.dumps(section_summaries, indent=2)
-            summary_text = summary_text.rstrip() + "\n\n@@SECTION_SUMMARIES_START@@\n" + section_summaries_json + "\n@@SECTION_SUMMARIES_END@@\n"
-            
-            return summary_text
+            response = await self._stream_completion(
+                context["priority"],
+                on_delta,
+                messages=overall_messages,
+                temperature=0.3,
+            )
+        self._record_usage(response, "overall", context["usage"])
+        return response.text
+
+    async def _stage_assemble(self, context: dict, results: dict) -> str:
+        section_summaries = results["map"]
+        # Add section summaries to the summary text
+        section_summaries_json = json.dumps(section_summaries, indent=2)
+        summary_text = results["overall"].rstrip() + "\n\n@@SECTION_SUMMARIES_START@@\n" + section_summaries_json + "\n@@SECTION_SUMMARIES_END@@\n"
+
+        # Degraded sections come from failed calls; don't pin them in the cache.
+        if self.cache is not None and not any(is_degraded_section(s) for s in section_summaries):
+            self.cache.set(context["cache_key"], summary_text)
+        return summary_text
+
+    async def summarize(self, transcript: str, priority: int = PRIORITY_UPLOAD_FREE, on_section=None, section_summaries=None, usage: TokenUsage | None = None) -> str:
+        """
+        Summarize a transcript into the marker-delimited notes format.
+
+        If `on_section` is given, the overall completion is streamed and
+        `await on_section(field, value)` is called as soon as each marker section
+        closes, with the same field names and values as `parse_structured_summary`.
+        Pass `section_summaries` when they were already generated (e.g. during a
+        live recording) to skip the per-section calls; an awaitable of them is also
+        accepted, so the overall call can start before they finish. Pass `usage` to
+        collect the token counts of every call made for this transcript.
+        """
+        if not transcript.strip():
+            return "No transcript provided to summarize."
+
+        cache_key = summary_cache_key(transcript, self.overall_mode, self.backend.model)
+        if self.cache is not None:
+            cached_summary = self.cache.get(cache_key)
+            if cached_summary is not None:
+                print(f"Summary cache hit for {cache_key[:12]}")
+                if inspect.isawaitable(section_summaries):
+                    asyncio.ensure_future(section_summaries).cancel()
+                return cached_summary
+
+        context = {
+            "transcript": transcript,
+            "priority": priority,
+            "on_section": on_section,
+            "section_summaries": section_summaries,
+            "usage": usage,
+            "cache_key": cache_key,
+        }
+        try:
+            results, timings = await self.pipeline.run(context)
         except Exception as e:
             print(f"Error in summarization: {str(e)}")
             return f"Error generating summary: {str(e)}"
+        print("Summary stage timings: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+        return results["assemble"]
+
+    async def generate_flashcards(self, section_summaries: list[dict], key_concepts: list[str] | None = None, count: int = 15, priority: int = PRIORITY_UPLOAD_FREE, usage: TokenUsage | None = None) -> list[dict]:
+        """
+        Build question/answer flashcards from a lecture's stored section summaries and
+        key concepts, which is a much smaller prompt than the transcript. Returns an
+        empty list if generation fails.
+        """
+        usable = [section_summary for section_summary in section_summaries if not is_degraded_section(section_summary)]
+        messages = build_messages(
+            FLASHCARDS_SYSTEM, FLASHCARDS_USER,
+            count=count, key_concepts=", ".join(key_concepts or []) or "None", notes=format_section_notes(usable),
+        )
+        try:
+            response = await self._create_completion(priority, messages=messages, temperature=0.4, json_mode=True)
+            self._record_usage(response, "flashcards", usage)
+            cards = json.loads(response.text).get("flashcards", [])
+        except Exception as e:
+            print(f"Error generating flashcards: {str(e)}")
+            return []
+        return [
+            {"question": card["question"].strip(), "answer": card["answer"].strip()}
+            for card in cards
+            if isinstance(card, dict) and isinstance(card.get("question"), str) and isinstance(card.get("answer"), str)
+        ][:count]
+
+    async def repair_section_summaries(self, sections: list[str], section_summaries: list[dict], priority: int = PRIORITY_UPLOAD_FREE, usage: TokenUsage | None = None) -> tuple[list[dict], list[int]]:
+        """
+        Re-run only the degraded sections of an existing lecture. `sections` are the
+        texts the lecture's section summaries were made from, in order. Returns the
+        updated section summaries and the (1-based) numbers of the sections that were re-run.
+        """
+        if len(sections) != len(section_summaries):
+            raise ValueError(f"The lecture has {len(sections)} sections but {len(section_summaries)} section summaries.")
+
+        degraded = [i for i, section_summary in enumerate(section_summaries) if is_degraded_section(section_summary)]
+        results = await asyncio.gather(*(
+            self._generate_section_summary(sections[i], i + 1, len(sections), priority, usage) for i in degraded
+        ))
+        repaired = list(section_summaries)
+        for i, section_summary in zip(degraded, results):
+            repaired[i] = section_summary
+        return repaired, [i + 1 for i in degraded]
 
     def parse_structured_summary(self, summary_text: str) -> dict:
+        """
+        Parse the marker-delimited summary into its fields. Structural problems
+        are reported under "parse_diagnostics".
+        """
+        scan = SummaryScan(summary_text)
         parsed_data = {}
 
-        array_sections_keys = [
-            "key_concepts", 
-            "main_points_covered",
-            "study_questions"
-        ]
-
-        sections = {
-            "lecture_title": "LECTURE_TITLE",
-            "topic_summary_sentence": "TOPIC_SUMMARY",
-            "key_concepts": "KEY_CONCEPTS",
-            "main_points_covered": "MAIN_POINTS",
-            "conclusion_takeaways": "CONCLUSION_TAKEAWAYS",
-            "study_questions": "STUDY_QUESTIONS",
-        }
-        
-        json_sections = {
-            "references": "OPTIONAL_REFERENCES",
-            "section_summaries": "SECTION_SUMMARIES",
-            "flashcards": "FLASHCARDS"
-        }
-
-        for key, section_name in json_sections.items():
-            start_marker = f"@@{section_name}_START@@"
-            end_marker = f"@@{section_name}_END@@"
-            match = re.search(f"{re.escape(start_marker)}(.*?){re.escape(end_marker)}", summary_text, re.DOTALL)
-            if match:
-                try:
-                    content = match.group(1).strip()
-                    if content and content.lower() not in ["none", "not available", "[]"]:
-                        parsed_data[key] = json.loads(content)
-                        print(f"Successfully parsed JSON for {key}")
-                    else:
-                        parsed_data[key] = []
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing JSON for section {key}: {e}")
-                    parsed_data[key] = []
-            else:
-                print(f"Markers for JSON section '{section_name}' not found.")
-                parsed_data[key] = []
-
-        for key, section_name in sections.items():
-            start_marker = f"@@{section_name}_START@@"
-            end_marker = f"@@{section_name}_END@@"
-            
-            match = re.search(f"{re.escape(start_marker)}(.*?){re.escape(end_marker)}", summary_text, re.DOTALL)
-            if match:
-                content = match.group(1).strip()
-                if content.lower() in ["none", "not available", ""]:
-                    parsed_data[key] = [] if key in array_sections_keys else ""
-                else:
-                    if key in array_sections_keys:
-                        lines = [
-                            re.sub(r"^\s*[-*\u2022]\s*", "", line).strip() 
-                            for line in content.splitlines() 
-                            if line.strip()
-                        ]
-                        if len(lines) == 1 and lines[0].lower() in ["none", "not available"]:
-                            parsed_data[key] = []
-                        else:
-                            parsed_data[key] = lines
-                    else:
-                        parsed_data[key] = content
-            else:
-                parsed_data[key] = [] if key in array_sections_keys else ""
+        for section_name, key in (*JSON_SECTIONS.items(), *TEXT_SECTIONS.items()):
+            value = scan.value(section_name)
+            if value is None:
+                if section_name not in scan.spans and not any(d["section"] == section_name for d in scan.diagnostics):
+                    scan.diagnostics.append({"section": section_name, "problem": "missing_section"})
                 print(f"Warning: Markers for section '{section_name}' not found in summary.")
+                value = [] if section_name in JSON_SECTIONS or key in ARRAY_FIELDS else ""
+            parsed_data[key] = value
 
+        parsed_data["parse_diagnostics"] = scan.diagnostics
         return parsed_data
+
+
+class RollingSectionWindower:
+    """
+    Accumulates finalized transcript segments and cuts sections off the front as
+    soon as they fill, using the same sentence-boundary chunker as
+    `_split_transcript_into_sections`.
+    """
+
+    def __init__(self, max_tokens: int = DEFAULT_SECTION_TOKENS):
+        self.max_tokens = max_tokens
+        # The transcript so far, joined exactly like the final transcript is.
+        self.text = ""
+        # Offset into `text` up to which sections have been emitted.
+        self.consumed = 0
+
+    def add(self, segment: str) -> list[tuple[int, int]]:
+        """Add a finalized segment and return the (start, end) offsets in `text` of any sections it completed."""
+        self.text = f"{self.text} {segment}" if self.text else segment
+        if count_tokens(self.text, self.consumed) <= self.max_tokens:
+            return []
+        offset = self.consumed
+        spans = chunk_spans(self.text[offset:], self.max_tokens)
+        # The last span may still grow with the next segment; keep it pending.
+        if len(spans) > 1:
+            self.consumed = offset + spans[-1][0]
+        return [(offset + start, offset + end) for start, end in spans[:-1]]
+
+
+class LiveSectionSummarizer:
+    """
+    Starts section summaries for a lecture while it is still being recorded, so
+    that after the recording stops only the tail window and the overall step remain.
+    """
+
+    def __init__(self, summarizer: Summarizer, priority: int = PRIORITY_UPLOAD_FREE):
+        self.summarizer = summarizer
+        self.priority = priority
+        self._windower = RollingSectionWindower(summarizer.section_tokens)
+        self._tasks: list[asyncio.Task] = []
+        # Offsets of every section summarized so far in the final transcript, so the
+        # sections can be saved with the lecture and repaired later.
+        self.section_spans: list[tuple[int, int]] = []
+        # Every call made for this lecture, including sections summarized while recording.
+        self.usage = TokenUsage()
+
+    def _start_section(self, section: str, span: tuple[int, int]) -> None:
+        section_number = len(self._tasks) + 1
+        print(f"DEBUG: Starting live summary for section {section_number}")
+        self.section_spans.append(span)
+        self._tasks.append(asyncio.create_task(
+            self.summarizer._generate_section_summary(section, section_number, None, self.priority, self.usage)
+        ))
+
+    def add_segment(self, segment: str) -> None:
+        for start, end in self._windower.add(segment):
+            self._start_section(self._windower.text[start:end], (start, end))
+
+    async def finish(self, transcript: str, on_section=None) -> str:
+        """
+        Summarize whatever is left of the final transcript and produce the full
+        notes. The final transcript may extend the last segments that were fed in
+        (e.g. a trailing interim), so the tail is taken from `transcript` itself.
+        """
+        consumed = self._windower.consumed
+        if transcript[:consumed] != self._windower.text[:consumed]:
+            # The final transcript diverged from the live segments; the emitted
+            # sections no longer line up, so summarize everything again.
+            print("DEBUG: Final transcript diverged from live sections, re-splitting.")
+            self.cancel()
+            self._tasks = []
+            self.section_spans = []
+            consumed = 0
+        for start, end in self.summarizer.section_spans(transcript[consumed:]):
+            self._start_section(transcript[consumed + start:consumed + end], (consumed + start, consumed + end))
+        # Handed over unawaited so the overall call doesn't wait for the tail sections.
+        section_summaries = asyncio.gather(*self._tasks)
+        return await self.summarizer.summarize(
+            transcript,
+            priority=self.priority,
+            on_section=on_section,
+            section_summaries=section_summaries,
+            usage=self.usage,
+        )
+
+    def cancel(self) -> None:
+        """Abandon in-flight section summaries (e.g. the client disconnected)."""
+        for task in self._tasks:
+            task.cancel()
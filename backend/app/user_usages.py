@@ -65,6 +65,10 @@ async def reset_user_usage(user_id: str, start_date:int = None, end_date: int =
         update_data = {
             "uploads_count": 0,
             "recordings_count": 0,
+            "tokens_used": 0,
+            "prompt_tokens_used": 0,
+            "completion_tokens_used": 0,
+            "cached_tokens_used": 0,
             "usage_period_start": start_date_dt.isoformat(),
             "usage_period_end": end_date_dt.isoformat()
         }
@@ -101,6 +105,21 @@ async def update_usage_recordings(user_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating recordings: {e}")
    
+async def update_usage_tokens(user_id: str, token_usage: dict):
+    """Add one lecture's LLM token counts (a `TokenUsage.to_dict()`) to the user's running totals."""
+    try:
+        response = supabase.table("user_usage").select("tokens_used, prompt_tokens_used, completion_tokens_used, cached_tokens_used").eq("user_id", user_id).single().execute()
+        current = response.data or {}
+        supabase.table("user_usage").update({
+            "tokens_used": (current.get("tokens_used") or 0) + token_usage["total_tokens"],
+            "prompt_tokens_used": (current.get("prompt_tokens_used") or 0) + token_usage["prompt_tokens"],
+            "completion_tokens_used": (current.get("completion_tokens_used") or 0) + token_usage["completion_tokens"],
+            "cached_tokens_used": (current.get("cached_tokens_used") or 0) + token_usage["cached_tokens"],
+        }).eq("user_id", user_id).execute()
+        return {"success": True, "message": "Token usage recorded"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating token usage: {e}")
+
 async def get_remaining_uploads_count(user_id: str):
     try:
         print(user_id)
@@ -159,10 +178,39 @@ async def get_remaining_recordings_count(user_id: str):
         raise HTTPException(status_code=500, detail=f"Error getting remaining recordings: {e}")
 
 
+async def get_remaining_tokens_count(user_id: str):
+    try:
+        response = supabase.table("profiles") \
+            .select("subscription_status, plan_limits!left(max_tokens), user_usage!left(tokens_used)") \
+            .eq("id", user_id) \
+            .single() \
+            .execute()
+
+        if not response.data:
+            raise HTTPException(status_code=404, detail="User profile not found.")
+
+        plan_limits = response.data.get('plan_limits')
+        user_usage = response.data.get('user_usage')
+
+        # Plans without a token budget (max_tokens is NULL) are unlimited.
+        max_tokens = plan_limits.get('max_tokens') if plan_limits else None
+        current_tokens = (user_usage.get('tokens_used') or 0) if user_usage else 0
+        if max_tokens is not None:
+            remaining_tokens = max(max_tokens - current_tokens, 0)
+        else:
+            remaining_tokens = -1  # Use -1 for unlimited
+
+        return {"success": True, "remaining_tokens": remaining_tokens, "tokens_used": current_tokens}
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=f"Error getting remaining tokens: {e}")
+
+
 async def get_usage_summary(user_id: str):
     try:
         response = supabase.table("profiles") \
-            .select("subscription_status, plan_limits!left(max_uploads, max_recordings), user_usage!left(uploads_count, recordings_count, usage_period_end)") \
+            .select("subscription_status, plan_limits!left(max_uploads, max_recordings, max_tokens), user_usage!left(uploads_count, recordings_count, tokens_used, usage_period_end)") \
             .eq("id", user_id) \
             .single() \
             .execute()
@@ -188,12 +236,21 @@ async def get_usage_summary(user_id: str):
         else:
             remaining_recordings = -1  # Use -1 for unlimited
 
+        max_tokens = plan_limits.get('max_tokens') if plan_limits else None
+        tokens_used = (user_usage.get('tokens_used') or 0) if user_usage else 0
+        if max_tokens is not None:
+            remaining_tokens = max(max_tokens - tokens_used, 0)
+        else:
+            remaining_tokens = -1  # Use -1 for unlimited
+
         usage_period_end = user_usage.get('usage_period_end') if user_usage else None
         
         return {
             "success": True, 
             "remaining_uploads": remaining_uploads,
             "remaining_recordings": remaining_recordings,
+            "remaining_tokens": remaining_tokens,
+            "tokens_used": tokens_used,
             "usage_period_end": usage_period_end
         }
     except Exception as e:
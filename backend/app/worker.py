@@ -0,0 +1,26 @@
+"""
+Standalone upload worker: `python -m app.worker`.
+
+Runs upload jobs from the queue at JOB_DB_PATH, JOB_WORKERS at a time, without
+serving HTTP. Run the API with JOB_WORKERS=0 and as many of these as needed
+to scale processing separately from connections. They share the JOB_DB_PATH
+and JOB_STORAGE_DIR files with the API, so run them on the same disk.
+"""
+import asyncio
+
+from .config import settings
+from .main import job_workers
+
+
+async def run_worker() -> None:
+    job_workers.concurrency = max(1, settings.JOB_WORKERS)
+    job_workers.start()
+    print(f"Upload worker started with {job_workers.concurrency} concurrent jobs.")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await job_workers.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
@@ -0,0 +1,111 @@
+"""
+Compare the sentence-boundary chunker against the old fixed word-count splitter.
+
+The chunker is timed with both token counters: the approximate word-based count
+and a real BPE encoding. The BPE run uses tiktoken's cl100k_base when it can be
+loaded; offline, it uses a local encoding built from the input with the same
+pre-tokenizer pattern (see `make_local_encoding`), so encoding costs about the
+same per character. A single encode of the whole text is printed as the floor
+for any splitter that counts real tokens.
+
+Usage (from backend/):
+    python benchmarks/bench_chunker.py [path/to/transcript.txt] [repeats]
+"""
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import app.chunker as chunker
+from app.chunker import chunk_spans, count_tokens, _get_encoding
+
+# cl100k_base's pre-tokenizer: BPE merges never cross these pieces.
+CL100K_PATTERN = r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]++[\r\n]*|\s*[\r\n]|\s+(?!\S)|\s+"""
+
+
+def make_local_encoding(text: str, vocab_size: int = 20000):
+    """
+    A tiktoken BPE encoding that needs no download: every byte, plus every prefix
+    of the most common words in `text` (with and without a leading space), so
+    frequent words become one token and rare ones split into several, as with
+    cl100k_base.
+    """
+    import tiktoken
+
+    ranks = {bytes([byte]): byte for byte in range(256)}
+    for word, _ in Counter(re.findall(r" ?[A-Za-z]+", text)).most_common():
+        data = word.encode()
+        for length in range(2, len(data) + 1):
+            ranks.setdefault(data[:length], len(ranks))
+        if len(ranks) >= vocab_size:
+            break
+    return tiktoken.Encoding("local_bpe", pat_str=CL100K_PATTERN, mergeable_ranks=ranks, special_tokens={})
+
+
+def use_encoding(encoding) -> None:
+    """Make `count_tokens` use `encoding` (None for the approximate count)."""
+    chunker._encoding = encoding
+    chunker._encoding_loaded = True
+
+
+def legacy_split(transcript: str, max_words_per_section: int = 500) -> list[str]:
+    """The previous `_split_transcript_into_sections`, minus its debug prints."""
+    words = transcript.split()
+    sections = []
+    for i in range(0, len(words), max_words_per_section):
+        sections.append(' '.join(words[i:i + max_words_per_section]))
+    if sections:
+        # The old splitter re-split every section to compute this average.
+        sum(len(section.split()) for section in sections) / len(sections)
+    return sections
+
+
+def best_of(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else BACKEND_DIR / "app" / "transcript.txt"
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    text = path.read_text()
+
+    encoding = _get_encoding()
+    bpe_name = "cl100k_base"
+    if encoding is None:
+        try:
+            encoding, bpe_name = make_local_encoding(text), "local BPE"
+        except ImportError:
+            bpe_name = None
+
+    legacy_time = best_of(lambda: legacy_split(text), repeats)
+    print(f"Input: {path.name} ({len(text.split())} words, {len(text)} chars)")
+    print(f"legacy word splitter        : {legacy_time * 1000:8.2f} ms  ({len(legacy_split(text))} sections)")
+
+    counters = [("approximate", None)] + ([(bpe_name, encoding)] if bpe_name else [])
+    for name, counter_encoding in counters:
+        use_encoding(counter_encoding)
+        chunker_time = best_of(lambda: chunk_spans(text), repeats)
+        spans = chunk_spans(text)
+        tokens = [count_tokens(text, start, end) for start, end in spans]
+        print(f"token chunker ({name:>11}): {chunker_time * 1000:8.2f} ms  ({len(spans)} sections, "
+              f"{min(tokens)}-{max(tokens)} tokens each, {legacy_time / chunker_time:.2f}x legacy speed)")
+        if counter_encoding is not None:
+            encode_time = best_of(lambda: counter_encoding.encode_ordinary(text), repeats)
+            print(f"one encode of the whole text: {encode_time * 1000:8.2f} ms  "
+                  f"({len(counter_encoding.encode_ordinary(text))} tokens)")
+    if not bpe_name:
+        print("tiktoken is not installed; only the approximate counter was timed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare the single-pass summary parser against the old per-section regex parser,
+on notes produced by the real prompts (answered offline by `LocalLLMBackend`).
+
+Usage (from backend/):
+    python benchmarks/bench_parse_summary.py [path/to/transcript.txt] [repeats]
+"""
+import asyncio
+import contextlib
+import io
+import re
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app.llm_backends import LocalLLMBackend
+from app.summarizer import ARRAY_FIELDS, JSON_SECTIONS, TEXT_SECTIONS, Summarizer, parse_section
+
+
+def legacy_parse(summary_text: str) -> dict:
+    """The previous `parse_structured_summary`: one DOTALL regex search per section."""
+    parsed_data = {}
+    for section_name, key in JSON_SECTIONS.items():
+        start_marker = f"@@{section_name}_START@@"
+        end_marker = f"@@{section_name}_END@@"
+        match = re.search(f"{re.escape(start_marker)}(.*?){re.escape(end_marker)}", summary_text, re.DOTALL)
+        parsed_data[key] = parse_section(section_name, match.group(1))[1] if match else []
+    for section_name, key in TEXT_SECTIONS.items():
+        start_marker = f"@@{section_name}_START@@"
+        end_marker = f"@@{section_name}_END@@"
+        match = re.search(f"{re.escape(start_marker)}(.*?){re.escape(end_marker)}", summary_text, re.DOTALL)
+        if match:
+            parsed_data[key] = parse_section(section_name, match.group(1))[1]
+        else:
+            parsed_data[key] = [] if key in ARRAY_FIELDS else ""
+    return parsed_data
+
+
+def build_summary(transcript: str) -> str:
+    """
+    Notes for `transcript` in the real output format: the summarizer runs the
+    actual section and overall prompts against the offline `LocalLLMBackend`.
+    """
+    summarizer = Summarizer(backend=LocalLLMBackend(latency_seconds=0))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return asyncio.run(summarizer.summarize(transcript))
+
+
+def best_of(fn, repeats: int) -> float:
+    timings = []
+    # Both parsers print per section; keep that out of the timings.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeats):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else BACKEND_DIR / "app" / "transcript.txt"
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    summary = build_summary(path.read_text())
+    summarizer = Summarizer.__new__(Summarizer)  # The parser needs no backend.
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        new = summarizer.parse_structured_summary(summary)
+        new.pop("parse_diagnostics")
+        assert new == legacy_parse(summary), "parsers disagree"
+
+    legacy_time = best_of(lambda: legacy_parse(summary), repeats)
+    new_time = best_of(lambda: summarizer.parse_structured_summary(summary), repeats)
+
+    print(f"Summary: {len(summary)} chars, {len(new['section_summaries'])} section summaries")
+    print(f"legacy regex parser: {legacy_time * 1000:8.3f} ms")
+    print(f"single-pass parser : {new_time * 1000:8.3f} ms  ({legacy_time / new_time:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
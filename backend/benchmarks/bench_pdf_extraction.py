@@ -0,0 +1,101 @@
+"""
+Measure how PDF text extraction scales with the number of worker processes.
+
+Extracts the same PDF with `ExtractionPool(max_workers=n)` for n = 1, 2, 4, ...
+up to the CPU count, splitting it into n page ranges, and prints the wall time
+and speedup over one worker. Without a path, a synthetic text-only PDF is
+generated.
+
+Usage (from backend/):
+    python benchmarks/bench_pdf_extraction.py [path/to/document.pdf | pages] [repeats]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app.extraction import ExtractionPool, count_pdf_pages
+
+LINES_PER_PAGE = 45
+
+
+def make_text_pdf(path: str, pages: int) -> None:
+    """Write a PDF with `pages` pages of plain text lines in Helvetica."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # The page tree, filled in once the page object numbers are known.
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for number in range(pages):
+        lines = [
+            f"({' '.join(f'page{number}-line{line}-word{word}' for word in range(6))}) Tj T*"
+            for line in range(LINES_PER_PAGE)
+        ]
+        stream = ("BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(lines) + " ET").encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % ref for ref in page_refs)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    with open(path, "wb") as file:
+        file.write(output)
+
+
+def best_of(fn, repeats: int) -> tuple[float, str]:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    argument = sys.argv[1] if len(sys.argv) > 1 else "300"
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with tempfile.TemporaryDirectory() as directory:
+        if argument.isdigit():
+            path = os.path.join(directory, "synthetic.pdf")
+            make_text_pdf(path, int(argument))
+        else:
+            path = argument
+        pages = count_pdf_pages(path)
+        cpus = os.cpu_count() or 1
+        worker_counts = sorted({1, *(n for n in (2, 4, 8, 16, 32) if n <= cpus), cpus})
+
+        print(f"Input: {os.path.basename(path)} ({pages} pages, {os.path.getsize(path) // 1024} KB), {cpus} CPUs")
+        baseline = None
+        for workers in worker_counts:
+            # One range per worker, however short the document.
+            pool = ExtractionPool(max_workers=workers, timeout_seconds=600, memory_limit_mb=0,
+                                  pdf_pages_per_worker=max(1, pages // workers))
+            elapsed, text = best_of(lambda: asyncio.run(pool.extract(path, "document.pdf")), repeats)
+            baseline = baseline or elapsed
+            print(f"{workers:3d} worker(s): {elapsed * 1000:9.1f} ms  speedup {baseline / elapsed:5.2f}x  "
+                  f"({len(text.split())} words)")
+
+
+if __name__ == "__main__":
+    main()
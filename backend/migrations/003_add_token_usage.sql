@@ -0,0 +1,13 @@
+-- Per-lecture LLM token accounting
+ALTER TABLE lectures ADD COLUMN IF NOT EXISTS token_usage JSONB;
+
+COMMENT ON COLUMN lectures.token_usage IS 'LLM tokens spent producing the notes: prompt_tokens, completion_tokens, cached_tokens, total_tokens, calls, and a by_call breakdown (section, merge, overall).';
+
+-- Per-user running totals for the current usage period (reset with uploads/recordings)
+ALTER TABLE user_usage ADD COLUMN IF NOT EXISTS tokens_used BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE user_usage ADD COLUMN IF NOT EXISTS prompt_tokens_used BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE user_usage ADD COLUMN IF NOT EXISTS completion_tokens_used BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE user_usage ADD COLUMN IF NOT EXISTS cached_tokens_used BIGINT NOT NULL DEFAULT 0;
+
+-- Token budget per plan; NULL means unlimited
+ALTER TABLE plan_limits ADD COLUMN IF NOT EXISTS max_tokens BIGINT;
@@ -0,0 +1,7 @@
+-- Lectures whose notes came from the extractive fallback while the LLM was unavailable
+ALTER TABLE lectures ADD COLUMN IF NOT EXISTS is_provisional BOOLEAN NOT NULL DEFAULT FALSE;
+
+COMMENT ON COLUMN lectures.is_provisional IS 'True while the notes are extractive (built without the LLM); cleared once the background upgrade replaces them with LLM notes.';
+
+-- The upgrade worker looks up pending lectures when it starts
+CREATE INDEX IF NOT EXISTS idx_lectures_is_provisional ON lectures(is_provisional) WHERE is_provisional;
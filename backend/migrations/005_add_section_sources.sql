@@ -0,0 +1,6 @@
+-- The text the LLM notes were made from, so degraded sections can be re-run exactly
+ALTER TABLE lectures ADD COLUMN IF NOT EXISTS llm_transcript TEXT;
+ALTER TABLE lectures ADD COLUMN IF NOT EXISTS section_spans JSONB;
+
+COMMENT ON COLUMN lectures.llm_transcript IS 'The prepared copy of the transcript sent to the LLM (fillers removed, long uploads compressed). NULL for lectures saved before it was recorded.';
+COMMENT ON COLUMN lectures.section_spans IS 'Array of [start, end] character offsets into llm_transcript, one per entry of section_summaries, giving the text each section summary was made from.';
@@ -41,6 +41,7 @@ class FakeQuery:
         self._filters: List[tuple[str, Any]] = []
         self._single = False
         self._update_data: Optional[Dict[str, Any]] = None
+        self._insert_data: Optional[Dict[str, Any]] = None
         self._delete = False
 
     def select(self, fields: str) -> "FakeQuery":
@@ -63,6 +64,10 @@ class FakeQuery:
         self._update_data = dict(update_data)
         return self
 
+    def insert(self, insert_data: Dict[str, Any]) -> "FakeQuery":
+        self._insert_data = dict(insert_data)
+        return self
+
     def delete(self) -> "FakeQuery":
         self._delete = True
         return self
@@ -96,6 +101,12 @@ class FakeQuery:
         rows = list(table.values())
         matched = self._match_rows(rows)
 
+        if self._insert_data is not None:
+            created = dict(self._insert_data)
+            created.setdefault("id", f"{self._table_name}_{len(table) + 1}")
+            table[created["id"]] = created
+            return FakeResponse(data=[created])
+
         if self._delete:
             # Not needed for Stripe tests; implement minimally.
             for row in matched:
@@ -135,6 +146,11 @@ class FakeSupabase:
     def __init__(self, initial_data: Dict[str, Dict[str, Dict[str, Any]]]):
         # Shape: { "profiles": {user_id: {...}}, "user_usage": {user_id: {...}} }
         self._data: Dict[str, Dict[str, Dict[str, Any]]] = initial_data
+        # Websocket handlers authenticate with `supabase.auth.get_user(token)`;
+        # any token is accepted as "user-1".
+        self.auth = SimpleNamespace(
+            get_user=lambda token: SimpleNamespace(user=SimpleNamespace(id="user-1"))
+        )
 
     def table(self, table_name: str) -> FakeQuery:
         return FakeQuery(self, table_name)
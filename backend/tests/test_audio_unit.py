@@ -0,0 +1,144 @@
+import asyncio
+import math
+import warnings
+import wave
+from array import array
+
+import pytest
+
+RATE = 16000
+
+
+def _tone_with_gaps(seconds: float, gaps: list[float]) -> array:
+    """16-bit mono samples of a loud tone, silent for 100ms at each gap start (in seconds)."""
+    samples = array("h", (int(12000 * math.sin(i * 0.3)) for i in range(int(seconds * RATE))))
+    for gap in gaps:
+        start = int(gap * RATE)
+        samples[start:start + RATE // 10] = array("h", bytes(RATE // 10 * 2))
+    return samples
+
+
+def _write_wav(path, samples: array) -> None:
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(RATE)
+        out.writeframes(samples.tobytes())
+
+
+def test_chunks_are_cut_at_the_quietest_moment_and_cover_the_recording(tmp_path):
+    # Verifies `plan_chunks` and `read_chunk_as_wav` on a WAV recording.
+    # Scenario:
+    # - 25 seconds of tone with short silences at 11.0s and 21.5s, cut into
+    #   chunks of about 10 seconds.
+    # What this test checks:
+    # - Each cut moves from its target to the nearby silence instead of
+    #   landing mid-sound.
+    # - The chunks are contiguous, cover every frame, and read back as WAV
+    #   files holding exactly those frames.
+    from app.audio import plan_chunks, read_chunk_as_wav
+    import io
+
+    samples = _tone_with_gaps(25, [11.0, 21.5])
+    path = tmp_path / "lecture.wav"
+    _write_wav(path, samples)
+
+    duration, chunks = plan_chunks(str(path), "lecture.wav", chunk_seconds=10)
+
+    assert duration == 25
+    assert len(chunks) == 3
+    first_cut, second_cut = chunks[1][0], chunks[2][0]
+    assert 11.0 * RATE <= first_cut < 11.1 * RATE
+    assert 21.5 * RATE <= second_cut < 21.6 * RATE
+    assert sum(count for _, count in chunks) == len(samples)
+    assert all(start + count == next_start for (start, count), (next_start, _) in zip(chunks, chunks[1:]))
+
+    start, count = chunks[1]
+    with wave.open(io.BytesIO(read_chunk_as_wav(str(path), "lecture.wav", start, count))) as chunk:
+        assert chunk.getframerate() == RATE
+        assert chunk.readframes(count) == samples[start:start + count].tobytes()
+
+
+def test_aiff_chunks_are_converted_to_wav(tmp_path):
+    # Verifies that AIFF (big-endian) recordings are re-encoded as WAV chunks.
+    # What this test checks:
+    # - The WAV chunk holds the same samples as the AIFF, in little-endian order.
+    from app.audio import read_chunk_as_wav
+    import io
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        aifc = pytest.importorskip("aifc")
+
+    samples = _tone_with_gaps(1, [])
+    big_endian = array("h", samples)
+    big_endian.byteswap()
+    path = tmp_path / "lecture.aiff"
+    with aifc.open(str(path), "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(RATE)
+        out.writeframes(big_endian.tobytes())
+
+    data = read_chunk_as_wav(str(path), "lecture.aiff", 0, len(samples))
+    with wave.open(io.BytesIO(data)) as chunk:
+        assert chunk.readframes(len(samples)) == samples.tobytes()
+
+
+def test_aiff_is_unsupported_without_aifc(monkeypatch):
+    # Verifies the fallback for Python versions without `aifc` (3.13+).
+    # What this test checks:
+    # - AIFF files are no longer treated as recordings, so the upload is
+    #   rejected as an unsupported file type; WAV is unaffected.
+    import app.audio as audio
+
+    monkeypatch.setattr(audio, "aifc", None)
+
+    assert not audio.is_audio_file("lecture.AIFF")
+    assert not audio.is_audio_file("lecture.aif")
+    assert audio.is_audio_file("lecture.wav")
+
+
+def test_recording_chunks_are_transcribed_in_parallel_and_joined_in_order(tmp_path):
+    # Verifies `STTClient.transcribe_recording` with the batch request faked.
+    # Scenario:
+    # - A 50-second recording is cut into 5-second chunks, transcribed at most
+    #   three at a time; later chunks are made to finish first.
+    # What this test checks:
+    # - No more than three requests are in flight at once.
+    # - The transcript is joined in recording order, not completion order.
+    # - Progress reaches the number of chunks.
+    from app.stt import STTClient
+    import io
+
+    # Silence, except one sample in the middle of each 5-second region (out of
+    # reach of the silence search) that tells the chunks apart.
+    samples = array("h", bytes(50 * RATE * 2))
+    for region in range(10):
+        samples[region * 5 * RATE + 5 * RATE // 2] = region + 1
+    path = tmp_path / "lecture.wav"
+    _write_wav(path, samples)
+    client = STTClient("test-key")
+    in_flight = {"now": 0, "max": 0}
+    progress = []
+
+    async def fake_transcribe_file(audio, mimetype, timeout_seconds=600.0):
+        with wave.open(io.BytesIO(audio)) as chunk:
+            region = max(array("h", chunk.readframes(chunk.getnframes()))) - 1
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        # Later chunks finish sooner, so completion order differs from recording order.
+        await asyncio.sleep(0.01 * (10 - region))
+        in_flight["now"] -= 1
+        return f"part{region}"
+
+    client.transcribe_file = fake_transcribe_file
+
+    async def on_progress(done, total):
+        progress.append((done, total))
+
+    transcript = asyncio.run(client.transcribe_recording(str(path), "lecture.wav", chunk_seconds=5, max_parallel=3, on_progress=on_progress))
+
+    assert transcript.split() == [f"part{n}" for n in range(10)]
+    assert in_flight["max"] == 3
+    assert progress[-1] == (10, 10)
@@ -435,3 +435,24 @@ def test_google_oauth_callback_redirects_to_frontend_record_hash(api_client, fak
     assert "access_token=supabase-access" in location
     assert "refresh_token=supabase-refresh" in location
 
+
+
+def test_metrics_endpoints_require_a_metrics_user(api_client, monkeypatch):
+    # End-to-end test for the `/metrics/*` guard (`get_metrics_user`).
+    #
+    # Scenario:
+    # - The signed-in test user ("user-1") is first not listed in METRICS_USER_IDS,
+    #   then listed next to another ID.
+    #
+    # What this test checks:
+    # - Every metrics endpoint answers 403 to a signed-in user who isn't listed.
+    # - Listed users can read them.
+    import app.main as main_module
+
+    endpoints = ["/metrics/llm-scheduler", "/metrics/llm-usage", "/metrics/extraction", "/metrics/jobs", "/metrics/summary-pipeline"]
+
+    monkeypatch.setattr(main_module.settings, "METRICS_USER_IDS", "")
+    assert [api_client.get(path).status_code for path in endpoints] == [403] * len(endpoints)
+
+    monkeypatch.setattr(main_module.settings, "METRICS_USER_IDS", "admin-7, user-1")
+    assert [api_client.get(path).status_code for path in endpoints] == [200] * len(endpoints)
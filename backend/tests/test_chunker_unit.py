@@ -0,0 +1,113 @@
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def _assert_well_formed(text, spans, max_tokens):
+    from app.chunker import count_tokens
+
+    previous_end = 0
+    for start, end in spans:
+        assert previous_end <= start < end <= len(text)
+        # Nothing but whitespace is skipped between sections.
+        assert not text[previous_end:start].strip()
+        assert count_tokens(text, start, end) <= max_tokens
+        previous_end = end
+    assert not text[previous_end:].strip()
+
+
+def test_chunk_spans_cuts_at_sentence_boundaries_within_budget():
+    # Verifies the core contract of `chunk_spans`:
+    # - sections never exceed the token budget,
+    # - they are returned as ordered offsets covering the whole text,
+    # - every section ends on a sentence boundary (no mid-sentence cuts).
+    from app.chunker import chunk_spans
+
+    text = " ".join(f"Sentence number {i} talks about markets and risk." for i in range(200))
+    spans = chunk_spans(text, max_tokens=60)
+
+    assert len(spans) > 1
+    _assert_well_formed(text, spans, 60)
+    for start, end in spans:
+        assert text[start:end].startswith("Sentence")
+        assert text[end - 1] == "."
+
+
+def test_chunk_spans_prefers_paragraph_breaks_once_section_is_mostly_full():
+    from app.chunker import chunk_spans, count_tokens
+
+    paragraph = " ".join("Short sentence here." for _ in range(8))
+    text = "\n\n".join([paragraph] * 6)
+    max_tokens = int(count_tokens(paragraph) * 1.2)
+
+    spans = chunk_spans(text, max_tokens=max_tokens)
+
+    _assert_well_formed(text, spans, max_tokens)
+    # Each section is exactly one paragraph rather than spilling into the next one.
+    assert [text[start:end] for start, end in spans] == [paragraph] * 6
+
+
+def test_chunk_spans_splits_unpunctuated_text_between_words():
+    from app.chunker import chunk_spans
+
+    text = " ".join(f"word{i}" for i in range(2000))
+    spans = chunk_spans(text, max_tokens=100)
+
+    _assert_well_formed(text, spans, 100)
+    for start, end in spans:
+        assert text[start:end].split()[0].startswith("word")
+        assert end == len(text) or text[end] == " "
+
+
+def test_chunk_spans_with_a_bpe_encoding(monkeypatch):
+    # Verifies the real-token path: `count_tokens` backed by a tiktoken BPE
+    # encoding instead of the word-based estimate.
+    # Scenario:
+    # - app/lecture.txt (paragraphs with timestamps) is split with the offline
+    #   BPE encoding from the chunker benchmark, so no download is needed.
+    # What this test checks:
+    # - Sections fit the budget in BPE tokens and cover the whole text.
+    # - Sections end at a sentence or paragraph boundary.
+    pytest.importorskip("tiktoken")
+    import app.chunker as chunker
+    from benchmarks.bench_chunker import make_local_encoding
+
+    text = (BACKEND_DIR / "app" / "lecture.txt").read_text()
+    monkeypatch.setattr(chunker, "_encoding", make_local_encoding(text))
+    monkeypatch.setattr(chunker, "_encoding_loaded", True)
+
+    spans = chunker.chunk_spans(text, max_tokens=300)
+
+    assert len(spans) > 4
+    _assert_well_formed(text, spans, 300)
+    for start, end in spans:
+        assert end == len(text.rstrip()) or text[end - 1] in ".?!)]" or text[end:end + 2] == "\n\n"
+
+
+def test_span_counts_from_one_encode_match_encoding_each_span(monkeypatch):
+    # Verifies `_span_counter`, which counts spans from one encode of the text.
+    # Scenario:
+    # - Text with multi-byte characters (accents, dashes, emoji) is encoded
+    #   with the offline BPE encoding from the chunker benchmark.
+    # What this test checks:
+    # - Every section's count equals the count from encoding it on its own.
+    pytest.importorskip("tiktoken")
+    import app.chunker as chunker
+    from benchmarks.bench_chunker import make_local_encoding
+
+    text = " ".join(
+        f"Café number {n} serves crème brûlée — naïve 🙂 customers love it. Then the next topic starts here."
+        for n in range(200)
+    )
+    monkeypatch.setattr(chunker, "_encoding", make_local_encoding(text))
+    monkeypatch.setattr(chunker, "_encoding_loaded", True)
+    count = chunker._span_counter(text)
+
+    spans = chunker.chunk_spans(text, max_tokens=120)
+
+    assert len(spans) > 5
+    _assert_well_formed(text, spans, 120)
+    for start, end in spans:
+        assert count(start, end) == chunker.count_tokens(text, start, end)
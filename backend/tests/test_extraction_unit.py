@@ -0,0 +1,191 @@
+import asyncio
+import time
+
+import pytest
+
+from app import extraction
+from app.extraction import ExtractionError, ExtractionPool
+
+
+def _write(tmp_path, name: str, content: bytes) -> str:
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_extraction_pool_extracts_in_a_worker_process_with_progress(tmp_path):
+    # Verifies `ExtractionPool.extract` on a plain text file.
+    # What this test checks:
+    # - The text comes back from a process started by the fork server unchanged.
+    # - Progress is reported through the async callback.
+    # - Completed jobs are counted in the pool stats.
+    path = _write(tmp_path, "notes.txt", "Mitochondria make ATP.".encode("utf-8"))
+    pool = ExtractionPool(max_workers=1, timeout_seconds=10)
+    progress = []
+
+    async def on_progress(done, total):
+        progress.append((done, total))
+
+    text = asyncio.run(pool.extract(path, "notes.txt", on_progress))
+
+    assert text == "Mitochondria make ATP."
+    assert progress == [(22, 22)]  # TXT progress is counted in bytes.
+    assert pool.stats()["completed"] == 1
+    assert pool.stats()["active"] == 0
+
+
+def test_extraction_pool_kills_jobs_that_time_out_or_use_too_much_memory(tmp_path, monkeypatch):
+    # Verifies the per-job limits of `ExtractionPool`.
+    # Scenario:
+    # - The extractor is replaced (in a "fork" pool, so the workers inherit the
+    #   patch) by one that hangs,
+    #   then by one that allocates far more than the memory limit.
+    # What this test checks:
+    # - A hung job is killed at the timeout and reported as ExtractionError.
+    # - A job over the memory limit fails with ExtractionError instead of
+    #   growing the server's memory.
+    path = _write(tmp_path, "notes.txt", b"text")
+    pool = ExtractionPool(max_workers=1, timeout_seconds=0.5, memory_limit_mb=64, start_method="fork")
+
+    def hang(file, filename, on_progress=None, max_words=None):
+        time.sleep(30)
+
+    monkeypatch.setattr(extraction, "extract_text", hang)
+    started = time.monotonic()
+    with pytest.raises(ExtractionError, match="longer than"):
+        asyncio.run(pool.extract(path, "notes.txt"))
+    assert time.monotonic() - started < 5
+    assert pool.stats()["timed_out"] == 1
+
+    def allocate(file, filename, on_progress=None, max_words=None):
+        return bytearray(512 * 1024 * 1024)
+
+    monkeypatch.setattr(extraction, "extract_text", allocate)
+    pool.timeout_seconds = 10
+    with pytest.raises(ExtractionError, match="memory"):
+        asyncio.run(pool.extract(path, "notes.txt"))
+
+
+def test_extraction_pool_queues_jobs_beyond_its_workers(tmp_path, monkeypatch):
+    # Verifies that `ExtractionPool` is bounded and reports saturation.
+    # What this test checks:
+    # - With one worker, a second job waits while the first runs, and the
+    #   stats show the pool saturated with one job queued.
+    path = _write(tmp_path, "notes.txt", b"text")
+    pool = ExtractionPool(max_workers=1, timeout_seconds=10, start_method="fork")
+
+    def slow(file, filename, on_progress=None, max_words=None):
+        time.sleep(0.3)
+        return "done"
+
+    monkeypatch.setattr(extraction, "extract_text", slow)
+
+    async def main():
+        jobs = [asyncio.create_task(pool.extract(path, "notes.txt")) for _ in range(2)]
+        await asyncio.sleep(0.1)
+        stats = pool.stats()
+        return stats, await asyncio.gather(*jobs)
+
+    stats, results = asyncio.run(main())
+
+    assert stats["active"] == 1 and stats["queued"] == 1 and stats["saturation"] == 1.0
+    assert results == ["done", "done"]
+    assert pool.stats()["max_workers"] == 1
+
+
+def test_extract_text_stops_at_the_word_limit(monkeypatch):
+    # Verifies `extract_text(max_words=...)`.
+    # Scenario:
+    # - A PDF-like document of 50 pages, 100 words each, with a 250-word limit.
+    # What this test checks:
+    # - Exactly 250 words come back, cut at a word boundary.
+    # - Only the pages needed are extracted (the rest are never parsed), and
+    #   progress jumps to done when extraction stops early.
+    # - A TXT file read in chunks never splits a word across two chunks.
+    import io
+
+    extracted = []
+
+    class FakePage:
+        def __init__(self, number):
+            self.number = number
+
+        def extract_text(self):
+            extracted.append(self.number)
+            return " ".join(f"p{self.number}w{i}" for i in range(100)) + "\n"
+
+    class FakeReader:
+        def __init__(self, file):
+            self.pages = [FakePage(n) for n in range(50)]
+
+    monkeypatch.setattr(extraction.pypdf, "PdfReader", FakeReader)
+    progress = []
+    text = extraction.extract_text(io.BytesIO(b""), "book.pdf", lambda done, total: progress.append(done), max_words=250)
+
+    assert len(text.split()) == 250
+    assert text.split()[-1] == "p2w49"
+    assert extracted == [0, 1, 2]
+    assert progress == [1, 2, 50]
+
+    monkeypatch.setattr(extraction, "TEXT_CHUNK_CHARS", 7)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon"] * 20
+    assert extraction.extract_text(io.BytesIO(" ".join(words).encode()), "notes.txt").split() == words
+    assert extraction.extract_text(io.BytesIO(" ".join(words).encode()), "notes.txt", max_words=7).split() == words[:7]
+
+
+def test_long_pdfs_are_extracted_in_parallel_page_ranges(tmp_path, monkeypatch):
+    # Verifies the parallel PDF path of `ExtractionPool`.
+    # Scenario:
+    # - A 120-page PDF (a fake reader, inherited by the forked workers) is
+    #   extracted by a 3-worker pool that splits PDFs into ranges of 40+ pages,
+    #   then a 60-page PDF, which is too short to split.
+    # What this test checks:
+    # - The long PDF is extracted by three processes and reassembled in page
+    #   order, identical to a single-process extraction.
+    # - Progress is summed across ranges and reaches the full page count.
+    # - The word limit applies to the whole document, not to each range, and
+    #   once the first ranges reach it the last (slow) range is stopped
+    #   instead of being waited for.
+    # - The short PDF stays on a single process.
+    import io
+
+    page_count = {"value": 120}
+    slow_from_page = {"value": None}
+
+    class FakePage:
+        def __init__(self, number):
+            self.number = number
+
+        def extract_text(self):
+            if slow_from_page["value"] is not None and self.number >= slow_from_page["value"]:
+                time.sleep(1)
+            return " ".join(f"p{self.number}w{i}" for i in range(10)) + "\n"
+
+    class FakeReader:
+        def __init__(self, file):
+            self.pages = [FakePage(n) for n in range(page_count["value"])]
+
+    monkeypatch.setattr(extraction.pypdf, "PdfReader", FakeReader)
+    path = _write(tmp_path, "book.pdf", b"%PDF-1.4")
+    pool = ExtractionPool(max_workers=3, timeout_seconds=10, pdf_pages_per_worker=40, start_method="fork")
+    progress = []
+
+    async def on_progress(done, total):
+        progress.append((done, total))
+
+    text = asyncio.run(pool.extract(path, "book.pdf", on_progress))
+
+    assert text == extraction.extract_text(io.BytesIO(b""), "book.pdf")
+    assert pool.stats()["completed"] == 3
+    assert progress[-1] == (120, 120)
+    assert [done for done, _ in progress] == sorted(done for done, _ in progress)
+
+    slow_from_page["value"] = 80
+    limited = asyncio.run(pool.extract(path, "book.pdf", max_words=415))
+    assert limited.split() == text.split()[:415]
+    assert pool.stats()["completed"] == 5
+    slow_from_page["value"] = None
+
+    page_count["value"] = 60
+    asyncio.run(pool.extract(path, "book.pdf"))
+    assert pool.stats()["completed"] == 6
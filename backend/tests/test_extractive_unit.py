@@ -0,0 +1,141 @@
+import time
+
+from app.extractive import extractive_summary, split_sentences, textrank
+
+
+def _lecture(repeats: int = 1) -> str:
+    paragraph = (
+        "Photosynthesis turns light energy into chemical energy in the chloroplast. "
+        "The light reactions in the thylakoid membrane produce ATP and NADPH. "
+        "For example, a leaf in bright sunlight makes more ATP than a shaded leaf. "
+        "The Calvin cycle then uses ATP and NADPH to fix carbon dioxide into sugar. "
+        "Um, so, yeah, that is basically the idea. "
+        "Chlorophyll absorbs red and blue light and reflects green light. "
+    )
+    return "\n\n".join(paragraph for _ in range(repeats))
+
+
+def test_textrank_prefers_sentences_central_to_the_text():
+    # Verifies `textrank` on a toy graph.
+    # What this test checks:
+    # - A sentence sharing words with every other sentence outranks an isolated one.
+    word_sets = [
+        {"cell", "energy", "atp"},
+        {"cell", "energy", "mitochondria"},
+        {"atp", "energy", "synthase"},
+        {"weather", "tomorrow"},
+    ]
+    scores = textrank(word_sets)
+
+    assert scores.index(max(scores)) == 0
+    assert scores[3] == min(scores)
+
+
+def test_extractive_summary_fills_every_structured_field():
+    # Verifies `extractive_summary` against `Summarizer.parse_structured_summary`.
+    # What this test checks:
+    # - Every field the LLM notes have is filled, with no parse problems.
+    # - Content comes verbatim from the transcript, fillers are not main points,
+    #   and examples are picked out of the section text.
+    from app.summarizer import Summarizer
+
+    transcript = _lecture(3)
+    parsed = Summarizer.__new__(Summarizer).parse_structured_summary(extractive_summary(transcript, section_tokens=60))
+
+    assert parsed["parse_diagnostics"] == []
+    assert parsed["lecture_title"]
+    assert parsed["topic_summary_sentence"] in transcript
+    assert 1 <= len(parsed["key_concepts"]) <= 4
+    assert parsed["main_points_covered"] and all(point in transcript for point in parsed["main_points_covered"])
+    assert not any("basically" in point for point in parsed["main_points_covered"])
+    assert parsed["conclusion_takeaways"]
+    assert parsed["study_questions"]
+    assert parsed["flashcards"] and all(card["answer"] in transcript for card in parsed["flashcards"])
+    assert parsed["references"] == []
+    assert len(parsed["section_summaries"]) > 1
+    assert any(section["examples"] for section in parsed["section_summaries"])
+    assert split_sentences("Too short. This one has enough words.") == ["This one has enough words."]
+
+
+def test_extractive_summary_is_fast_on_a_long_lecture():
+    # The fallback runs while the LLM is struggling; a two-hour lecture
+    # (~20,000 words) must still be summarized well within a second.
+    transcript = _lecture(300)
+    assert len(transcript.split()) > 20000
+    extractive_summary("Warm up the chunker with one short sentence here.")
+
+    started = time.perf_counter()
+    extractive_summary(transcript)
+
+    assert time.perf_counter() - started < 1.0
+
+
+def test_compress_to_budget_covers_the_whole_document():
+    # Verifies `compress_to_budget`, used for long uploads instead of truncation.
+    # Scenario:
+    # - A document of 40 distinct chapters, roughly five times over the budget.
+    # What this test checks:
+    # - The result fits the budget (within the chunker's counting slack).
+    # - Every chapter, including the last ones, is still represented, and
+    #   kept sentences appear verbatim and in their original order.
+    # - Text already within the budget is returned unchanged.
+    from app.chunker import count_tokens
+    from app.extractive import compress_to_budget
+
+    chapters = [
+        f"Chapter {n} introduces topic{n} in detail. "
+        f"The topic{n} mechanism depends on factor{n} and careful measurement. "
+        f"Researchers measured factor{n} across many topic{n} experiments. "
+        f"Some filler text appears here without much content at all. "
+        f"In summary topic{n} and factor{n} explain the results of chapter {n}."
+        for n in range(40)
+    ]
+    document = "\n\n".join(chapters)
+    budget = count_tokens(document) // 5
+
+    compressed = compress_to_budget(document, budget, section_tokens=60)
+
+    assert count_tokens(compressed) <= budget * 1.05
+    assert all(f"topic{n}" in compressed for n in range(40))
+    positions = [document.index(sentence) for sentence in split_sentences(compressed)]
+    assert positions == sorted(positions)
+    assert compress_to_budget(chapters[0], 1000) == chapters[0]
+
+
+def test_compress_to_budget_never_returns_nothing():
+    # Verifies the fallbacks in `compress_to_budget`.
+    # Scenario:
+    # - About 80,000 tokens of three-word lines with no punctuation (slide or
+    #   table text), compressed to a quarter of that.
+    # - A single sentence four times over the budget.
+    # What this test checks:
+    # - Short lines are ranked like sentences, so both ends of the document
+    #   are kept and the result fits the budget.
+    # - An oversized sentence is cut to the budget rather than dropped.
+    from app.chunker import count_tokens
+    from app.extractive import compress_to_budget
+
+    def word(n):
+        letters = ""
+        n += 26 * 26
+        while n:
+            n, r = divmod(n, 26)
+            letters = chr(97 + r) + letters
+        return letters
+
+    lines = [f"{word(n)} {word(n + 1)} {word(n + 2)}" for n in range(20000)]
+    document = "\n".join(lines)
+    budget = count_tokens(document) // 4
+
+    compressed = compress_to_budget(document, budget)
+
+    assert 0.5 * budget < count_tokens(compressed) <= budget * 1.05
+    assert any(line in compressed for line in lines[:200]) and any(line in compressed for line in lines[-200:])
+
+    sentence = " ".join(word(n) for n in range(1200)) + "."
+    budget = count_tokens(sentence) // 4
+
+    compressed = compress_to_budget(sentence, budget, section_tokens=2000)
+
+    assert compressed and sentence.startswith(compressed)
+    assert count_tokens(compressed) <= budget
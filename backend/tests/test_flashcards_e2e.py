@@ -0,0 +1,81 @@
+import json
+
+from app.llm_backends import Completion, LLMBackend
+
+
+class FlashcardBackend(LLMBackend):
+    """Answers flashcard requests and records the prompts it was sent."""
+
+    model = "fake"
+
+    def __init__(self):
+        self.prompts = []
+
+    async def complete(self, messages, temperature=0.3, json_mode=False):
+        self.prompts.append(messages[-1]["content"])
+        cards = [{"question": f"Q{i}?", "answer": f"A{i}."} for i in range(3)]
+        return Completion(json.dumps({"flashcards": cards}), prompt_tokens=200, completion_tokens=50)
+
+    async def stream(self, messages, on_delta, temperature=0.3):
+        completion = await self.complete(messages, temperature)
+        await on_delta(completion.text)
+        return completion
+
+
+def _setup(fake_db_factory, monkeypatch):
+    import app.main as main_module
+    import app.user_usages as user_usages_module
+
+    fake_db = fake_db_factory()
+    fake_db._data["lectures"] = {
+        "lecture-1": {
+            "id": "lecture-1",
+            "user_id": "user-1",
+            "transcript": "A very long transcript that should not be sent. " * 200,
+            "key_concepts": ["Mitosis", "Meiosis"],
+            "section_summaries": [
+                {"section_title": "Cell division", "key_takeaways": ["Cells divide by mitosis."], "new_vocabulary": ["Mitosis"], "study_questions": [], "examples": []},
+            ],
+        }
+    }
+    monkeypatch.setattr(main_module, "supabase", fake_db)
+    monkeypatch.setattr(user_usages_module, "supabase", fake_db)
+
+    backend = FlashcardBackend()
+    monkeypatch.setattr(main_module.summarizer, "backend", backend)
+    monkeypatch.setattr(main_module, "flashcard_cache", main_module.LRUCache(8))
+    return fake_db, backend
+
+
+def test_flashcards_are_built_from_section_summaries_and_cached(api_client, fake_db_factory, monkeypatch):
+    # Verifies `POST /lectures/{lecture_id}/flashcards`.
+    # What this test checks:
+    # - Flashcards come from the stored section summaries and key concepts, not the transcript.
+    # - A repeated request with the same parameters is served from the cache (no second LLM call),
+    #   while a different `count` is generated separately.
+    # - Tokens spent are added to the user's usage.
+    fake_db, backend = _setup(fake_db_factory, monkeypatch)
+
+    first = api_client.post("/lectures/lecture-1/flashcards?count=3")
+    second = api_client.post("/lectures/lecture-1/flashcards?count=3")
+
+    assert first.status_code == 200
+    assert first.json() == [{"question": f"Q{i}?", "answer": f"A{i}."} for i in range(3)]
+    assert second.json() == first.json()
+    assert len(backend.prompts) == 1
+    assert "Cells divide by mitosis." in backend.prompts[0]
+    assert "Mitosis, Meiosis" in backend.prompts[0]
+    assert "should not be sent" not in backend.prompts[0]
+    assert fake_db._data["user_usage"]["user-1"]["tokens_used"] == 250
+
+    api_client.post("/lectures/lecture-1/flashcards?count=5")
+    assert len(backend.prompts) == 2
+
+
+def test_flashcards_for_unknown_lecture_returns_404(api_client, fake_db_factory, monkeypatch):
+    _, backend = _setup(fake_db_factory, monkeypatch)
+
+    resp = api_client.post("/lectures/missing/flashcards")
+
+    assert resp.status_code == 404
+    assert backend.prompts == []
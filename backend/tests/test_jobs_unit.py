@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+
+def test_expired_lease_is_claimed_again_with_its_checkpoint(tmp_path):
+    # Verifies how jobs survive a worker that dies mid-job.
+    # Scenario:
+    # - A worker claims a job, checkpoints a step and then stops renewing its lease.
+    # What this test checks:
+    # - Nobody can claim the job while the lease is valid.
+    # - Once it expires, another worker claims it with the checkpoint and the
+    #   attempt count, and the first worker's heartbeat reports the lost lease.
+    from app.jobs import JobStore
+
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.2)
+    job_id = store.submit("upload", "user-1", {"type": "text", "text": "hello"})
+
+    first = store.claim("worker-a")
+    assert first["id"] == job_id and first["attempts"] == 1
+    store.checkpoint(job_id, {"lecture_id": "lecture-1"})
+    assert store.claim("worker-b") is None
+
+    time.sleep(0.3)
+    resumed = store.claim("worker-b")
+    assert resumed["id"] == job_id
+    assert resumed["attempts"] == 2
+    assert resumed["checkpoint"] == {"lecture_id": "lecture-1"}
+    assert resumed["payload"] == {"type": "text", "text": "hello"}
+    assert not store.heartbeat(job_id, "worker-a")
+    assert store.heartbeat(job_id, "worker-b")
+
+
+def test_job_interrupted_too_often_fails(tmp_path):
+    # Verifies JOB_MAX_ATTEMPTS for jobs whose workers keep dying.
+    # What this test checks:
+    # - After max_attempts expired leases the job is marked failed, not claimed,
+    #   and its last event is an error the client can show.
+    from app.jobs import JobStore
+
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.05, max_attempts=1)
+    job_id = store.submit("upload", "user-1", {})
+    assert store.claim("worker-a") is not None
+
+    time.sleep(0.1)
+    assert store.claim("worker-b") is None
+    assert store.get(job_id)["status"] == "failed"
+    assert "error" in store.events(job_id)[-1][1]
+
+
+def test_workers_run_jobs_and_followers_can_resume(tmp_path):
+    # Verifies `JobWorkers` together with `follow_job`.
+    # Scenario:
+    # - Two jobs are submitted: one whose handler emits progress and succeeds,
+    #   and one whose handler raises.
+    # What this test checks:
+    # - A follower receives every event up to the handler's final message.
+    # - Following again from a seq replays only the events after it.
+    # - A failing handler ends its job as failed with an error event.
+    # - `active_workers` counts the running worker loops.
+    from app.jobs import JobStore, JobWorkers, follow_job
+
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+
+    async def handler(job, emit):
+        if job["payload"].get("fail"):
+            raise ValueError("bad input")
+        for step in range(3):
+            await emit({"progress": step})
+        return {"success": True}
+
+    async def follow(job_id, after=0):
+        return [message async for _, message in follow_job(store, job_id, after, poll_interval=0.01)]
+
+    async def scenario():
+        workers = JobWorkers(store, {"upload": handler}, concurrency=2, poll_interval=0.01)
+        ok_id = store.submit("upload", "user-1", {})
+        failing_id = store.submit("upload", "user-1", {"fail": True})
+        assert workers.active_workers == 0
+        workers.start()
+        assert workers.active_workers == 2
+        try:
+            ok_events = await asyncio.wait_for(follow(ok_id), 5)
+            failing_events = await asyncio.wait_for(follow(failing_id), 5)
+        finally:
+            await workers.stop()
+        assert workers.active_workers == 0
+        second_seq = store.events(ok_id)[1][0]
+        return ok_events, failing_events, await follow(ok_id, after=second_seq), ok_id, failing_id
+
+    ok_events, failing_events, replayed, ok_id, failing_id = asyncio.run(scenario())
+
+    assert ok_events == [{"progress": 0}, {"progress": 1}, {"progress": 2}, {"success": True}]
+    assert replayed == [{"progress": 2}, {"success": True}]
+    assert store.get(ok_id)["status"] == "done"
+    assert store.get(failing_id)["status"] == "failed"
+    assert failing_events == [{"error": "An error occurred: bad input"}]
@@ -0,0 +1,70 @@
+import asyncio
+
+
+def test_scheduler_admits_higher_priority_requests_first():
+    # Verifies the priority queue in `LLMScheduler`.
+    # Scenario:
+    # - Concurrency cap of 1; the slot is held by a first request.
+    # - A free upload request queues, then a paid live request queues.
+    # What this test checks:
+    # - When the slot frees, the live request runs before the upload even
+    #   though it was queued later.
+    from app.llm_scheduler import LLMScheduler, request_priority
+
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1)
+        order = []
+        release = asyncio.Event()
+
+        async def blocker():
+            await release.wait()
+            order.append("blocker")
+
+        async def record(name):
+            order.append(name)
+
+        first = asyncio.create_task(scheduler.run(blocker))
+        await asyncio.sleep(0)
+        upload = asyncio.create_task(scheduler.run(lambda: record("upload"), priority=request_priority("upload", "free")))
+        live = asyncio.create_task(scheduler.run(lambda: record("live"), priority=request_priority("live", "pro")))
+        await asyncio.sleep(0)
+
+        assert scheduler.stats()["queue_depth"] == 2
+        release.set()
+        await asyncio.gather(first, upload, live)
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["blocker", "live", "upload"]
+    assert stats["queue_depth"] == 0
+    assert stats["in_flight"] == 0
+    assert stats["total_admitted"] == 3
+
+
+def test_scheduler_never_exceeds_concurrency_cap():
+    from app.llm_scheduler import LLMScheduler
+
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=3)
+        active = {"now": 0, "peak": 0}
+
+        async def call():
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.01)
+            active["now"] -= 1
+
+        await asyncio.gather(*(scheduler.run(call) for _ in range(20)))
+        return active["peak"]
+
+    assert asyncio.run(scenario()) == 3
+
+
+def test_token_bucket_reports_wait_when_exhausted():
+    from app.llm_scheduler import TokenBucket
+
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.wait_time(60) == 0.0
+    bucket.consume(60)
+    # Refills at one token per second.
+    assert 0.9 < bucket.wait_time(1) <= 1.0
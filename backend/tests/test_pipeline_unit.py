@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from app.pipeline import Pipeline, Stage
+
+
+def test_pipeline_runs_independent_stages_concurrently():
+    # Verifies `Pipeline.run`.
+    # Scenario:
+    # - "a" and "b" have no dependencies; "c" needs both.
+    # - Each of "a" and "b" marks that it started, then waits for the other to
+    #   start, so they can only finish if they run at the same time.
+    # What this test checks:
+    # - "a" and "b" overlap (run sequentially, the first would time out).
+    # - "c" sees both results; results and timings are keyed by stage name.
+    async def main():
+        started = {"a": asyncio.Event(), "b": asyncio.Event()}
+
+        def meets(name, other, value):
+            async def run(context, results):
+                started[name].set()
+                await asyncio.wait_for(started[other].wait(), timeout=5)
+                return value
+            return run
+
+        async def combine(context, results):
+            return results["a"] + results["b"] + context["suffix"]
+
+        pipeline = Pipeline([
+            Stage("a", meets("a", "b", "A")),
+            Stage("b", meets("b", "a", "B")),
+            Stage("c", combine, depends_on=("a", "b")),
+        ])
+        results, timings = await pipeline.run({"suffix": "!"})
+        return results, timings, pipeline
+
+    results, timings, pipeline = asyncio.run(main())
+
+    assert results["c"] == "AB!"
+    assert set(timings) == {"a", "b", "c"}
+    assert pipeline.stats["a"]["runs"] == 1
+
+
+def test_pipeline_stage_concurrency_limit_is_shared_across_runs():
+    # Verifies `Stage(max_concurrency=...)`.
+    # Scenario:
+    # - Four pipeline runs at once through a stage limited to 2.
+    # What this test checks:
+    # - At most two runs are inside the stage at any time, and all finish.
+    active = 0
+    peak = 0
+
+    async def limited(context, results):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.02)
+        active -= 1
+        return context["n"]
+
+    pipeline = Pipeline([Stage("limited", limited, max_concurrency=2)])
+
+    async def main():
+        return await asyncio.gather(*(pipeline.run({"n": n}) for n in range(4)))
+
+    runs = asyncio.run(main())
+
+    assert sorted(results["limited"] for results, _ in runs) == [0, 1, 2, 3]
+    assert peak == 2
+
+
+def test_pipeline_rejects_bad_graphs_and_propagates_failures():
+    # Verifies graph validation and error handling in `Pipeline`.
+    # What this test checks:
+    # - Unknown dependencies and cycles are rejected when the pipeline is built.
+    # - A failing stage cancels the stages still running and the error is raised.
+    async def noop(context, results):
+        return None
+
+    with pytest.raises(ValueError):
+        Pipeline([Stage("a", noop, depends_on=("missing",))])
+    with pytest.raises(ValueError):
+        Pipeline([Stage("a", noop, depends_on=("b",)), Stage("b", noop, depends_on=("a",))])
+
+    cancelled = []
+
+    async def fail(context, results):
+        raise RuntimeError("boom")
+
+    async def slow(context, results):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    pipeline = Pipeline([Stage("fail", fail), Stage("slow", slow)])
+    with pytest.raises(RuntimeError):
+        asyncio.run(pipeline.run({}))
+    assert cancelled == [True]
+    assert pipeline.stats["fail"]["failures"] == 1
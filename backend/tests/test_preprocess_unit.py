@@ -0,0 +1,72 @@
+from app.preprocess import clean_transcript, cleanup_report
+
+
+def test_clean_transcript_removes_disfluencies():
+    # Verifies `clean_transcript` on typical live STT output.
+    # What this test checks:
+    # - Hesitation fillers, comma-delimited "you know"/"like", false starts and
+    #   stuttered repeats are removed, and punctuation left behind is tidied.
+    # - Paragraph breaks survive (the section chunker prefers to cut at them).
+    raw = "Um, so, uh, today we we we talk about, you know, thi- this thing.\n\n\n  Next   part, like, here."
+
+    assert clean_transcript(raw) == "so today we talk about this thing.\n\nNext part here."
+
+
+def test_clean_transcript_keeps_ordinary_language():
+    # Fillers only count as whole words and discourse markers only when set off
+    # by commas; legitimately doubled words are kept.
+    text = "You know the answer. The umbrella is here. I had had enough. That that is true."
+
+    assert clean_transcript(text) == text
+
+
+def test_clean_transcript_keeps_units_acronyms_and_real_repeats():
+    # Verifies the disfluency rules do not cut real content.
+    # What this test checks:
+    # - "mm", "ERM" and "UM" are kept; only a lowercase filler is removed,
+    #   together with the commas around it.
+    # - A hyphen before a different word ("infor- mation", "first- and") is
+    #   not a false start.
+    # - Repeats that differ in case or are separated by a comma are kept.
+    kept = [
+        "The screw is 5 mm long.",
+        "ERM frameworks manage risk.",
+        "Split infor- mation across lines.",
+        "Compare first- and second-order terms.",
+        "New York, New York is a song.",
+        "Bye bye, everyone.",
+    ]
+
+    for text in kept:
+        assert clean_transcript(text) == text
+    assert clean_transcript("The UM campus, uh, is big.") == "The UM campus is big."
+
+
+def test_clean_transcript_keeps_numbers_names_and_real_doubles():
+    # Verifies the repeat and "er" rules against written-looking content.
+    # What this test checks:
+    # - Repeated numbers and phone numbers are kept (only words are repeats).
+    # - "is is", capitalized names and "er" as a word are kept.
+    # - "er" between commas or before an ellipsis is still a filler.
+    kept = [
+        "1 1 2 3 5 8",
+        "Call 555 555 1234.",
+        "0 0 1 0 0 1",
+        "What it is is a protein.",
+        "We flew to Walla Walla.",
+        "The er diagram has three tables.",
+    ]
+
+    for text in kept:
+        assert clean_transcript(text) == text
+    assert clean_transcript("So, er, the cell... er... divides.") == "So the cell... divides."
+    assert clean_transcript("I I I think we we are done.") == "I think we are done."
+
+
+def test_cleanup_report_counts_saved_tokens():
+    raw = "Um, uh, the the the cell, um, divides."
+    report = cleanup_report(raw, clean_transcript(raw))
+
+    assert report["tokens_saved"] == report["original_tokens"] - report["cleaned_tokens"] > 0
+    assert 0 < report["reduction"] < 1
+    assert cleanup_report("", "")["reduction"] == 0.0
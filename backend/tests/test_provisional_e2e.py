@@ -0,0 +1,121 @@
+import asyncio
+
+from app.llm_backends import Completion, LLMBackend
+
+
+class FlakyBackend(LLMBackend):
+    """Fails every call until `healthy` is set, then answers like the overall call."""
+
+    model = "fake"
+
+    def __init__(self):
+        self.healthy = False
+
+    async def complete(self, messages, temperature=0.3, json_mode=False):
+        if not self.healthy:
+            raise RuntimeError("service unavailable")
+        if json_mode:
+            return Completion('{"section_title": "Part", "key_takeaways": ["A sentence."], "new_vocabulary": [], "study_questions": [], "examples": [], "useful_references": []}')
+        return Completion("@@LECTURE_TITLE_START@@\nLLM Title\n@@LECTURE_TITLE_END@@", prompt_tokens=100, completion_tokens=20)
+
+    async def stream(self, messages, on_delta, temperature=0.3):
+        completion = await self.complete(messages, temperature)
+        await on_delta(completion.text)
+        return completion
+
+
+def test_failed_summary_falls_back_to_extractive_notes_then_upgrades(fake_db_factory, monkeypatch):
+    # Verifies `summarize_with_fallback` and `upgrade_provisional_lecture`.
+    # Scenario:
+    # - Every LLM call fails, so the summary comes back as an error.
+    # - Later the LLM recovers and the background upgrade runs.
+    # What this test checks:
+    # - The fallback returns extractive notes flagged provisional, and pushes
+    #   the parsed sections to the client callback.
+    # - The upgrade replaces the notes with LLM notes and clears the flag.
+    import app.main as main_module
+    import app.user_usages as user_usages_module
+
+    fake_db = fake_db_factory()
+    transcript = "Enzymes lower the activation energy of reactions in the cell. " * 30
+    fake_db._data["lectures"] = {
+        "lecture-1": {"id": "lecture-1", "user_id": "user-1", "transcript": transcript, "is_provisional": True},
+    }
+    monkeypatch.setattr(main_module, "supabase", fake_db)
+    monkeypatch.setattr(user_usages_module, "supabase", fake_db)
+    backend = FlakyBackend()
+    monkeypatch.setattr(main_module.summarizer, "backend", backend)
+    monkeypatch.setattr(main_module.summarizer, "section_max_attempts", 1)
+    monkeypatch.setattr(main_module.summarizer, "cache", None)
+
+    sent = []
+
+    async def on_section(field, value):
+        sent.append(field)
+
+    summary, is_provisional = asyncio.run(main_module.summarize_with_fallback(
+        transcript,
+        lambda: main_module.summarizer.summarize(transcript),
+        on_section=on_section,
+    ))
+
+    assert is_provisional
+    assert "@@MAIN_POINTS_START@@" in summary
+    assert "lecture_title" in sent and "section_summaries" in sent
+
+    assert asyncio.run(main_module.upgrade_provisional_lecture("lecture-1", "user-1")) is False
+
+    backend.healthy = True
+    assert asyncio.run(main_module.upgrade_provisional_lecture("lecture-1", "user-1")) is True
+
+    lecture = fake_db._data["lectures"]["lecture-1"]
+    assert lecture["is_provisional"] is False
+    assert lecture["lecture_title"] == "LLM Title"
+    assert lecture["token_usage"]["total_tokens"] > 0
+
+
+def test_provisional_upgrades_start_with_the_app_and_skip_scheduled_lectures(fake_db_factory, monkeypatch):
+    # Verifies the provisional upgrade worker's start-up and its startup scan.
+    # Scenario:
+    # - Two lectures were left provisional by an earlier process; the app starts
+    #   without any new fallback happening.
+    # - Separately, a lecture that just fell back is queued before the scan runs.
+    # What this test checks:
+    # - Starting the app (its lifespan) upgrades the leftover lectures.
+    # - The scan does not queue the just-queued lecture a second time.
+    import time
+
+    from fastapi.testclient import TestClient
+
+    import app.main as main_module
+
+    fake_db = fake_db_factory()
+    fake_db._data["lectures"] = {
+        lecture_id: {"id": lecture_id, "user_id": "user-1", "transcript": "Text.", "is_provisional": True}
+        for lecture_id in ("lecture-1", "lecture-2")
+    }
+    monkeypatch.setattr(main_module, "supabase", fake_db)
+    monkeypatch.setattr(main_module.settings, "PROVISIONAL_UPGRADE_DELAY_SECONDS", 0.01)
+    upgraded = []
+
+    async def fake_upgrade(lecture_id, user_id):
+        upgraded.append(lecture_id)
+        return True
+
+    monkeypatch.setattr(main_module, "upgrade_provisional_lecture", fake_upgrade)
+
+    with TestClient(main_module.app):
+        deadline = time.monotonic() + 5
+        while len(upgraded) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert sorted(upgraded) == ["lecture-1", "lecture-2"]
+
+    upgraded.clear()
+
+    async def fall_back_then_wait():
+        main_module.queue_provisional_upgrade("lecture-1", "user-1")
+        await asyncio.sleep(0.2)
+        await main_module.stop_provisional_upgrades()
+
+    asyncio.run(fall_back_then_wait())
+    assert sorted(upgraded) == ["lecture-1", "lecture-2"]
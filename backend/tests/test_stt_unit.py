@@ -0,0 +1,139 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+
+class FakeLiveConnection:
+    """
+    Stands in for the SDK's async live client: handlers are awaited on the event
+    loop with keyword arguments, like `AsyncListenWebSocketClient._emit`.
+    Each audio chunk produces one final transcript of the chunk's text.
+    """
+
+    def __init__(self, fail_on: bytes | None = None):
+        self.handlers = {}
+        self.fail_on = fail_on
+        self.finished = False
+
+    def on(self, event, handler):
+        # LiveTranscriptionEvents values are strings ("Results", "Error", "Close").
+        self.handlers[str(event.value)] = handler
+
+    async def _emit(self, event, **kwargs):
+        await self.handlers[event](self, **kwargs)
+
+    @staticmethod
+    def _result(text: str, from_finalize: bool = False):
+        alternative = SimpleNamespace(transcript=text)
+        return SimpleNamespace(channel=SimpleNamespace(alternatives=[alternative]), speech_final=True, from_finalize=from_finalize)
+
+    async def start(self, options):
+        return True
+
+    async def send(self, data: bytes):
+        async def respond():
+            await asyncio.sleep(0)
+            if data == self.fail_on:
+                await self._emit("Error", error=SimpleNamespace(message="bad audio"))
+            else:
+                await self._emit("Results", result=self._result(data.decode()))
+        asyncio.get_running_loop().create_task(respond())
+        return True
+
+    async def finalize(self):
+        asyncio.get_running_loop().create_task(self._emit("Results", result=self._result("", from_finalize=True)))
+        return True
+
+    async def finish(self):
+        self.finished = True
+        await self._emit("Close", close="closed")
+        return True
+
+
+def _client_with(connection):
+    from app.stt import STTClient
+
+    client = STTClient("test-key")
+    client.deepgram = SimpleNamespace(listen=SimpleNamespace(asyncwebsocket=SimpleNamespace(v=lambda version: connection)))
+    return client
+
+
+def test_transcripts_wake_the_consumer_without_waiting_for_more_audio():
+    # Verifies that STT events reach the consumer as soon as they arrive.
+    # Scenario:
+    # - The audio source sends one chunk, then waits until the consumer has
+    #   received that chunk's transcript before sending the next.
+    # What this test checks:
+    # - The transcript is delivered while no more audio is coming (the old
+    #   client only drained its queue after sending the next chunk, so this
+    #   would hang).
+    # - The stream ends after the last transcript and closes the connection.
+    connection = FakeLiveConnection()
+    client = _client_with(connection)
+    received = []
+
+    async def scenario():
+        got_first = asyncio.Event()
+
+        async def audio():
+            yield {"buffer": b"first"}
+            await got_first.wait()
+            yield {"buffer": b"second"}
+
+        async for event in client.stream_transcribe(audio()):
+            received.append(event["text"])
+            got_first.set()
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+
+    assert received == ["first", "second"]
+    assert connection.finished
+
+
+def test_many_concurrent_sessions_lose_no_events():
+    # Verifies delivery under load: 200 sessions streaming at once on one loop.
+    # What this test checks:
+    # - Every session gets every one of its transcripts, in order.
+    async def session(number):
+        client = _client_with(FakeLiveConnection())
+
+        async def audio():
+            for chunk in range(25):
+                yield {"buffer": f"s{number}c{chunk}".encode()}
+                await asyncio.sleep(0)
+
+        return [event["text"] async for event in client.stream_transcribe(audio())]
+
+    async def scenario():
+        return await asyncio.gather(*(session(number) for number in range(200)))
+
+    results = asyncio.run(asyncio.wait_for(scenario(), 30))
+
+    for number, texts in enumerate(results):
+        assert texts == [f"s{number}c{chunk}" for chunk in range(25)]
+
+
+def test_deepgram_errors_are_raised_to_the_consumer():
+    # Verifies error propagation from the SDK's Error event.
+    # What this test checks:
+    # - The consumer sees the transcripts before the error, then an exception,
+    #   and the connection is closed.
+    connection = FakeLiveConnection(fail_on=b"broken")
+    client = _client_with(connection)
+    received = []
+
+    async def scenario():
+        async def audio():
+            yield {"buffer": b"fine"}
+            await asyncio.sleep(0.05)
+            yield {"buffer": b"broken"}
+            await asyncio.sleep(10)
+
+        async for event in client.stream_transcribe(audio()):
+            received.append(event["text"])
+
+    with pytest.raises(Exception, match="bad audio"):
+        asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert received == ["fine"]
+    assert connection.finished
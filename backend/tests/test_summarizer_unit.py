@@ -0,0 +1,460 @@
+import asyncio
+import json
+
+import pytest
+
+from app.llm_backends import Completion, LLMBackend
+
+
+class FakeBackend(LLMBackend):
+    """
+    Minimal LLM backend that records every prompt it receives.
+    JSON-mode requests get a section-shaped object; plain requests get overall notes.
+    """
+
+    model = "fake"
+    overall_text = "@@LECTURE_TITLE_START@@\nReduced Lecture\n@@LECTURE_TITLE_END@@"
+
+    def __init__(self):
+        self.prompts = []
+
+    async def complete(self, messages, temperature=0.3, json_mode=False):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        if json_mode:
+            content = json.dumps({
+                "section_title": f"Part {len(self.prompts)}",
+                "key_takeaways": ["A complete sentence."],
+                "new_vocabulary": ["Term"],
+                "study_questions": ["Why?"],
+                "examples": ["An example."],
+                "useful_references": [],
+            })
+        else:
+            content = self.overall_text
+        return Completion(content)
+
+    async def stream(self, messages, on_delta, temperature=0.3, chunk_size=7):
+        completion = await self.complete(messages, temperature)
+        for i in range(0, len(completion.text), chunk_size):
+            await on_delta(completion.text[i:i + chunk_size])
+        return completion
+
+
+def _make_summarizer(**kwargs):
+    from app.summarizer import Summarizer
+
+    return Summarizer(backend=FakeBackend(), **kwargs)
+
+
+def test_reduce_mode_builds_overall_notes_from_section_summaries():
+    # Verifies `overall_mode="reduce"` in `Summarizer.summarize`.
+    # Scenario:
+    # - A transcript that splits into more sections than the reduce fan-in of 2.
+    # What this test checks:
+    # - Sections are merged hierarchically (e.g. 5 -> 3 -> 2) before the final call.
+    # - The final overall prompt does not contain the raw transcript.
+    # - Section summaries are still appended to the summary text.
+    summarizer = _make_summarizer(overall_mode="reduce", reduce_fan_in=2, section_tokens=25)
+    transcript = " ".join("Cells split fast now." for _ in range(24)) + " Final words are here."
+    section_count = len(summarizer._split_transcript_into_sections(transcript))
+    assert section_count > 4
+
+    summary = asyncio.run(summarizer.summarize(transcript))
+
+    prompts = summarizer.backend.prompts
+    merge_calls = 0
+    level = section_count
+    while level > 2:
+        level = (level + 1) // 2
+        merge_calls += level
+    assert len(prompts) == section_count + merge_calls + 1
+    assert "Final words are here." not in prompts[-1]
+    assert "Part 1:" in prompts[-1]
+    parsed = summarizer.parse_structured_summary(summary)
+    assert parsed["lecture_title"] == "Reduced Lecture"
+    assert len(parsed["section_summaries"]) == section_count
+
+
+def test_full_mode_sends_transcript_to_overall_call():
+    summarizer = _make_summarizer()
+    transcript = "the mitochondria is the powerhouse of the cell"
+
+    asyncio.run(summarizer.summarize(transcript))
+
+    assert transcript in summarizer.backend.prompts[-1]
+
+
+def test_marker_stream_parser_handles_markers_split_across_chunks():
+    from app.summarizer import MarkerStreamParser
+
+    parser = MarkerStreamParser()
+    completed = []
+    for chunk in ["@@LECTURE_TI", "TLE_START@@\nCells\n@@LECTURE_T", "ITLE_END@@\n@@KEY_CONCEPTS_START@@\n- A", "\n@@KEY_CONCEPTS_END@@"]:
+        completed.extend(parser.feed(chunk))
+
+    assert completed == [("LECTURE_TITLE", "\nCells\n"), ("KEY_CONCEPTS", "\n- A\n")]
+
+
+def test_summarize_streams_each_section_as_it_completes():
+    # Verifies `Summarizer.summarize(on_section=...)`.
+    # Scenario:
+    # - The fake client streams the overall notes 7 characters at a time.
+    # What this test checks:
+    # - `on_section` receives the section summaries (the map stage runs alongside
+    #   the overall call, so they may arrive at any point) and each overall
+    #   section in order, already parsed like `parse_structured_summary` would.
+    # - The returned text is the full notes, identical to the non-streaming path.
+    summarizer = _make_summarizer()
+    summarizer.backend.overall_text = (
+        "@@LECTURE_TITLE_START@@\nCell Biology\n@@LECTURE_TITLE_END@@\n\n"
+        "@@KEY_CONCEPTS_START@@\n- Mitochondria\n- ATP\n@@KEY_CONCEPTS_END@@\n\n"
+        "@@FLASHCARDS_START@@\n[{\"question\": \"Q\", \"answer\": \"A\"}]\n@@FLASHCARDS_END@@"
+    )
+    received = []
+
+    async def on_section(field, value):
+        received.append((field, value))
+
+    summary = asyncio.run(summarizer.summarize("cells make energy", on_section=on_section))
+
+    assert [field for field, _ in received if field == "section_summaries"] == ["section_summaries"]
+    overall = [(field, value) for field, value in received if field != "section_summaries"]
+    assert [field for field, _ in overall] == ["lecture_title", "key_concepts", "flashcards"]
+    assert overall[0][1] == "Cell Biology"
+    assert overall[1][1] == ["Mitochondria", "ATP"]
+    assert overall[2][1] == [{"question": "Q", "answer": "A"}]
+    assert summary.startswith(summarizer.backend.overall_text)
+
+
+def test_live_section_summarizer_starts_sections_before_recording_stops():
+    # Verifies `LiveSectionSummarizer`, used by `/ws/transcribe`.
+    # Scenario:
+    # - 48 short sentences arrive as 12 finalized segments of 4 sentences,
+    #   with a 50-token section budget.
+    # What this test checks:
+    # - Every full section is summarized while "recording" (before finish()).
+    # - finish() only adds the tail section and the overall call.
+    # - The sections match what the batch splitter produces for the final transcript.
+    # - `section_spans` locates every summarized section in the final transcript.
+    from app.summarizer import LiveSectionSummarizer
+
+    summarizer = _make_summarizer(section_tokens=50)
+    sentences = [f"Point {i} is key." for i in range(48)]
+    segments = [" ".join(sentences[i:i + 4]) for i in range(0, 48, 4)]
+    transcript = " ".join(segments)
+
+    async def scenario():
+        live = LiveSectionSummarizer(summarizer)
+        for segment in segments:
+            live.add_segment(segment)
+        await asyncio.sleep(0)
+        calls_while_recording = len(summarizer.backend.prompts)
+        summary = await live.finish(transcript)
+        return calls_while_recording, summary, live.section_spans
+
+    calls_while_recording, summary, section_spans = asyncio.run(scenario())
+
+    expected_sections = summarizer._split_transcript_into_sections(transcript)
+    assert len(expected_sections) > 2
+    assert calls_while_recording == len(expected_sections) - 1
+    prompts = summarizer.backend.prompts
+    assert len(prompts) == len(expected_sections) + 1
+    for prompt, section in zip(prompts, expected_sections):
+        assert prompt.endswith(section)
+    assert len(summarizer.parse_structured_summary(summary)["section_summaries"]) == len(expected_sections)
+    assert [transcript[start:end] for start, end in section_spans] == expected_sections
+
+
+def test_parse_structured_summary_reports_malformed_markers():
+    # What this test checks:
+    # - Well-formed sections parse as before (bullets stripped, JSON decoded).
+    # - Unclosed sections, stray END markers, bad JSON and missing sections fall
+    #   back to their defaults and are listed in parse_diagnostics.
+    summarizer = _make_summarizer()
+    summary = (
+        "@@LECTURE_TITLE_START@@\nCells\n@@LECTURE_TITLE_END@@\n"
+        "@@KEY_CONCEPTS_START@@\n- Mitosis\n* Meiosis\n@@KEY_CONCEPTS_END@@\n"
+        "@@FLASHCARDS_START@@\n[{\"question\": \"Q\", \"answer\": \"A\"}]\n@@FLASHCARDS_END@@\n"
+        "@@OPTIONAL_REFERENCES_START@@\n[not json\n@@OPTIONAL_REFERENCES_END@@\n"
+        "@@MAIN_POINTS_END@@\n"
+        "@@STUDY_QUESTIONS_START@@\n- Why?\n"
+    )
+
+    parsed = summarizer.parse_structured_summary(summary)
+
+    assert parsed["lecture_title"] == "Cells"
+    assert parsed["key_concepts"] == ["Mitosis", "Meiosis"]
+    assert parsed["flashcards"] == [{"question": "Q", "answer": "A"}]
+    assert parsed["references"] == []
+    assert parsed["main_points_covered"] == []
+    assert parsed["study_questions"] == []
+    assert parsed["topic_summary_sentence"] == ""
+    problems = {(d["section"], d["problem"]) for d in parsed["parse_diagnostics"]}
+    assert ("OPTIONAL_REFERENCES", "invalid_json") in problems
+    assert ("MAIN_POINTS", "end_without_start_marker") in problems
+    assert ("STUDY_QUESTIONS", "missing_end_marker") in problems
+    assert ("TOPIC_SUMMARY", "missing_section") in problems
+
+
+class FlakyBackend(FakeBackend):
+    """Fails the first `failures` JSON-mode (section) calls, then behaves normally."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    async def complete(self, messages, temperature=0.3, json_mode=False):
+        if json_mode and self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("rate limited")
+        return await super().complete(messages, temperature, json_mode)
+
+
+def test_section_summary_retries_then_marks_degraded():
+    # What this test checks:
+    # - A transient failure is retried and the section still gets a real summary.
+    # - When every attempt fails, the placeholder is flagged as degraded.
+    from app.summarizer import is_degraded_section
+
+    summarizer = _make_summarizer(section_max_attempts=3, retry_base_delay=0)
+    summarizer.backend = FlakyBackend(failures=2)
+    recovered = asyncio.run(summarizer._generate_section_summary("Some text.", 1, 1))
+    assert not is_degraded_section(recovered)
+
+    summarizer.backend = FlakyBackend(failures=3)
+    failed = asyncio.run(summarizer._generate_section_summary("Some text.", 2, 2))
+    assert failed["degraded"] is True
+    assert failed["section_title"] == "Section 2"
+
+
+def test_repair_section_summaries_reruns_only_degraded_sections():
+    summarizer = _make_summarizer(section_tokens=50, retry_base_delay=0)
+    transcript = " ".join(f"Point {i} is key." for i in range(40))
+    sections = summarizer._split_transcript_into_sections(transcript)
+    assert len(sections) > 2
+
+    good = {"section_title": "Fine", "key_takeaways": ["Kept."], "new_vocabulary": [], "study_questions": [], "examples": []}
+    stored = [dict(good) for _ in sections]
+    stored[1] = {"section_title": "Section 2", "key_takeaways": [], "new_vocabulary": [], "study_questions": [], "examples": [], "degraded": True}
+
+    repaired, rerun = asyncio.run(summarizer.repair_section_summaries(sections, stored))
+
+    assert rerun == [2]
+    assert summarizer.backend.prompts == [summarizer.backend.prompts[0]]
+    assert summarizer.backend.prompts[0].endswith(sections[1])
+    assert "degraded" not in repaired[1]
+    assert repaired[0] == good
+
+
+def test_slow_section_call_is_hedged_past_p95_latency():
+    # Once there are enough latency samples, a call running past the p95 gets a
+    # duplicate request and the faster of the two answers is used.
+    summarizer = _make_summarizer()
+    summarizer._section_latencies.extend([0.01] * 50)
+
+    class SlowFirstBackend(FakeBackend):
+        async def complete(self, messages, temperature=0.3, json_mode=False):
+            if not self.prompts:
+                self.prompts.append("slow")
+                await asyncio.sleep(5)
+            return await super().complete(messages, temperature, json_mode)
+
+    summarizer.backend = SlowFirstBackend()
+    result = asyncio.run(asyncio.wait_for(summarizer._generate_section_summary("Text.", 1, 1), timeout=2))
+
+    assert result["key_takeaways"] == ["A complete sentence."]
+    assert summarizer.hedged_requests == 1
+
+
+def test_local_backend_produces_parseable_notes_offline():
+    # What this test checks:
+    # - The local engine answers the real section and overall prompts in the
+    #   requested shape, so summarize() + parse_structured_summary() work end to end.
+    # - The same transcript gives the same notes (deterministic content).
+    from app.llm_backends import LocalLLMBackend
+    from app.summarizer import Summarizer, is_degraded_section
+
+    transcript = " ".join(f"Photosynthesis converts light into chemical energy in step {i}." for i in range(120))
+
+    def run():
+        summarizer = Summarizer(backend=LocalLLMBackend(latency_seconds=0), section_tokens=200)
+        return summarizer, asyncio.run(summarizer.summarize(transcript))
+
+    summarizer, summary = run()
+    parsed = summarizer.parse_structured_summary(summary)
+
+    assert parsed["parse_diagnostics"] == []
+    assert parsed["lecture_title"]
+    assert parsed["key_concepts"] and parsed["flashcards"] and parsed["references"]
+    assert len(parsed["section_summaries"]) == len(summarizer._split_transcript_into_sections(transcript))
+    assert not any(is_degraded_section(section) for section in parsed["section_summaries"])
+    assert run()[1] == summary
+
+
+def test_backend_missing_an_interface_method_fails_when_created():
+    # What this test checks:
+    # - `LLMBackend` is abstract: a backend without `stream` can't be instantiated,
+    #   rather than failing on its first streamed summary.
+    class CompleteOnlyBackend(LLMBackend):
+        async def complete(self, messages, temperature=0.3, json_mode=False):
+            return Completion("text")
+
+    with pytest.raises(TypeError, match="stream"):
+        CompleteOnlyBackend()
+
+
+def test_summarize_collects_token_usage_for_every_call():
+    from app.llm_backends import TokenUsage
+
+    class CountingBackend(FakeBackend):
+        async def complete(self, messages, temperature=0.3, json_mode=False):
+            completion = await super().complete(messages, temperature, json_mode)
+            completion.prompt_tokens, completion.completion_tokens, completion.cached_tokens = 100, 10, 40
+            return completion
+
+    summarizer = _make_summarizer(section_tokens=50)
+    summarizer.backend = CountingBackend()
+    transcript = " ".join(f"Point {i} is key." for i in range(40))
+    sections = summarizer._split_transcript_into_sections(transcript)
+
+    usage = TokenUsage()
+    asyncio.run(summarizer.summarize(transcript, usage=usage))
+
+    totals = usage.to_dict()
+    assert totals["calls"] == len(sections) + 1
+    assert totals["by_call"]["section"]["calls"] == len(sections)
+    assert totals["by_call"]["overall"]["calls"] == 1
+    assert totals["prompt_tokens"] == 100 * totals["calls"]
+    assert totals["cached_tokens"] == 40 * totals["calls"]
+    assert totals["total_tokens"] == 110 * totals["calls"]
+
+
+def test_section_prompts_share_a_static_system_prefix():
+    # Provider-side prompt caching only hits on an identical prefix, so every
+    # section call must start with the same system message and keep the
+    # per-section values (position, text) in the user message.
+    class RecordingBackend(FakeBackend):
+        def __init__(self):
+            super().__init__()
+            self.messages = []
+
+        async def complete(self, messages, temperature=0.3, json_mode=False):
+            if json_mode:
+                self.messages.append(messages)
+            completion = await super().complete(messages, temperature, json_mode)
+            completion.prompt_tokens, completion.cached_tokens = 1000, 750
+            return completion
+
+    summarizer = _make_summarizer(section_tokens=50)
+    summarizer.backend = RecordingBackend()
+    transcript = " ".join(f"Point {i} is key." for i in range(40))
+    asyncio.run(summarizer.summarize(transcript))
+
+    section_calls = summarizer.backend.messages
+    assert len(section_calls) > 2
+    assert len({messages[0]["content"] for messages in section_calls}) == 1
+    assert all(messages[0]["role"] == "system" for messages in section_calls)
+    assert "section 1 of" in section_calls[0][1]["content"]
+    assert "section 1 of" not in section_calls[0][0]["content"]
+
+    metrics = summarizer.usage_totals.to_dict()
+    assert metrics["cached_ratio"] == 0.75
+    assert metrics["by_call"]["section"]["cached_ratio"] == 0.75
+
+
+def test_batched_sections_fall_back_to_single_calls_when_invalid():
+    # What this test checks:
+    # - With section_batch_size=3, sections are requested three at a time.
+    # - A section missing from the batched answer, or with the wrong shape, is
+    #   summarized again on its own; valid ones are used as-is, in section order.
+    import re
+
+    class BatchBackend(FakeBackend):
+        async def complete(self, messages, temperature=0.3, json_mode=False):
+            numbers = [int(n) for n in re.findall(r"^### Section (\d+)$", messages[-1]["content"], re.MULTILINE)]
+            if not numbers:
+                return await super().complete(messages, temperature, json_mode)
+            self.prompts.append(messages[-1]["content"])
+            sections = []
+            for number in numbers:
+                if number == 2:
+                    continue  # dropped by the model
+                title = ["not", "a", "string"] if number == 4 else f"Batched {number}"
+                sections.append({"section_number": number, "section_title": title, "key_takeaways": ["Kept."]})
+            return Completion(json.dumps({"sections": sections}))
+
+    summarizer = _make_summarizer(section_tokens=50, section_batch_size=3)
+    summarizer.backend = BatchBackend()
+    transcript = " ".join(f"Point {i} is key." for i in range(60))
+    sections = summarizer._split_transcript_into_sections(transcript)
+    assert len(sections) >= 5
+
+    summaries = asyncio.run(summarizer._generate_section_summaries(sections, priority=0))
+
+    batch_prompts = [p for p in summarizer.backend.prompts if p.startswith("These are sections")]
+    assert len(batch_prompts) == -(-len(sections) // 3)
+    assert len(summaries) == len(sections)
+    assert summaries[0]["section_title"] == "Batched 1"
+    assert "section_number" not in summaries[0]
+    assert summaries[1]["section_title"].startswith("Part")
+    assert summaries[3]["section_title"].startswith("Part")
+    assert summaries[4]["section_title"] == "Batched 5"
+
+
+def test_full_mode_runs_overall_call_alongside_section_summaries():
+    # Verifies the stage graph behind `Summarizer.summarize` in full mode.
+    # Scenario:
+    # - Every call takes 0.2s and counts the calls of each kind in flight; the
+    #   transcript splits into several sections.
+    # What this test checks:
+    # - The overall call is in flight while a section call is, i.e. it starts
+    #   before the section summaries are done.
+    # - Reduce mode still waits for the sections (it summarizes them).
+    # - Per-stage timings are collected on the pipeline.
+    class SlowBackend(FakeBackend):
+        def __init__(self):
+            super().__init__()
+            self.in_flight = {"section": 0, "overall": 0}
+            self.overlapped = False
+
+        async def complete(self, messages, temperature=0.3, json_mode=False):
+            kind = "section" if json_mode else "overall"
+            self.in_flight[kind] += 1
+            self.overlapped |= all(self.in_flight.values())
+            await asyncio.sleep(0.2)
+            self.in_flight[kind] -= 1
+            return await super().complete(messages, temperature, json_mode)
+
+    transcript = " ".join(f"Point {i} is key." for i in range(40))
+
+    summarizer = _make_summarizer(section_tokens=50, hedge_requests=False)
+    summarizer.backend = SlowBackend()
+    summary = asyncio.run(summarizer.summarize(transcript))
+
+    assert "@@SECTION_SUMMARIES_START@@" in summary
+    assert summarizer.backend.overlapped
+    assert summarizer.pipeline.stats["map"]["runs"] == 1
+    assert summarizer.pipeline.stats["overall"]["runs"] == 1
+
+    reduce_summarizer = _make_summarizer(section_tokens=50, hedge_requests=False, overall_mode="reduce", reduce_fan_in=50)
+    reduce_summarizer.backend = SlowBackend()
+    asyncio.run(reduce_summarizer.summarize(transcript))
+    assert not reduce_summarizer.backend.overlapped
+
+
+def test_section_system_prompts_are_long_enough_to_be_cached():
+    # Verifies the section system prompts, which every section call shares, are
+    # at least as long as the shortest prefix the provider's prompt cache reuses.
+    # Scenario:
+    # - Both section system prompts are split with the cl100k pre-tokenizer
+    #   pattern; every piece is at least one token, so the piece count is a
+    #   lower bound that needs no encoding download.
+    # What this test checks:
+    # - Each prompt has at least PROMPT_CACHE_MIN_TOKENS pieces.
+    regex = pytest.importorskip("regex")
+    from app.prompts import PROMPT_CACHE_MIN_TOKENS, SECTION_BATCH_SYSTEM, SECTION_SYSTEM
+    from benchmarks.bench_chunker import CL100K_PATTERN
+
+    for prompt in (SECTION_SYSTEM, SECTION_BATCH_SYSTEM):
+        assert len(regex.findall(CL100K_PATTERN, prompt)) >= PROMPT_CACHE_MIN_TOKENS
@@ -0,0 +1,296 @@
+import json
+from types import SimpleNamespace
+
+from app.llm_backends import Completion, LLMBackend
+
+
+class NotesBackend(LLMBackend):
+    """Returns a fixed section object or overall notes and records the transcripts it was sent."""
+
+    model = "fake"
+
+    def __init__(self):
+        self.user_messages = []
+
+    async def complete(self, messages, temperature=0.3, json_mode=False):
+        self.user_messages.append(messages[-1]["content"])
+        if json_mode:
+            return Completion(json.dumps({"section_title": "Part", "key_takeaways": ["A sentence."], "new_vocabulary": [], "study_questions": [], "examples": [], "useful_references": []}))
+        return Completion("@@LECTURE_TITLE_START@@\nUploaded Notes\n@@LECTURE_TITLE_END@@")
+
+    async def stream(self, messages, on_delta, temperature=0.3):
+        completion = await self.complete(messages, temperature)
+        await on_delta(completion.text)
+        return completion
+
+
+def _setup(fake_db_factory, monkeypatch, tmp_path):
+    import app.main as main_module
+    from app.cache import LRUCache, SQLiteCache, TieredCache
+    from app.jobs import JobStore
+    import app.user_usages as user_usages_module
+
+    fake_db = fake_db_factory()
+    fake_db._data["lectures"] = {}
+    monkeypatch.setattr(main_module, "supabase", fake_db)
+    monkeypatch.setattr(user_usages_module, "supabase", fake_db)
+    backend = NotesBackend()
+    monkeypatch.setattr(main_module.summarizer, "backend", backend)
+    monkeypatch.setattr(main_module.summarizer, "cache", None)
+    extraction_cache = TieredCache(LRUCache(4), SQLiteCache(str(tmp_path / "extractions.sqlite3")))
+    monkeypatch.setattr(main_module, "extraction_cache", extraction_cache)
+    job_store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(main_module, "job_store", job_store)
+    monkeypatch.setattr(main_module.job_workers, "store", job_store)
+    monkeypatch.setattr(main_module.job_workers, "poll_interval", 0.02)
+    monkeypatch.setattr(main_module.settings, "JOB_POLL_INTERVAL_SECONDS", 0.02)
+    monkeypatch.setattr(main_module.settings, "JOB_STORAGE_DIR", str(tmp_path))
+    return fake_db, backend
+
+
+def _receive_until_done(ws) -> list[dict]:
+    messages = []
+    while True:
+        message = ws.receive_json()
+        messages.append(message)
+        if message.get("error") or message.get("success"):
+            return messages
+
+
+def test_file_upload_arrives_as_binary_chunks(api_client, fake_db_factory, monkeypatch, tmp_path):
+    # Verifies the binary upload protocol of `/ws/process-upload`.
+    # Scenario:
+    # - A .txt file is announced with its size and sent as three binary frames.
+    # What this test checks:
+    # - The chunks are reassembled in order, extracted and summarized.
+    # - The lecture is saved with the full text as its transcript, and with the
+    #   section spans of the prepared copy the section summaries were made from.
+    fake_db, backend = _setup(fake_db_factory, monkeypatch, tmp_path)
+    text = "Cells make energy in the mitochondria. " * 30
+    data = text.encode("utf-8")
+
+    with api_client.websocket_connect("/ws/process-upload") as ws:
+        ws.send_json({"token": "token"})
+        ws.send_json({"type": "file", "filename": "notes.txt", "size": len(data)})
+        for start in range(0, len(data), 400):
+            ws.send_bytes(data[start:start + 400])
+        ws.send_json({"type": "file_end"})
+        messages = _receive_until_done(ws)
+
+    assert messages[-1].get("success"), messages[-1]
+    lecture = fake_db._data["lectures"][messages[-1]["lecture_id"]]
+    assert lecture["transcript"] == text
+    assert lecture["lecture_title"] == "Uploaded Notes"
+    sections = [lecture["llm_transcript"][start:end] for start, end in lecture["section_spans"]]
+    section_prompts = [message for message in backend.user_messages if "section text" in message]
+    assert len(sections) == len(section_prompts) == len(lecture["section_summaries"])
+    assert all(prompt.endswith(section) for prompt, section in zip(section_prompts, sections))
+
+
+def test_oversized_upload_is_rejected_while_receiving(api_client, fake_db_factory, monkeypatch, tmp_path):
+    # Verifies the size limit in `receive_file_upload`.
+    # What this test checks:
+    # - A file announced as too large is rejected before any bytes are read.
+    # - A file that lies about its size is rejected as soon as the received
+    #   bytes go over the limit, not after the whole upload.
+    import app.main as main_module
+
+    _setup(fake_db_factory, monkeypatch, tmp_path)
+    monkeypatch.setattr(main_module, "MAX_UPLOAD_BYTES", 1000)
+
+    with api_client.websocket_connect("/ws/process-upload") as ws:
+        ws.send_json({"token": "token"})
+        ws.send_json({"type": "file", "filename": "big.txt", "size": 5000})
+        assert "exceeds" in ws.receive_json()["error"]
+
+    with api_client.websocket_connect("/ws/process-upload") as ws:
+        ws.send_json({"token": "token"})
+        ws.send_json({"type": "file", "filename": "big.txt", "size": 900})
+        ws.send_bytes(b"x" * 600)
+        ws.send_bytes(b"x" * 600)
+        assert "exceeds" in ws.receive_json()["error"]
+
+
+def _upload(api_client, filename: str, data: bytes) -> list[dict]:
+    with api_client.websocket_connect("/ws/process-upload") as ws:
+        ws.send_json({"token": "token"})
+        ws.send_json({"type": "file", "filename": filename, "size": len(data)})
+        ws.send_bytes(data)
+        ws.send_json({"type": "file_end"})
+        return _receive_until_done(ws)
+
+
+def test_repeat_upload_skips_extraction(api_client, fake_db_factory, monkeypatch, tmp_path):
+    # Verifies the extraction cache in `/ws/process-upload`.
+    # Scenario:
+    # - The same file is uploaded twice, then a file with different bytes.
+    # What this test checks:
+    # - The second upload is served from the cache without running extraction.
+    # - A file with different content is extracted again.
+    # - Hits and misses are reported by `/metrics/extraction`.
+    import app.main as main_module
+
+    _setup(fake_db_factory, monkeypatch, tmp_path)
+    calls = []
+    original_extract = main_module.extraction_pool.extract
+
+    async def counting_extract(path, filename, on_progress=None, max_words=None):
+        calls.append(filename)
+        return await original_extract(path, filename, on_progress, max_words)
+
+    monkeypatch.setattr(main_module.extraction_pool, "extract", counting_extract)
+    data = ("Enzymes lower the activation energy of reactions. " * 20).encode("utf-8")
+
+    first = _upload(api_client, "enzymes.txt", data)
+    second = _upload(api_client, "enzymes-copy.txt", data)
+    _upload(api_client, "enzymes-v2.txt", data + b"Temperature matters too.")
+
+    assert first[-1].get("success") and second[-1].get("success")
+    assert calls == ["enzymes.txt", "enzymes-v2.txt"]
+    monkeypatch.setattr(main_module.settings, "METRICS_USER_IDS", "user-1")
+    cache_stats = api_client.get("/metrics/extraction").json()["cache"]
+    assert cache_stats["hits"] == 1
+    assert cache_stats["misses"] == 2
+
+
+def test_upload_job_continues_after_disconnect_and_can_be_followed(api_client, fake_db_factory, monkeypatch, tmp_path):
+    # Verifies that uploads run as durable jobs, decoupled from the websocket.
+    # Scenario:
+    # - A text upload is submitted and the socket is closed right after the
+    #   job ID arrives; the client then reconnects to `/ws/jobs/{job_id}`.
+    # What this test checks:
+    # - The job still finishes and the lecture is saved.
+    # - Resubscribing replays the job's progress and ends with the success message.
+    # - Resubscribing with `after` set to the last seq replays nothing older.
+    # - Another user's token can't follow the job.
+    import app.main as main_module
+
+    fake_db, _ = _setup(fake_db_factory, monkeypatch, tmp_path)
+    text = "Plate tectonics explains how continents drift over time. " * 20
+
+    with api_client.websocket_connect("/ws/process-upload") as ws:
+        ws.send_json({"token": "token"})
+        ws.send_json({"type": "text", "data": text})
+        job_id = ws.receive_json()["job_id"]
+
+    with api_client.websocket_connect(f"/ws/jobs/{job_id}") as ws:
+        ws.send_json({"token": "token"})
+        replay = _receive_until_done(ws)
+
+    assert replay[-1].get("success"), replay[-1]
+    assert any(message.get("summary_section") for message in replay)
+    assert fake_db._data["lectures"][replay[-1]["lecture_id"]]["transcript"] == text
+    assert main_module.job_store.get(job_id)["status"] == "done"
+
+    with api_client.websocket_connect(f"/ws/jobs/{job_id}") as ws:
+        ws.send_json({"token": "token", "after": replay[-2]["seq"]})
+        assert _receive_until_done(ws) == replay[-1:]
+
+    monkeypatch.setattr(
+        fake_db.auth, "get_user",
+        lambda token: SimpleNamespace(user=SimpleNamespace(id="someone-else")),
+    )
+    with api_client.websocket_connect(f"/ws/jobs/{job_id}") as ws:
+        ws.send_json({"token": "other-token"})
+        assert "could not be found" in ws.receive_json()["error"]
+
+
+def test_recording_upload_is_batch_transcribed_and_summarized(api_client, fake_db_factory, monkeypatch, tmp_path):
+    # Verifies audio uploads on `/ws/process-upload`.
+    # Scenario:
+    # - A 3-second WAV is uploaded with 1-second batch STT chunks; the batch
+    #   request is faked to return one sentence per chunk.
+    # What this test checks:
+    # - The recording is transcribed chunk by chunk (with progress) instead of
+    #   going through document extraction.
+    # - The joined transcript is summarized and saved like any other upload,
+    #   with fillers removed from the copy the LLM sees.
+    import io
+    import wave
+
+    import app.main as main_module
+    from app.stt import STTClient
+
+    fake_db, _ = _setup(fake_db_factory, monkeypatch, tmp_path)
+    monkeypatch.setattr(main_module.settings, "STT_BATCH_CHUNK_SECONDS", 1.0)
+    # One request at a time, so the fake's numbering follows the chunk order.
+    monkeypatch.setattr(main_module.settings, "STT_BATCH_MAX_PARALLEL", 1)
+    requests = []
+
+    async def fake_transcribe_file(self, audio, mimetype, timeout_seconds=600.0):
+        requests.append(mimetype)
+        return f"Sentence {len(requests)}, um, about sound waves."
+
+    monkeypatch.setattr(STTClient, "transcribe_file", fake_transcribe_file)
+    recording = io.BytesIO()
+    with wave.open(recording, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(16000)
+        out.writeframes(bytes(3 * 16000 * 2))
+
+    messages = _upload(api_client, "lecture.wav", recording.getvalue())
+
+    assert messages[-1].get("success"), messages[-1]
+    assert requests == ["audio/wav"] * 3
+    assert any("3 of 3 parts" in message.get("processing_status", "") for message in messages)
+    lecture = fake_db._data["lectures"][messages[-1]["lecture_id"]]
+    assert lecture["transcript"] == "Sentence 1, um, about sound waves. Sentence 2, um, about sound waves. Sentence 3, um, about sound waves."
+    assert lecture["llm_transcript"] == "Sentence 1 about sound waves. Sentence 2 about sound waves. Sentence 3 about sound waves."
+
+
+def test_text_upload_is_not_cleaned_of_disfluencies(api_client, fake_db_factory, monkeypatch, tmp_path):
+    # Verifies that only speech goes through transcript cleanup.
+    # Scenario:
+    # - Pasted text contains units, acronyms and phrases that look like fillers,
+    #   false starts and repeats.
+    # What this test checks:
+    # - The LLM gets the text unchanged.
+    fake_db, _ = _setup(fake_db_factory, monkeypatch, tmp_path)
+    text = "The UM campus, uh, is big. Rails are 5 mm apart. Split infor- mation here. New York, New York. Bye bye."
+
+    with api_client.websocket_connect("/ws/process-upload") as ws:
+        ws.send_json({"token": "token"})
+        ws.send_json({"type": "text", "data": text})
+        messages = _receive_until_done(ws)
+
+    assert messages[-1].get("success"), messages[-1]
+    lecture = fake_db._data["lectures"][messages[-1]["lecture_id"]]
+    assert lecture["llm_transcript"] == text
+
+
+def test_repair_reruns_degraded_sections_from_the_saved_section_text(api_client, fake_db_factory, monkeypatch, tmp_path):
+    # Verifies `POST /lectures/{id}/repair-sections`.
+    # Scenario:
+    # - A lecture was saved with its prepared LLM transcript and section spans
+    #   that don't match a fresh split of it (as with live recordings, whose
+    #   sections are windowed while recording). Its second section is degraded.
+    # - A second lecture was saved before section spans were recorded.
+    # What this test checks:
+    # - Only the degraded section is re-run, from exactly the saved span.
+    # - The repaired summaries are stored.
+    # - The older lecture is refused with 409 instead of guessing its sections.
+    import app.main as main_module
+
+    fake_db, backend = _setup(fake_db_factory, monkeypatch, tmp_path)
+    llm_transcript = "Mitochondria make energy. They have their own DNA. Ribosomes build proteins from amino acids."
+    second = llm_transcript.index("They")
+    third = llm_transcript.index("Ribosomes")
+    spans = [(0, second - 1), (second, third - 1), (third, len(llm_transcript))]
+    good = {"section_title": "Fine", "key_takeaways": ["Kept."], "new_vocabulary": [], "study_questions": [], "examples": []}
+    degraded = {"section_title": "Section 2", "key_takeaways": [], "new_vocabulary": [], "study_questions": [], "examples": [], "degraded": True}
+    assert main_module.summarizer.section_spans(llm_transcript) != spans
+    fake_db._data["lectures"] = {
+        "lecture-1": {"id": "lecture-1", "user_id": "user-1", "transcript": "Um, " + llm_transcript, "llm_transcript": llm_transcript,
+                      "section_spans": [list(span) for span in spans], "section_summaries": [good, degraded, good]},
+        "lecture-old": {"id": "lecture-old", "user_id": "user-1", "transcript": llm_transcript, "section_summaries": [good, degraded]},
+    }
+
+    response = api_client.post("/lectures/lecture-1/repair-sections")
+
+    assert response.status_code == 200
+    assert response.json()["repaired_sections"] == [2]
+    assert len(backend.user_messages) == 1
+    assert backend.user_messages[0].endswith("They have their own DNA.")
+    assert "degraded" not in fake_db._data["lectures"]["lecture-1"]["section_summaries"][1]
+    assert api_client.post("/lectures/lecture-old/repair-sections").status_code == 409
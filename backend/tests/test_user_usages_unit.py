@@ -129,3 +129,46 @@ def test_reset_user_usage_sets_counts_to_zero_and_updates_period(
     assert usage["usage_period_start"] == start_iso
     assert usage["usage_period_end"] == end_iso
 
+
+
+def test_update_usage_tokens_adds_lecture_usage_to_running_totals(
+    fake_db_factory, monkeypatch
+):
+    # Verifies `update_usage_tokens`, called after every summarized lecture.
+    # What this test checks:
+    # - Each token counter in `user_usage` is incremented by the lecture's usage.
+    # - Counters that don't exist yet (rows created before the migration) start at 0.
+    from app.user_usages import update_usage_tokens
+    import app.user_usages as user_usages_module
+
+    fake_db = fake_db_factory(initial_usage={"tokens_used": 1000, "prompt_tokens_used": 800, "completion_tokens_used": 200})
+    monkeypatch.setattr(user_usages_module, "supabase", fake_db)
+
+    lecture_usage = {"prompt_tokens": 300, "completion_tokens": 50, "cached_tokens": 100, "total_tokens": 350}
+    asyncio.run(update_usage_tokens("user-1", lecture_usage))
+
+    usage = fake_db._data["user_usage"]["user-1"]
+    assert usage["tokens_used"] == 1350
+    assert usage["prompt_tokens_used"] == 1100
+    assert usage["completion_tokens_used"] == 250
+    assert usage["cached_tokens_used"] == 100
+
+
+def test_get_remaining_tokens_count_respects_plan_budget(fake_db_factory, monkeypatch):
+    # Verifies token budgets work like the upload/recording limits:
+    # - a plan with `max_tokens` reports what's left (never below 0)
+    # - a plan without one (NULL) reports -1, i.e. unlimited.
+    from app.user_usages import get_remaining_tokens_count
+    import app.user_usages as user_usages_module
+
+    # The fake returns the whole profile row for joined selects, so the joined
+    # tables are embedded in it the way PostgREST would return them.
+    fake_db = fake_db_factory(initial_profiles={"plan_limits": {"max_tokens": 1000}, "user_usage": {"tokens_used": 400}})
+    monkeypatch.setattr(user_usages_module, "supabase", fake_db)
+    assert asyncio.run(get_remaining_tokens_count("user-1"))["remaining_tokens"] == 600
+
+    fake_db._data["profiles"]["user-1"]["user_usage"]["tokens_used"] = 1500
+    assert asyncio.run(get_remaining_tokens_count("user-1"))["remaining_tokens"] == 0
+
+    fake_db._data["profiles"]["user-1"]["plan_limits"]["max_tokens"] = None
+    assert asyncio.run(get_remaining_tokens_count("user-1"))["remaining_tokens"] == -1
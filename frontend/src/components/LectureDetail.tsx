@@ -22,6 +22,7 @@ interface Lecture {
   study_questions: string[];
   references: Reference[];
   created_at: string;
+  is_provisional?: boolean;
   flashcards: Array<{ question: string; answer: string; }>;
   section_summaries: Array<{
     section_title: string;
@@ -428,6 +429,20 @@ export function LectureDetail({ lectureId, onBack }: LectureDetailProps) {
             }}>
               {lecture.lecture_title}
             </h1>
+
+            {lecture.is_provisional && (
+              <div style={{
+                color: 'rgba(255, 255, 255, 0.7)',
+                fontSize: '0.85rem',
+                background: 'rgba(86, 88, 245, 0.1)',
+                border: '1px solid rgba(86, 88, 245, 0.3)',
+                borderRadius: '8px',
+                padding: '0.5rem 1rem',
+                textAlign: 'center'
+              }}>
+                These are quick draft notes. Full AI notes will replace them automatically shortly.
+              </div>
+            )}
             
             <div style={{ 
               display: 'flex',
@@ -4,6 +4,8 @@ import { useNavigate } from 'react-router-dom';
 import { config } from '../config';
 import { useUsage } from '../hooks/useUsage';
 import { useRecording } from '../contexts/RecordingContext';
+import { SummaryPreview, withSummarySection } from './SummaryPreview';
+import type { SummaryPreviewData } from './SummaryPreview';
 
 export interface RecordingAppProps {}
 
@@ -19,11 +21,12 @@ export function RecordingApp({}: RecordingAppProps) {
   const [isProcessing, setIsProcessing] = useState(false);
   const [processingStatus, setProcessingStatus] = useState('');
   const [processingProgress, setProcessingProgress] = useState(0);
+  const [summaryPreview, setSummaryPreview] = useState<SummaryPreviewData>({});
   const processingIntervalRef = useRef<NodeJS.Timeout | null>(null);
   const navigate = useNavigate();
   const { usageData, isLoading: isLoadingUsage } = useUsage();
   
-  const isRecordingDisabled = isLoadingUsage || usageData?.remaining_recordings === 0;
+  const isRecordingDisabled = isLoadingUsage || usageData?.remaining_recordings === 0 || usageData?.remaining_tokens === 0;
 
   const mediaStreamRef = useRef<MediaStream | null>(null);
   const socketRef = useRef<WebSocket | null>(null);
@@ -218,6 +221,7 @@ export function RecordingApp({}: RecordingAppProps) {
     cleanup(false); 
     setIsProcessing(false);
     setSummary('');
+    setSummaryPreview({});
     setCompletedTranscriptSegments([]);
     setCurrentInterimTranscript('');
     setTranscription('🟡 Connecting to server...');
@@ -324,6 +328,11 @@ export function RecordingApp({}: RecordingAppProps) {
                 setProcessingProgress(message.progress);
             }
 
+            // Finished parts of the notes, streamed while the rest is generated.
+            if (message.summary_section) {
+                setSummaryPreview(prev => withSummarySection(prev, message) ?? prev);
+            }
+
             // Handle live transcription text if no lecture_id yet.
             if (message.text !== undefined && message.is_final_utterance_segment !== undefined) {
                 if (isRecordingRef.current && !isProcessing) {
@@ -609,6 +618,7 @@ export function RecordingApp({}: RecordingAppProps) {
               }} />
               {processingStatus || 'Processing your lecture...'}
             </div>
+            <SummaryPreview preview={summaryPreview} />
           </div>
         )}
       </div>
@@ -0,0 +1,76 @@
+// Notes sections streamed by the server as {"summary_section", "content"} messages
+// while the summary is still being generated, keyed by field name.
+export type SummaryPreviewData = Record<string, unknown>;
+
+// Adds one streamed section to the preview; returns null for other messages.
+export const withSummarySection = (
+  preview: SummaryPreviewData,
+  message: { summary_section?: string; content?: unknown }
+): SummaryPreviewData | null => {
+  if (!message.summary_section) return null;
+  return { ...preview, [message.summary_section]: message.content };
+};
+
+const LIST_SECTIONS: { field: string; title: string }[] = [
+  { field: 'key_concepts', title: 'Key Concepts' },
+  { field: 'main_points_covered', title: 'Main Points' },
+  { field: 'study_questions', title: 'Study Questions' },
+];
+
+const asText = (value: unknown) => (typeof value === 'string' ? value : '');
+const asList = (value: unknown) => (Array.isArray(value) ? value.filter((item): item is string => typeof item === 'string') : []);
+
+// Shows the parts of the notes that are already done, so there is something to
+// read before the whole summary (and the lecture page) is ready.
+export function SummaryPreview({ preview }: { preview: SummaryPreviewData }) {
+  const title = asText(preview.lecture_title);
+  const topic = asText(preview.topic_summary_sentence);
+  const takeaways = asText(preview.conclusion_takeaways);
+  const sectionCount = Array.isArray(preview.section_summaries) ? preview.section_summaries.length : 0;
+  const lists = LIST_SECTIONS
+    .map(({ field, title }) => ({ title, items: asList(preview[field]) }))
+    .filter(({ items }) => items.length > 0);
+
+  if (!title && !topic && !takeaways && !sectionCount && lists.length === 0) {
+    return null;
+  }
+
+  return (
+    <div style={{
+      width: '100%',
+      maxWidth: '600px',
+      marginTop: '1.5rem',
+      textAlign: 'left',
+      background: 'rgba(255, 255, 255, 0.03)',
+      border: '1px solid rgba(255, 255, 255, 0.1)',
+      borderRadius: '12px',
+      padding: '1.25rem',
+      maxHeight: '40vh',
+      overflowY: 'auto',
+      color: 'rgba(255, 255, 255, 0.85)',
+      lineHeight: 1.6
+    }}>
+      {title && <h3 style={{ margin: '0 0 0.5rem', color: '#fff' }}>{title}</h3>}
+      {topic && <p style={{ margin: '0 0 1rem' }}>{topic}</p>}
+      {sectionCount > 0 && (
+        <p style={{ margin: '0 0 1rem', color: 'rgba(255, 255, 255, 0.6)', fontSize: '0.9rem' }}>
+          {sectionCount} section {sectionCount === 1 ? 'summary' : 'summaries'} ready
+        </p>
+      )}
+      {lists.map(({ title: listTitle, items }) => (
+        <div key={listTitle} style={{ marginBottom: '1rem' }}>
+          <h4 style={{ margin: '0 0 0.4rem', color: '#8c8eff' }}>{listTitle}</h4>
+          <ul style={{ margin: 0, paddingLeft: '1.25rem' }}>
+            {items.map((item, index) => <li key={index}>{item}</li>)}
+          </ul>
+        </div>
+      ))}
+      {takeaways && (
+        <div>
+          <h4 style={{ margin: '0 0 0.4rem', color: '#8c8eff' }}>Takeaways</h4>
+          <p style={{ margin: 0 }}>{takeaways}</p>
+        </div>
+      )}
+    </div>
+  );
+}
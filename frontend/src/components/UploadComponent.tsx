@@ -3,6 +3,28 @@ import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
 import { config } from '../config';
 import { useUsage } from '../hooks/useUsage';
+import { SummaryPreview, withSummarySection } from './SummaryPreview';
+import type { SummaryPreviewData } from './SummaryPreview';
+
+// Size of each binary websocket frame when uploading a file.
+const UPLOAD_CHUNK_BYTES = 256 * 1024;
+// The upload job being processed and the last progress event seen, so a reload
+// or dropped connection can pick it back up from /ws/jobs/{id}.
+const PENDING_JOB_KEY = 'pendingUploadJob';
+// Recordings are transcribed in batch on the server and may be much larger than documents.
+const AUDIO_EXTENSIONS = ['.wav', '.aiff', '.aif', '.mp3'];
+const MAX_DOCUMENT_BYTES = 10 * 1024 * 1024;
+const MAX_AUDIO_BYTES = 500 * 1024 * 1024;
+
+const isAudioFile = (upload: File) => AUDIO_EXTENSIONS.some(ext => upload.name.toLowerCase().endsWith(ext));
+
+// Error message for a file over its size limit, or null if it fits.
+const fileSizeError = (upload: File) => {
+  if (isAudioFile(upload)) {
+    return upload.size > MAX_AUDIO_BYTES ? 'Recording exceeds 500MB limit. Please choose a smaller file.' : null;
+  }
+  return upload.size > MAX_DOCUMENT_BYTES ? 'File size exceeds 10MB limit. Please choose a smaller file.' : null;
+};
 
 export function UploadComponent() {
   const [activeTab, setActiveTab] = useState('file'); // Changed default to 'file'
@@ -14,6 +36,7 @@ export function UploadComponent() {
   const [processingStatus, setProcessingStatus] = useState('');
   const [processingProgress, setProcessingProgress] = useState(0);
   const [isDragging, setIsDragging] = useState(false);
+  const [summaryPreview, setSummaryPreview] = useState<SummaryPreviewData>({});
 
   const { token } = useAuth();
   const navigate = useNavigate();
@@ -21,11 +44,81 @@ export function UploadComponent() {
   const dragCounter = React.useRef(0);
   const { usageData, isLoading: isLoadingUsage } = useUsage();
 
-  const isUploadDisabled = isLoadingUsage || usageData?.remaining_uploads === 0;
+  const isUploadDisabled = isLoadingUsage || usageData?.remaining_uploads === 0 || usageData?.remaining_tokens === 0;
+
+  const finishedRef = React.useRef(false);
+
+  // Progress, errors and the final result arrive the same way whether this page
+  // submitted the job or is following one that was already running.
+  const handleJobMessage = (event: MessageEvent) => {
+    const message = JSON.parse(event.data);
+
+    if (message.job_id) {
+      sessionStorage.setItem(PENDING_JOB_KEY, JSON.stringify({ id: message.job_id, seq: message.seq ?? 0 }));
+    }
+
+    if (message.error) {
+      finishedRef.current = true;
+      sessionStorage.removeItem(PENDING_JOB_KEY);
+      setError(message.error);
+      setIsProcessing(false);
+      socketRef.current?.close();
+      return;
+    }
+
+    if (message.processing_status) {
+      setProcessingStatus(message.processing_status);
+    }
+    if (message.summary_section) {
+      setSummaryPreview(prev => withSummarySection(prev, message) ?? prev);
+    }
+    if (message.progress) {
+      // Ensure progress doesn't go backwards from the initial client-side steps
+      setProcessingProgress(prev => Math.max(prev, message.progress));
+    }
+
+    if (message.success && message.lecture_id) {
+      finishedRef.current = true;
+      sessionStorage.removeItem(PENDING_JOB_KEY);
+      setProcessingStatus('All done! Redirecting...');
+      setProcessingProgress(100);
+      navigate(`/lectures/${message.lecture_id}`);
+    }
+  };
+
+  // The job keeps running on the server if the socket drops, so reconnect and
+  // ask only for the events after the last one seen.
+  const followPendingJob = () => {
+    const pending = sessionStorage.getItem(PENDING_JOB_KEY);
+    if (!pending || !token) return;
+    const { id, seq } = JSON.parse(pending);
 
-  // Cleanup WebSocket on component unmount
+    setIsProcessing(true);
+    finishedRef.current = false;
+    socketRef.current = new WebSocket(`${config.apiUrl.replace('http', 'ws')}/ws/jobs/${id}`);
+    socketRef.current.onopen = () => {
+      socketRef.current?.send(JSON.stringify({ token, after: seq }));
+    };
+    socketRef.current.onmessage = handleJobMessage;
+    socketRef.current.onclose = handleJobSocketClose;
+  };
+
+  const handleJobSocketClose = () => {
+    if (finishedRef.current) return;
+    if (sessionStorage.getItem(PENDING_JOB_KEY)) {
+      setProcessingStatus('Reconnecting...');
+      setTimeout(followPendingJob, 2000);
+    } else {
+      setIsProcessing(false);
+    }
+  };
+
+  // Pick up an upload that was still processing when the page was left, and
+  // clean up the WebSocket on unmount.
   useEffect(() => {
+    followPendingJob();
     return () => {
+      finishedRef.current = true;
       socketRef.current?.close();
     };
   }, []);
@@ -38,11 +131,27 @@ export function UploadComponent() {
     }
 
     setIsProcessing(true);
+    finishedRef.current = false;
+    sessionStorage.removeItem(PENDING_JOB_KEY);
     setError(null);
+    setSummaryPreview({});
     setProcessingStatus('Preparing your file...');
     setProcessingProgress(5);
 
     const backendUrl = `${config.apiUrl.replace('http', 'ws')}/ws/process-upload`;
+
+    // The file is announced with its size, then sent as raw binary frames so the
+    // server can spool it to disk and reject oversized files as they arrive.
+    const sendFileInChunks = async (upload: File) => {
+      const socket = socketRef.current;
+      if (!socket) return;
+      socket.send(JSON.stringify({ type: 'file', filename: upload.name, size: upload.size }));
+      for (let offset = 0; offset < upload.size; offset += UPLOAD_CHUNK_BYTES) {
+        if (socket.readyState !== WebSocket.OPEN) return;
+        socket.send(await upload.slice(offset, offset + UPLOAD_CHUNK_BYTES).arrayBuffer());
+      }
+      socket.send(JSON.stringify({ type: 'file_end' }));
+    };
     
     // Give a brief moment for the UI to update before connecting
     setTimeout(() => {
@@ -58,43 +167,11 @@ export function UploadComponent() {
         if (activeTab === 'text') {
           socketRef.current?.send(JSON.stringify({ type: 'text', data: textContent }));
         } else if (file) {
-          const reader = new FileReader();
-          reader.onload = (e) => {
-            const file_data = (e.target?.result as string).split(',')[1];
-            socketRef.current?.send(JSON.stringify({
-              type: 'file',
-              filename: file.name,
-              data: file_data,
-            }));
-          };
-          reader.readAsDataURL(file);
+          sendFileInChunks(file);
         }
       };
   
-      socketRef.current.onmessage = (event) => {
-        const message = JSON.parse(event.data);
-  
-        if (message.error) {
-          setError(message.error);
-          setIsProcessing(false);
-          socketRef.current?.close();
-          return;
-        }
-  
-        if (message.processing_status) {
-          setProcessingStatus(message.processing_status);
-        }
-        if (message.progress) {
-          // Ensure progress doesn't go backwards from the initial client-side steps
-          setProcessingProgress(prev => Math.max(prev, message.progress));
-        }
-  
-        if (message.success && message.lecture_id) {
-          setProcessingStatus('All done! Redirecting...');
-          setProcessingProgress(100);
-          navigate(`/lectures/${message.lecture_id}`);
-        }
-      };
+      socketRef.current.onmessage = handleJobMessage;
   
       socketRef.current.onerror = (err) => {
         console.error('WebSocket Error:', err);
@@ -102,11 +179,7 @@ export function UploadComponent() {
         setIsProcessing(false);
       };
   
-      socketRef.current.onclose = () => {
-        if (!processingStatus.startsWith('All done!')) {
-          setIsProcessing(false);
-        }
-      };
+      socketRef.current.onclose = handleJobSocketClose;
     }, 500); // 500ms delay to make the first step visible
   };
 
@@ -114,8 +187,9 @@ export function UploadComponent() {
     const files = event.target.files;
     if (files && files.length > 0) {
       const selectedFile = files[0];
-      if (selectedFile.size > 10 * 1024 * 1024) {
-        setError('File size exceeds 10MB limit. Please choose a smaller file.');
+      const sizeError = fileSizeError(selectedFile);
+      if (sizeError) {
+        setError(sizeError);
         setFile(null);
       } else {
         setFile(selectedFile);
@@ -173,22 +247,23 @@ export function UploadComponent() {
         'application/vnd.openxmlformats-officedocument.presentationml.presentation'
       ];
       const droppedFile = files[0];
-      if (acceptedTypes.includes(droppedFile.type)) {
-        if (droppedFile.size > 10 * 1024 * 1024) {
-          setError('File size exceeds 10MB limit. Please choose a smaller file.');
+      if (acceptedTypes.includes(droppedFile.type) || isAudioFile(droppedFile)) {
+        const sizeError = fileSizeError(droppedFile);
+        if (sizeError) {
+          setError(sizeError);
           setFile(null);
         } else {
           setFile(droppedFile);
           setError(null);
         }
       } else {
-        setError('Unsupported file type. Please upload a DOC, DOCX, PDF, PPTX, or TXT file.');
+        setError('Unsupported file type. Please upload a DOC, DOCX, PDF, PPTX, TXT, WAV, AIFF, or MP3 file.');
       }
     }
   };
 
   if (isProcessing) {
-    return <ProcessingView status={processingStatus} progress={processingProgress} />;
+    return <ProcessingView status={processingStatus} progress={processingProgress} preview={summaryPreview} />;
   }
 
   return (
@@ -378,7 +453,7 @@ export function UploadComponent() {
                 type="file"
                 id="file-upload"
                 onChange={handleFileChange}
-                accept=".doc, .docx, .pdf, .txt, .pptx"
+                accept=".doc, .docx, .pdf, .txt, .pptx, .wav, .aiff, .aif, .mp3"
                 style={{ display: 'none' }}
                 disabled={isProcessing || isUploadDisabled}
               />
@@ -424,10 +499,10 @@ export function UploadComponent() {
                 )}
               </label>
               <p style={{ color: 'rgba(255, 255, 255, 0.5)', marginTop: '1rem' }}>
-                Supported formats: DOC, DOCX, PDF, PPTX, TXT
+                Supported formats: DOC, DOCX, PDF, PPTX, TXT, and recordings in WAV, AIFF or MP3
               </p>
               <p style={{ color: 'rgba(255, 255, 255, 0.5)', marginTop: '0.5rem', fontSize: '0.9rem' }}>
-                (Max 10MB file size. Only the first 15,000 words will be processed.)
+                (Max 10MB per document, 500MB per recording. Very long documents are condensed to their key sentences before summarizing.)
               </p>
             </div>
             <div style={{ position: 'relative' }}>
@@ -503,13 +578,13 @@ export function UploadComponent() {
   );
 }
 
-const ProcessingView = ({ status, progress }: { status: string; progress: number }) => (
+const ProcessingView = ({ status, progress, preview }: { status: string; progress: number; preview: SummaryPreviewData }) => (
   <div style={{
     display: 'flex',
     flexDirection: 'column',
     alignItems: 'center',
     justifyContent: 'center',
-    height: '60vh',
+    minHeight: '60vh',
     color: '#fff'
   }}>
     <div style={{ width: '80%', maxWidth: '600px', textAlign: 'center' }}>
@@ -531,6 +606,7 @@ const ProcessingView = ({ status, progress }: { status: string; progress: number
       </div>
       <p style={{ marginTop: '1rem', color: 'rgba(255, 255, 255, 0.7)' }}>{progress}% complete</p>
     </div>
+    <SummaryPreview preview={preview} />
   </div>
 );
 
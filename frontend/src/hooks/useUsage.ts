@@ -5,6 +5,7 @@ import { useAuth } from '../contexts/AuthContext';
 interface UsageData {
   remaining_uploads: number;
   remaining_recordings: number;
+  remaining_tokens: number;
   usage_period_end?: string;
 }
 
@@ -28,6 +29,7 @@ export const useUsage = () => {
       setUsageData({
         remaining_uploads: data.remaining_uploads,
         remaining_recordings: data.remaining_recordings,
+        remaining_tokens: data.remaining_tokens ?? -1,
         usage_period_end: data.usage_period_end
       });
     } catch (err) {